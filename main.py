@@ -7,22 +7,42 @@ from typing import Tuple, Union
 import hydra
 import pandas as pd
 from dotenv import load_dotenv
-from omegaconf import DictConfig
+from omegaconf import DictConfig, OmegaConf
 
 from main_code.data import (
+    add_fundamentals,
+    add_risk_characteristics,
     build_event_earnings_data,
+    build_iclink,
+    build_matrix_store,
     build_panel,
+    build_panel_chunked,
+    build_panel_polars,
+    build_return_index,
+    characteristics_table,
     compute_earning_surprises,
     download_files,
+    risk_columns,
 )
 from main_code.figures import (
-    plot_event_study_earnings,
-    plot_event_study_earnings_ann_ret,
-    plot_n_earnings_per_year,
-    plot_n_stocks_per_year,
+    event_study_ann_ret_jobs,
+    event_study_earnings_jobs,
+    n_earnings_per_year_jobs,
+    n_stocks_per_year_jobs,
+    render_figures,
+)
+from main_code.tables import (
+    create_ea_regression_table,
+    oos_predictors_table,
+    oos_regression_example,
+)
+from main_code.utils import (
+    clear_dataset_cache,
+    configure_dataset_cache,
+    configure_pyplot,
+    get_latest_file,
+    timestamp_file,
 )
-from main_code.tables import create_ea_regression_table, oos_regression_example
-from main_code.utils import configure_pyplot, get_latest_file, timestamp_file
 
 load_dotenv()
 
@@ -74,16 +94,48 @@ def get_credentials() -> Tuple[Union[str, None], Union[str, None], Union[str, No
     return fred_api_key, wrds_username, wrds_password
 
 
+def with_risk_characteristics(panel: pd.DataFrame, risk: DictConfig) -> pd.DataFrame:
+    # adds the configured rolling loadings and ivol if the panel does not have them
+    models, windows = list(risk.models), list(risk.windows)
+    if not models or set(risk_columns(models, windows)) <= set(panel.columns):
+        return panel
+    logging.info("Adding rolling risk characteristics to the panel...")
+    return add_risk_characteristics(panel, models, windows, min_obs=risk.min_obs)
+
+
+def with_fundamentals(
+    panel: pd.DataFrame, fundamentals: DictConfig, download_dir: Path
+) -> pd.DataFrame:
+    # adds the configured point-in-time Compustat items if the panel does not have them
+    quarterly = list(fundamentals.quarterly_items)
+    annual = list(fundamentals.annual_items)
+    columns = quarterly + ["datadate_q"] * bool(quarterly)
+    columns += annual + ["datadate_a"] * bool(annual)
+    if set(columns) <= set(panel.columns):
+        return panel
+    logging.info("Adding point-in-time Compustat items to the panel...")
+    return add_fundamentals(
+        panel.drop(columns=[c for c in columns if c in panel]),
+        download_dir,
+        quarterly_items=quarterly,
+        annual_items=annual,
+        quarterly_lag_months=fundamentals.quarterly_lag_months,
+        annual_lag_months=fundamentals.annual_lag_months,
+    )
+
+
 @hydra.main(version_base=None, config_path="./conf", config_name="config")
 def my_app(cfg: DictConfig):
     start_time = time.time()
     logging.getLogger().setLevel(cfg.logging_level)
 
-    configure_pyplot(
-        font_family=cfg.matplotlib.font.family,
-        font_serif=cfg.matplotlib.font.serif,
-        font_sans_serif=cfg.matplotlib.font.sans_serif,
-    )
+    font = OmegaConf.to_container(cfg.matplotlib.font)
+    pyplot_style = {
+        "font_family": font["family"],
+        "font_serif": font["serif"],
+        "font_sans_serif": font["sans_serif"],
+    }
+    configure_pyplot(**pyplot_style)
 
     (
         fig_dir,
@@ -99,6 +151,9 @@ def my_app(cfg: DictConfig):
 
     fred_api_key, wrds_username, wrds_password = get_credentials()
 
+    # files read by several steps are kept in memory until the data are built
+    configure_dataset_cache(int(cfg.data.dataset_cache_gb * 2**30))
+
     panel_path = clean_dir / "panel_data.parquet"
     event_path = clean_dir / "event_earnings_data.parquet"
 
@@ -113,35 +168,114 @@ def my_app(cfg: DictConfig):
             wrds_password=wrds_password,
         )
 
+    if cfg.preprocess.build_iclink:
+        logging.info("Building IBES-CRSP link...")
+        build_iclink(download_dir, restricted_dir)
+
     if cfg.preprocess.compute_earning_surprises:
         logging.info("Computing earning surprises...")
-        ea_surprises = compute_earning_surprises(download_dir, restricted_dir)
+        ea_surprises = compute_earning_surprises(
+            download_dir,
+            restricted_dir,
+            backend=cfg.preprocess.surprises_backend,
+            temp_dir=tmp_dir,
+            memory_limit=cfg.preprocess.duckdb_memory_limit,
+        )
         ea_surprises_path = preprocess_dir / "ibes_sue.parquet"
         ea_surprises.to_parquet(
             timestamp_file(ea_surprises_path), index=False, engine="pyarrow"
         )
         logging.info(f"Earning surprises saved to {ea_surprises_path}")
 
-    if cfg.tasks.build_panel:
+    if cfg.preprocess.characteristics:
+        for frequency in cfg.preprocess.characteristics:
+            logging.info(f"Computing {frequency} Compustat characteristics...")
+            characteristics_table(download_dir, preprocess_dir, frequency)
+
+    if cfg.tasks.build_panel and cfg.tasks.build_panel_chunk_months:
+        if cfg.tasks.panel_backend != "pandas":
+            raise ValueError(
+                "The chunked panel build only runs with the pandas backend, "
+                "set tasks.build_panel_chunk_months to 0 to use "
+                f"panel_backend={cfg.tasks.panel_backend}"
+            )
+        # build the panel by chunks of CRSP data straight to disk
+        logging.info("Building panel data by chunks...")
+        panel_file = build_panel_chunked(
+            download_dir,
+            open_dir,
+            restricted_dir,
+            clean_dir,
+            preprocess_dir,
+            timestamp_file(panel_path),
+            chunk_months=cfg.tasks.build_panel_chunk_months,
+            # added to each chunk, after the rows of the longest risk window
+            add_columns=lambda chunk: with_fundamentals(
+                with_risk_characteristics(chunk, cfg.risk),
+                cfg.fundamentals,
+                download_dir,
+            ),
+            lookback_days=max(cfg.risk.windows) if cfg.risk.models else 0,
+        )
+        panel_version = panel_file.stem
+        logging.info(f"Panel data saved to {panel_path}")
+
+        # only load the panel if a later step uses it
+        panel_needed = (
+            cfg.tasks.build_event_data
+            or cfg.tasks.build_matrix_store
+            or cfg.tasks.build_return_index
+            or cfg.figures.n_stocks_per_year
+            or cfg.figures.n_earnings_per_year
+            or cfg.tables.ea_regression
+        )
+        panel = pd.read_parquet(panel_file) if panel_needed else None
+
+    elif cfg.tasks.build_panel:
         # build panel data
         logging.info("Building panel data...")
-        panel = build_panel(
+        build = (
+            build_panel_polars if cfg.tasks.panel_backend == "polars" else build_panel
+        )
+        panel = build(
             download_dir, open_dir, restricted_dir, clean_dir, preprocess_dir
         )
         logging.info(f"Panel built. Shape: {panel.shape}")
+        panel = with_risk_characteristics(panel, cfg.risk)
+        panel = with_fundamentals(panel, cfg.fundamentals, download_dir)
 
+        # version of the panel, keys the cached plot data
+        panel_version = None
         if cfg.tasks.save_panel:
             # save panel data
-
-            panel.to_parquet(timestamp_file(panel_path), index=False, engine="pyarrow")
+            panel_file = timestamp_file(panel_path)
+            panel.to_parquet(panel_file, index=False, engine="pyarrow")
+            panel_version = panel_file.stem
             logging.info(f"Panel data saved to {panel_path}")
 
     elif cfg.tasks.load_panel:
         # load existing panel data
-        panel = pd.read_parquet(get_latest_file(panel_path))
+        panel_file = get_latest_file(panel_path)
+        panel = pd.read_parquet(panel_file)
+        panel_version = panel_file.stem
         logging.info(f"Loaded existing panel data from {panel_path}")
     else:
         panel = None
+        # figures can still use plot data cached from the latest panel
+        panel_file = get_latest_file(panel_path)
+        panel_version = panel_file.stem if panel_file else None
+
+    if cfg.tasks.build_matrix_store:
+        if panel is None:
+            raise ValueError("Panel data is required to build the matrix store")
+        logging.info("Building date x permno matrix store...")
+        build_matrix_store(panel, clean_dir / "matrix_store", version=panel_version)
+
+    if cfg.tasks.build_return_index:
+        if panel is None:
+            raise ValueError("Panel data is required to build the return index")
+        logging.info("Building cumulative log-return index...")
+        build_return_index(panel, clean_dir / "return_index", version=panel_version)
 
     if cfg.tasks.build_event_data:
         if panel is None:
@@ -150,58 +284,81 @@ def my_app(cfg: DictConfig):
         logging.info("Building event earnings data...")
         event_data = build_event_earnings_data(panel)
 
+        event_version = None
         if cfg.tasks.save_event_data:
             # save event earnings data
-            event_data.to_parquet(
-                timestamp_file(event_path), index=False, engine="pyarrow"
-            )
+            event_file = timestamp_file(event_path)
+            event_data.to_parquet(event_file, index=False, engine="pyarrow")
+            event_version = event_file.stem
             logging.info(f"Event earnings data saved to {event_path}")
 
     elif cfg.tasks.load_event_data:
         # load existing event earnings data
-        event_data = pd.read_parquet(get_latest_file(event_path))
+        event_file = get_latest_file(event_path)
+        event_data = pd.read_parquet(event_file)
+        event_version = event_file.stem
         logging.info(f"Loaded existing event earnings data from {event_path}")
     else:
         event_data = None
+        event_file = get_latest_file(event_path)
+        event_version = event_file.stem if event_file else None
+
+    clear_dataset_cache()
 
-    # Figure (requires panel)
+    # Figures: the plot data are computed here (or read from the plot data cached
+    # for the same panel / event data version) and the figures rendered together
+    figure_jobs = []
+
+    # Figure (requires panel or its cached plot data)
     if cfg.figures.n_stocks_per_year:
-        if panel is None:
-            raise ValueError("Panel data required for n_stocks_per_year figure")
         logging.info("Creating figure: Number of stocks per year...")
-        plot_n_stocks_per_year(panel, fig_dir)
+        figure_jobs += n_stocks_per_year_jobs(panel, fig_dir, panel_version)
 
     if cfg.figures.n_earnings_per_year:
-        if panel is None:
-            raise ValueError("Panel data required for n_earnings_per_year figure")
         logging.info("Creating figure: Number of earnings per year...")
-        plot_n_earnings_per_year(panel, fig_dir)
+        figure_jobs += n_earnings_per_year_jobs(panel, fig_dir, panel_version)
 
     if cfg.figures.event_study_earnings:
-        if event_data is None:
-            raise ValueError("event data required for event_study_earnings figure")
         logging.info("Creating figure: Event study around earnings announcements...")
-        plot_event_study_earnings(event_data, fig_dir)
+        figure_jobs += event_study_earnings_jobs(event_data, fig_dir, event_version)
         
     if cfg.figures.event_study_ann_ret:
-        if event_data is None:
-            raise ValueError("event data required for event_study_ann_ret figure")
         logging.info("Creating figure: Event study by earnings announcement return quintile...")
-        plot_event_study_earnings_ann_ret(event_data, fig_dir)
+        figure_jobs += event_study_ann_ret_jobs(event_data, fig_dir, event_version)
+
+    if figure_jobs:
+        logging.info(f"Rendering {len(figure_jobs)} figures...")
+        render_figures(figure_jobs, style=pyplot_style)
 
     # Regression (requires panel)
     if cfg.tables.ea_regression:
         if panel is None:
             raise ValueError("Panel data required for ea_regression table")
         logging.info("Creating regression table: EA effect on excess returns...")
-        create_ea_regression_table(panel, tab_dir)
+        create_ea_regression_table(
+            panel, tab_dir, cache_dir=preprocess_dir / "regressions"
+        )
 
     # OOS regression (uses download_cache, no panel required)
     if cfg.tables.oos_exmkt_vrp:
         logging.info(
             "Creating OOS regression tables: Forecasting excess market returns using VRP..."
         )
-        oos_regression_example(download_dir, tab_dir, fig_dir)
+        oos_regression_example(
+            download_dir,
+            tab_dir,
+            fig_dir,
+            cache_dir=preprocess_dir / "regressions",
+            bootstrap=cfg.tables.oos_bootstrap,
+            n_boot=cfg.tables.oos_bootstrap_n_boot,
+            bootstrap_method=cfg.tables.oos_bootstrap_method,
+        )
+
+    if cfg.tables.oos_exmkt_predictors:
+        logging.info(
+            "Creating OOS table: Univariate, kitchen-sink and combination forecasts..."
+        )
+        oos_predictors_table(download_dir, tab_dir, fig_dir)
 
     logging.info(f"Complete. Total runtime: {time.time() - start_time:.2f} seconds")
 
@@ -1,5 +1,22 @@
 from .download_data import download_files
 
-from .panel_data import build_panel
+from .panel_data import build_panel, build_panel_chunked
+from .panel_data_polars import build_panel_polars
 from .event_data import build_event_earnings_data
+from .matrix_store import (
+    build_matrix_store,
+    load_matrix_store,
+    long_to_matrix,
+    matrix_to_long,
+)
+from .characteristics import characteristics_table, compute_characteristics
+from .fundamentals import add_fundamentals, asof_fundamentals, point_in_time_store
+from .risk_characteristics import add_risk_characteristics, risk_columns
+from .return_index import (
+    build_return_index,
+    factor_window_returns,
+    load_return_index,
+    window_returns,
+)
+from .earnings.iclink import build_iclink
 from .earnings.ibes_ea_surp import compute_earning_surprises
\ No newline at end of file
@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..utils import get_latest_file, interval_join
+
+
+def compress_cfacshr(cfacshr: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compresses a daily CFACSHR file into runs of constant adjustment factor.
+
+    CFACSHR only changes on split and distribution events, so each permno is
+    described by a handful of (date, enddate, cfacshr) runs instead of one row per
+    trading day.
+
+    Args:
+        cfacshr (pd.DataFrame): daily file with permno, date and cfacshr columns.
+
+    Returns:
+        pd.DataFrame: runs with permno, date (first day), enddate (last day) and cfacshr columns.
+    """
+    cfacshr = cfacshr.sort_values(["permno", "date"], ignore_index=True)
+
+    permno = cfacshr["permno"].to_numpy()
+    value = cfacshr["cfacshr"].to_numpy(dtype=float)
+    # a new run starts when the permno or the factor changes (NaN runs included)
+    same_value = (value[1:] == value[:-1]) | (
+        np.isnan(value[1:]) & np.isnan(value[:-1])
+    )
+    new_run = np.r_[True, (permno[1:] != permno[:-1]) | ~same_value][: len(cfacshr)]
+
+    first = np.flatnonzero(new_run)
+    last = np.r_[first[1:] - 1, len(cfacshr) - 1][: len(first)]
+
+    return pd.DataFrame(
+        {
+            "permno": permno[first],
+            "date": cfacshr["date"].to_numpy()[first],
+            "enddate": cfacshr["date"].to_numpy()[last],
+            "cfacshr": value[first],
+        }
+    )
+
+
+def load_cfacshr(download_dir: Path) -> pd.DataFrame:
+    """
+    Loads the CFACSHR change points downloaded with `get_crsp_cfacshr`. Older download
+    caches only hold the daily file, which is compressed on the fly.
+
+    Args:
+        download_dir (Path): download cache directory
+
+    Returns:
+        pd.DataFrame: runs with permno, date, enddate and cfacshr columns.
+    """
+    file = get_latest_file(download_dir / "crsp_cfacshr_changes.parquet")
+    if file is not None:
+        return pd.read_parquet(file)
+
+    return compress_cfacshr(
+        pd.read_parquet(get_latest_file(download_dir / "crsp_cfacshr.parquet"))
+    )
+
+
+def lookup_cfacshr(
+    cfacshr: pd.DataFrame, permno: pd.Series, date: pd.Series
+) -> np.ndarray:
+    """
+    Returns the CFACSHR in effect for each (permno, date) pair.
+
+    For the dates the permno traded, the result matches a merge on the daily file.
+    It differs for the dates inside a run on which the permno did not trade
+    (weekends, holidays, missing days): the merge on the daily file gave NaN, the
+    lookup returns the factor of the run. Dates before the first or after the last
+    trading day of a permno are NaN.
+
+    Args:
+        cfacshr (pd.DataFrame): runs returned by `load_cfacshr`.
+        permno (pd.Series): permnos to look up.
+        date (pd.Series): dates to look up, aligned with `permno`.
+
+    Returns:
+        np.ndarray: the adjustment factors, aligned with the inputs.
+    """
+    queries = pd.DataFrame(
+        {
+            "permno": np.asarray(permno),
+            "query_date": np.asarray(date),
+            "row": np.arange(len(permno)),
+        }
+    )
+    matches = interval_join(
+        queries, cfacshr, on="permno", point="query_date", start="date", end="enddate"
+    )
+
+    out = np.full(len(queries), np.nan)
+    out[matches["row"].to_numpy()] = matches["cfacshr"].to_numpy()
+
+    return out
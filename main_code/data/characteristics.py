@@ -0,0 +1,241 @@
+"""
+Firm characteristics computed from the Compustat quarterly and annual files.
+
+Each characteristic, and each intermediate term shared by several of them, is a
+vectorized expression of other terms and Compustat items in `definitions`. The
+terms are evaluated on demand with memoization, so a term used by several
+characteristics (e.g. book equity in B/M and ROE) is computed once, and the lag of
+a term to the same fiscal period of a previous quarter or year is one lookup on
+(gvkey, fiscal period end). The items and formulas are the same for both
+frequencies, with the quarterly item names (atq for at, ...).
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..utils import get_latest_file, hash_files, read_dataset, timestamp_file
+
+SOURCES = {
+    "quarterly": "compustat_quarterly.parquet",
+    "annual": "compustat_annual.parquet",
+}
+CHARACTERISTICS = [
+    "me",
+    "size",
+    "be",
+    "bm",
+    "market_value",
+    "bm_ratio",
+    "op",
+    "gp",
+    "roe",
+    "investment",
+    "accruals",
+    "eps_growth",
+]
+CHARACTERISTICS_KEY = b"characteristics_inputs"
+# bump to recompute the cached tables when the definitions change
+DEFINITIONS_VERSION = 1
+
+
+def _first(*series: pd.Series) -> pd.Series:
+    # first non-missing value among the series
+    out = series[0]
+    for s in series[1:]:
+        out = out.fillna(s)
+    return out
+
+
+def definitions(frequency: str) -> dict:
+    """
+    Definitions of the characteristics and their intermediate terms. Each term is
+    a function of `t`, where t(name) returns a term or a Compustat item and
+    t(name, lag) its value `lag` months earlier for the same gvkey (NaN if that
+    fiscal period is missing).
+
+    Args:
+        frequency (str): "quarterly" or "annual".
+
+    Returns:
+        dict: term name -> function of t.
+    """
+    q = "q" if frequency == "quarterly" else ""
+    price = "prccq" if q else "prcc_f"
+    shares_primary = "cshprq" if q else "cshpri"
+    # one fiscal period, for the changes of the balance sheet items
+    period = 3 if q else 12
+
+    def change(t, item):
+        return t(item) - t(item, period)
+
+    return {
+        # size: market equity at the fiscal period end and its log
+        "me": lambda t: t(price) * t(f"csho{q}"),
+        "size": lambda t: np.log(t("me").where(t("me") > 0)),
+        # book equity (Fama-French): stockholders' equity, or common equity plus
+        # preferred stock, or assets minus liabilities, plus deferred taxes minus
+        # preferred stock
+        "pref": lambda t: t(f"pstk{q}").fillna(0),
+        "be": lambda t: _first(
+            t(f"seq{q}"), t(f"ceq{q}") + t("pref"), t(f"at{q}") - t(f"lt{q}")
+        )
+        + t(f"txditc{q}").fillna(0)
+        - t("pref"),
+        "bm": lambda t: t("be").where(t("be") > 0) / t("me"),
+        # the assets to market value of load_quarterly_compustat_data
+        "market_value": lambda t: t(price) * t(shares_primary)
+        + t(f"dlc{q}").fillna(0)
+        + t(f"dltt{q}").fillna(0)
+        + t(f"pstk{q}").fillna(0)
+        - t(f"txditc{q}").fillna(0),
+        "bm_ratio": lambda t: t(f"at{q}") / t("market_value"),
+        # profitability: operating (Fama-French), gross and return on lagged equity
+        "op": lambda t: (
+            t(f"revt{q}")
+            - t(f"cogs{q}").fillna(0)
+            - t(f"xsga{q}").fillna(0)
+            - t(f"xint{q}").fillna(0)
+        )
+        / t("be").where(t("be") > 0),
+        "gp": lambda t: (t(f"revt{q}") - t(f"cogs{q}")) / t(f"at{q}"),
+        "roe": lambda t: t(f"ib{q}") / t("be", period).where(t("be", period) > 0),
+        # investment: growth of total assets over a year
+        "investment": lambda t: t(f"at{q}") / t(f"at{q}", 12) - 1,
+        # accruals (Sloan): change in non-cash working capital minus depreciation,
+        # over the average total assets
+        "accruals": lambda t: (
+            change(t, f"act{q}")
+            - change(t, f"che{q}")
+            - change(t, f"lct{q}")
+            + change(t, f"dlc{q}").fillna(0)
+            + change(t, f"txp{q}").fillna(0)
+            - t(f"dp{q}")
+        )
+        / ((t(f"at{q}") + t(f"at{q}", period)) / 2),
+        # EPS growth: change in split-adjusted EPS from the same period of the
+        # previous year, over the split-adjusted price (sue1 on the primary basis)
+        "eps_adj": lambda t: t(f"epspx{q}") / t(f"ajex{q}"),
+        "eps_growth": lambda t: (t("eps_adj") - t("eps_adj", 12))
+        / (t(price) / t(f"ajex{q}")),
+    }
+
+
+def compute_characteristics(
+    compu: pd.DataFrame, frequency: str, names: Optional[list] = None
+) -> pd.DataFrame:
+    """
+    Evaluates characteristics on Compustat data in one pass: each intermediate term
+    and each lag is computed once whatever the number of characteristics using it.
+    The rows keep the order of `compu`; duplicated (gvkey, datadate) rows get the
+    same lagged values.
+
+    Args:
+        compu (pd.DataFrame): Compustat data with gvkey, datadate and the items.
+        frequency (str): "quarterly" or "annual".
+        names (list, optional): characteristics to compute. Defaults to None (the characteristics of CHARACTERISTICS whose items are in compu).
+
+    Returns:
+        pd.DataFrame: gvkey, datadate and the characteristics, with the index of compu.
+    """
+    terms = definitions(frequency)
+    memo = {}
+    lag_rows = {}
+
+    # fiscal period of each row, in months
+    period = compu["datadate"].dt.year * 12 + compu["datadate"].dt.month
+    periods = pd.MultiIndex.from_arrays([compu["gvkey"], period])
+    # position of the last row of each (gvkey, period)
+    last_rows = ~periods.duplicated(keep="last")
+    unique_periods = periods[last_rows]
+    last_positions = np.flatnonzero(last_rows)
+
+    def t(name: str, lag: int = 0) -> pd.Series:
+        if lag:
+            if lag not in lag_rows:
+                target = pd.MultiIndex.from_arrays([compu["gvkey"], period - lag])
+                rows = unique_periods.get_indexer(target)
+                lag_rows[lag] = np.where(rows >= 0, last_positions[rows], -1)
+            rows = lag_rows[lag]
+            values = t(name).to_numpy()[np.maximum(rows, 0)]
+            return pd.Series(values, index=compu.index).where(rows >= 0)
+        if name not in memo:
+            if name in terms:
+                memo[name] = terms[name](t)
+            elif name in compu:
+                memo[name] = compu[name].astype(float)
+            else:
+                raise KeyError(f"Compustat item {name} missing for {frequency} data")
+        return memo[name]
+
+    out = {}
+    for name in names or CHARACTERISTICS:
+        try:
+            out[name] = t(name)
+        except KeyError as e:
+            if names:
+                raise
+            logging.warning(f"Skipping {name}: {e.args[0]}")
+    return compu[["gvkey", "datadate"]].assign(**out)
+
+
+def characteristics_table(
+    download_dir: Path,
+    cache_dir: Path,
+    frequency: str = "quarterly",
+    names: Optional[list] = None,
+    force: bool = False,
+) -> pd.DataFrame:
+    """
+    Characteristics of the latest Compustat file of the frequency, cached as a
+    timestamped `characteristics_{frequency}.parquet` in `cache_dir`. The version of
+    the definitions, the digest of the Compustat file and the characteristics are
+    stored in the parquet metadata and the table is only recomputed when they
+    change.
+
+    Args:
+        download_dir (Path): download cache directory.
+        cache_dir (Path): directory of the cached table, e.g. the preprocess cache.
+        frequency (str, optional): "quarterly" or "annual". Defaults to "quarterly".
+        names (list, optional): characteristics to compute. Defaults to None (all the characteristics available).
+        force (bool, optional): recompute the table even if the inputs did not change. Defaults to False.
+
+    Returns:
+        pd.DataFrame: gvkey, datadate and the characteristics.
+    """
+    source = download_dir / SOURCES[frequency]
+    source_file = get_latest_file(source)
+    if source_file is None:
+        raise FileNotFoundError(f"No version of {source} found")
+    inputs = ":".join(
+        [
+            str(DEFINITIONS_VERSION),
+            hash_files(source_file),
+            ",".join(names or CHARACTERISTICS),
+        ]
+    )
+
+    cache_file = cache_dir / f"characteristics_{frequency}.parquet"
+    latest = get_latest_file(cache_file)
+    if latest is not None and not force:
+        metadata = pq.read_schema(latest).metadata or {}
+        if metadata.get(CHARACTERISTICS_KEY) == inputs.encode():
+            logging.info(f"{frequency} characteristics up to date ({latest})")
+            return pd.read_parquet(latest)
+
+    chars = compute_characteristics(read_dataset(source), frequency, names)
+    chars = chars.reset_index(drop=True)
+
+    table = pa.Table.from_pandas(chars, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, CHARACTERISTICS_KEY: inputs.encode()}
+    )
+    path = timestamp_file(cache_file)
+    pq.write_table(table, path)
+    logging.info(f"{frequency} characteristics saved to {path}")
+    return chars
@@ -9,6 +9,7 @@ from .crsp import (
     get_crsp_daily,
     get_crsp_dates,
     get_crsp_monthly,
+    get_crsp_stocknames,
 )
 from .famafrench import (
     get_ff5_factors,
@@ -18,6 +19,6 @@ from .famafrench import (
     get_ff_size_bp,
     get_ff_umd_factor_monthly,
 )
-from .ibes import get_ibes_actuals, get_ibes_estimates
+from .ibes import get_ibes_actuals, get_ibes_estimates, get_ibes_id
 from .vrp import get_vrp_monthly
 from .yahoo import get_vix_daily
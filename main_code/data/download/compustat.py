@@ -14,7 +14,8 @@ def get_compustat_quarterly(
     # retrieve data
     query = f"""
                                 select gvkey, fyearq, fqtr, conm, datadate, rdq, epsfxq, epspxq, cshoq, prccq, dlcq, dlttq, pstkq, txditcq,
-                                ajexq, spiq, cshprq, cshfdq, saleq, atq, fyr, ffoq, fdateq, datafqtr
+                                ajexq, spiq, cshprq, cshfdq, saleq, atq, fyr, ffoq, fdateq, datafqtr,
+                                seqq, ceqq, ltq, ibq, revtq, cogsq, xsgaq, xintq, actq, cheq, lctq, txpq, dpq
                                 from comp.fundq 
                                 where consol='C' and popsrc='D' and indfmt='INDL' and datafmt='STD'
                                 and datadate between '{START_DATE}' and '{END_DATE}' 
@@ -39,7 +40,8 @@ def get_compustat_annual(
     # retrieve data
     query = f"""
                                 select gvkey, fyear, conm, datadate, epsfx, epspx, csho, prcc_c, prcc_f, dlc, dltt, pstk, txditc,
-                                ajex, spi, cshpri, cshfd, sale, at, fyr, ffo, fdate
+                                ajex, spi, cshpri, cshfd, sale, at, fyr, ffo, fdate,
+                                seq, ceq, lt, ib, revt, cogs, xsga, xint, act, che, lct, txp, dp
                                 from comp.funda
                                 where consol='C' and popsrc='D' and indfmt='INDL' and datafmt='STD'
                                 and datadate between '{START_DATE}' and '{END_DATE}'
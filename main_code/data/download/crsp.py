@@ -124,6 +124,9 @@ def get_crsp_cfacshr(
 ) -> pd.DataFrame:
     """
     Retrieve CRSP adjustment factors for shares outstanding.
+    CFACSHR only changes on split and distribution events, so only the runs of
+    constant factor are kept: one row per permno and run with its first (date) and
+    last (enddate) trading day. See cfacshr.py for the lookup.
 
     Args:
         wrds_username (str): A WRDS username to use for the connection.
@@ -135,13 +138,21 @@ def get_crsp_cfacshr(
 
     conn = wrds.Connection(wrds_username=wrds_username, wrds_password=wrds_password)
 
+    # gaps-and-islands: consecutive days with the same factor share the same run
     cfacshr = conn.raw_sql(
         f"""
-                            select permno, date, cfacshr
-                            from crsp.dsf
-                            where date between '{CRSP_START_DATE}' and '{CRSP_END_DATE}'
+                            select permno, min(date) as date, max(date) as enddate, cfacshr
+                            from (
+                                select permno, date, cfacshr,
+                                row_number() over (partition by permno order by date)
+                                - row_number() over (partition by permno, cfacshr order by date) as run
+                                from crsp.dsf
+                                where date between '{CRSP_START_DATE}' and '{CRSP_END_DATE}'
+                            ) as a
+                            group by permno, cfacshr, run
+                            order by permno, date
                             """,
-        date_cols=["date"],
+        date_cols=["date", "enddate"],
     )
 
     conn.close()
@@ -170,3 +181,25 @@ def get_crsp_dates(wrds_username: str, wrds_password: str) -> pd.DataFrame:
 
     conn.close()
     return crsp_dates
+
+
+def get_crsp_stocknames(wrds_username: str, wrds_password: str) -> pd.DataFrame:
+    """
+    Retrieve the CRSP stock names history. It is used to build the IBES-CRSP link (see iclink.py).
+
+    Args:
+        wrds_username (str): A WRDS username to use for the connection.
+        wrds_password (str): A WRDS password to use for the connection.
+    """
+    conn = wrds.Connection(wrds_username=wrds_username, wrds_password=wrds_password)
+
+    stocknames = conn.raw_sql(
+        """
+                                select permno, ticker, ncusip, comnam, namedt, nameenddt
+                                from crsp.stocknames
+                            """,
+        date_cols=["namedt", "nameenddt"],
+    )
+
+    conn.close()
+    return stocknames
@@ -71,3 +71,26 @@ def get_ibes_actuals(
 
     conn.close()
     return ibes_act
+
+
+def get_ibes_id(wrds_username: str, wrds_password: str) -> pd.DataFrame:
+    """
+    Get the IBES identifier file from WRDS. It is used to build the IBES-CRSP link (see iclink.py).
+
+    Args:
+        wrds_username (str): A WRDS username to use for the connection.
+        wrds_password (str): A WRDS password to use for the connection.
+    """
+
+    conn = wrds.Connection(wrds_username=wrds_username, wrds_password=wrds_password)
+
+    ibes_id = conn.raw_sql(
+        """
+                        select ticker, cusip, cname, oftic, sdates, usfirm
+                        from ibes.id
+                        """,
+        date_cols=["sdates"],
+    )
+
+    conn.close()
+    return ibes_id
@@ -17,6 +17,7 @@ from .download import (
     get_crsp_daily,
     get_crsp_dates,
     get_crsp_monthly,
+    get_crsp_stocknames,
     get_ff5_factors,
     get_ff5_factors_monthly,
     get_ff_25_size_bm_portfolios_daily,
@@ -25,6 +26,7 @@ from .download import (
     get_ff_umd_factor_monthly,
     get_ibes_actuals,
     get_ibes_estimates,
+    get_ibes_id,
     get_vix_daily,
     get_vrp_monthly,
 )
@@ -188,7 +190,7 @@ def download_files(
             ),
         },
         {
-            "file": cache_dir / "crsp_cfacshr.parquet",
+            "file": cache_dir / "crsp_cfacshr_changes.parquet",
             "name": "CRSP Adjustment Factors",
             "download_func": partial(
                 get_crsp_cfacshr,
@@ -205,6 +207,15 @@ def download_files(
                 wrds_password=wrds_password,
             ),
         },
+        {
+            "file": cache_dir / "crsp_stocknames.parquet",
+            "name": "CRSP Stock Names",
+            "download_func": partial(
+                get_crsp_stocknames,
+                wrds_username=wrds_username,
+                wrds_password=wrds_password,
+            ),
+        },
         # IBES tasks
         {
             "file": cache_dir / "ibes_estimates.parquet",
@@ -224,6 +235,15 @@ def download_files(
                 wrds_password=wrds_password,
             ),
         },
+        {
+            "file": cache_dir / "ibes_id.parquet",
+            "name": "IBES Identifiers",
+            "download_func": partial(
+                get_ibes_id,
+                wrds_username=wrds_username,
+                wrds_password=wrds_password,
+            ),
+        },
     ]
 
     for task in tqdm(DOWNLOAD_TASKS, desc="Downloading"):
@@ -0,0 +1,122 @@
+"""
+DuckDB backend of the analyst estimates step of `compute_earning_surprises`.
+
+The IBES detail file is by far the largest input of the surprises. Here it is
+scanned, linked to CRSP and reduced to the latest estimate of each analyst forecast
+series by DuckDB, directly from the Parquet cache, on all cores and spilling to
+disk beyond the memory limit. The result is identical to `analyst_estimates` and
+the rest of the pipeline runs unchanged on it.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from main_code.utils import get_latest_file
+
+from .revisions import GROUP_KEYS, ORDER_KEYS
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def analyst_estimates_duckdb(
+    download_dir: Path,
+    link: pd.DataFrame,
+    temp_dir: Optional[Path] = None,
+    memory_limit: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Same as `analyst_estimates`, run by DuckDB over `ibes_estimates.parquet`.
+
+    The estimates are joined to the links whose [linkdt, linkenddt] interval
+    contains the announcement date, the reporting basis of each firm-fiscal period
+    is the one used by most estimates, and every column of a forecast series takes
+    its last non-missing value in revision order. Ties in the revision order are
+    broken by the position in the estimates file and in the link table, as the
+    stable sort of `build_revision_panel`.
+
+    Args:
+        download_dir (Path): download cache directory.
+        link (pd.DataFrame): IBES-CRSP-Compustat link from `merge_link_tables`.
+        temp_dir (Path, optional): directory where DuckDB spills. Defaults to None (DuckDB default).
+        memory_limit (str, optional): DuckDB memory limit, e.g. "8GB". Defaults to None (80% of the RAM).
+
+    Returns:
+        pd.DataFrame: one row per analyst forecast series, sorted by series.
+    """
+    import duckdb
+
+    file = get_latest_file(download_dir / "ibes_estimates.parquet")
+    est_cols = pq.read_schema(file).names
+    link_cols = [c for c in link.columns if c != "ticker"]
+    # columns of the revision panel (the estimates, the link and the basis)
+    panel_cols = [c for c in est_cols if c not in ("pdf", "fpi")] + link_cols
+    value_cols = [c for c in panel_cols if c not in GROUP_KEYS] + ["basis"]
+
+    order = ", ".join(f"{_ident(c)} ASC NULLS LAST" for c in ORDER_KEYS)
+    order += ", _est_row, _link_row"
+    # position in revision order, the last non-missing value has the largest
+    last = ",\n".join(
+        f"arg_max({_ident(c)}, _rev) FILTER (WHERE {_ident(c)} IS NOT NULL)"
+        f" AS {_ident(c)}"
+        for c in value_cols
+    )
+    keys = ", ".join(_ident(c) for c in GROUP_KEYS)
+
+    query = f"""
+        WITH est AS (
+            SELECT * EXCLUDE (file_row_number), file_row_number AS _est_row
+            FROM read_parquet($file, file_row_number = true)
+        ),
+        links AS (
+            SELECT * FROM link_df
+            WHERE linkdt IS NOT NULL AND linkenddt IS NOT NULL
+        ),
+        matched AS (
+            SELECT est.*, {", ".join(f"links.{_ident(c)}" for c in link_cols)},
+                links._link_row
+            FROM est
+            JOIN links
+                ON est.ticker = links.ticker
+                AND est.anndats BETWEEN links.linkdt AND links.linkenddt
+        ),
+        counts AS (
+            SELECT ticker, fpedats,
+                count(*) FILTER (WHERE pdf = 'P') AS p_count,
+                count(*) FILTER (WHERE pdf = 'D') AS d_count
+            FROM matched
+            WHERE ticker IS NOT NULL AND fpedats IS NOT NULL
+            GROUP BY ticker, fpedats
+        ),
+        panel AS (
+            SELECT matched.*,
+                CASE WHEN coalesce(p_count, 0) > coalesce(d_count, 0)
+                    THEN 'P' ELSE 'D' END AS basis,
+                row_number() OVER (ORDER BY {order}) AS _rev
+            FROM matched
+            LEFT JOIN counts USING (ticker, fpedats)
+            WHERE {" AND ".join(f"{_ident(c)} IS NOT NULL" for c in GROUP_KEYS)}
+        )
+        SELECT {keys},
+            {last}
+        FROM panel
+        GROUP BY {keys}
+        ORDER BY {", ".join(f"{_ident(c)} ASC" for c in GROUP_KEYS)}
+    """
+
+    # preserving the insertion order is not needed, the output is sorted
+    config = {"preserve_insertion_order": False}
+    if temp_dir is not None:
+        config["temp_directory"] = str(temp_dir)
+    if memory_limit is not None:
+        config["memory_limit"] = memory_limit
+    con = duckdb.connect(config=config)
+    try:
+        con.register("link_df", link.assign(_link_row=range(len(link))))
+        return con.execute(query, {"file": str(file)}).df()
+    finally:
+        con.close()
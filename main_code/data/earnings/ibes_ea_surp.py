@@ -1,10 +1,16 @@
 import datetime
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 
-from main_code.utils import get_latest_file
+from main_code.utils import get_latest_file, interval_join, read_dataset
+
+from ..cfacshr import load_cfacshr, lookup_cfacshr
+from .ibes_duckdb import analyst_estimates_duckdb
+from .iclink import load_iclink
+from .revisions import build_revision_panel, last_estimates
 
 
 def load_compustat_fundq(path: Path, constraint: bool = True) -> pd.DataFrame:
@@ -12,7 +18,7 @@ def load_compustat_fundq(path: Path, constraint: bool = True) -> pd.DataFrame:
     Retrieve Compustat quarterly fundamental data.
     """
 
-    fundq = pd.read_parquet(get_latest_file(path / "compustat_quarterly.parquet"))
+    fundq = read_dataset(path / "compustat_quarterly.parquet")
     # impove total assets >0, no missing sales and datafqtr
     if constraint:
         return fundq.loc[
@@ -29,7 +35,7 @@ def merge_link_tables(
     Retrieve the CRSP-Compustat link table and merge it with the IBES link table.
 
     Args:
-        restricted_dir (Path): path to save directory
+        restricted_dir (Path): directory holding the iclink built by build_iclink
         end_date (str): the end data of the sample period that replaces the NaT values in the linkenddt column
         score_mapping (int): the maximum "matching" score to keep in the IBES link table. See code iclink.py for details.
 
@@ -38,45 +44,50 @@ def merge_link_tables(
     """
 
     # Load the iclink data
-    iclink = pd.read_parquet(restricted_dir / "iclink.parquet")
-    iclink = iclink[iclink["score"] <= score_mapping]
+    iclink = load_iclink(restricted_dir, score_mapping=score_mapping)
 
     # load crsp-gvkey link
-    gvkey_link = pd.read_parquet(
-        get_latest_file(download_dir / "crsp_compu_link_table.parquet")
+    gvkey_link = read_dataset(
+        download_dir / "crsp_compu_link_table.parquet",
+        columns=["gvkey", "lpermno", "linkdt", "linkenddt"],
     )
     gvkey_link = gvkey_link.rename(columns={"lpermno": "permno"})
     gvkey_link = gvkey_link[["gvkey", "permno", "linkdt", "linkenddt"]]
     gvkey_link["linkenddt"] = gvkey_link["linkenddt"].fillna(
         pd.to_datetime(end_date, format="%m/%d/%Y")
     )
-    iclink = iclink[["ticker", "permno"]].drop_duplicates()
 
     return pd.merge(iclink, gvkey_link, how="left", on="permno")
 
 
-def compute_earning_surprises(download_dir: Path, restricted_dir: Path) -> pd.DataFrame:
-    """
-    Get IBES surprises and earnings announcement dates.
-    Code is adapted https://www.fredasongdrechsler.com/data-crunching/pead
+def analyst_estimates(download_dir: Path, link: pd.DataFrame) -> pd.DataFrame:
     """
+    Latest estimate of each analyst forecast series, linked to CRSP and Compustat,
+    with the reporting basis (primary/diluted) used by most analysts of the firm
+    fiscal period.
 
-    end_date = "12/31/2025"
+    Args:
+        download_dir (Path): download cache directory
+        link (pd.DataFrame): the link table returned by merge_link_tables
 
-    # retrieve link  table
-    link = merge_link_tables(restricted_dir, download_dir, end_date)
+    Returns:
+        pd.DataFrame: one row per ticker, fpedats, estimator and analys
+    """
     # load analyst estimates
     ibes_ana_est = pd.read_parquet(
         get_latest_file(download_dir / "ibes_estimates.parquet")
     )
 
-    # Merge the iclink data
-    ibes_ana_est = pd.merge(ibes_ana_est, link, how="left", on="ticker")
-    # Keep stocks for which the announcement date is between the linkdt and linkenddt
-    ibes_ana_est = ibes_ana_est.loc[
-        (ibes_ana_est["linkdt"] <= ibes_ana_est["anndats"])
-        & (ibes_ana_est["anndats"] <= ibes_ana_est["linkenddt"])
-    ]
+    # Merge the iclink data, keeping stocks for which the announcement date
+    # is between the linkdt and linkenddt
+    ibes_ana_est = interval_join(
+        ibes_ana_est,
+        link,
+        on="ticker",
+        point="anndats",
+        start="linkdt",
+        end="linkenddt",
+    )
 
     # Count number of estimates reported on primary/diluted basis
     p_sub = ibes_ana_est[["ticker", "fpedats", "pdf"]].loc[ibes_ana_est.pdf == "P"]
@@ -105,25 +116,44 @@ def compute_earning_surprises(download_dir: Path, restricted_dir: Path) -> pd.Da
 
     ibes["basis"] = np.where(ibes.p_count > ibes.d_count, "P", "D")
 
-    ibes = ibes.sort_values(
-        by=[
-            "ticker",
-            "fpedats",
-            "estimator",
-            "analys",
-            "anndats",
-            "anntims",
-            "revdats",
-            "revtims",
-        ]
-    ).drop(columns=["p_count", "d_count", "pdf", "fpi"])
+    # Sort by ticker fpedats estimator analys and announcement/revision time
+    ibes = build_revision_panel(ibes.drop(columns=["p_count", "d_count", "pdf", "fpi"]))
 
     # Keep the latest observation for a given analyst
-    # Group by company fpedats estimator analys then pick the last record in the group
+    # Pick the last record of each ticker fpedats estimator analys series
+
+    return last_estimates(ibes)
 
-    ibes = (
-        ibes.groupby(["ticker", "fpedats", "estimator", "analys"]).last().reset_index()
-    )
+
+def compute_earning_surprises(
+    download_dir: Path,
+    restricted_dir: Path,
+    backend: str = "pandas",
+    temp_dir: Optional[Path] = None,
+    memory_limit: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Get IBES surprises and earnings announcement dates.
+    Code is adapted https://www.fredasongdrechsler.com/data-crunching/pead
+
+    The analyst estimates step, which reads the IBES detail file, can run on DuckDB
+    (backend="duckdb", see ibes_duckdb.py) with the same result, spilling to
+    `temp_dir` beyond `memory_limit`.
+    """
+
+    end_date = "12/31/2025"
+
+    # retrieve link  table
+    link = merge_link_tables(restricted_dir, download_dir, end_date)
+
+    if backend == "duckdb":
+        ibes = analyst_estimates_duckdb(
+            download_dir, link, temp_dir=temp_dir, memory_limit=memory_limit
+        )
+    elif backend == "pandas":
+        ibes = analyst_estimates(download_dir, link)
+    else:
+        raise ValueError(f"Unknown backend {backend}, use pandas or duckdb")
 
     # Link Estimates with Actuals #
     # Link Unadjusted estimates with Unadjusted actuals and CRSP permnos
@@ -204,13 +234,14 @@ def compute_earning_surprises(download_dir: Path, restricted_dir: Path) -> pd.Da
     tradedates = tradedates.loc[tradedates.groupby("anndats")["dgap"].idxmin()]
     tradedates = tradedates[["anndats", "date"]]
 
-    # merge the CRSP adjustment factors for all estimate and report dates
-    # extract CRSP adjustment factors
-    cfacshr = pd.read_parquet(get_latest_file(download_dir / "crsp_cfacshr.parquet"))
-    # Keep only the relevant columns
+    # look up the CRSP adjustment factors for all estimate and report dates
+    # from the CFACSHR change points (see cfacshr.py)
+    cfacshr = load_cfacshr(download_dir)
 
     ibes_anndats = pd.merge(ibes_anndats, tradedates, how="left", on=["anndats"])
-    ibes_anndats = pd.merge(ibes_anndats, cfacshr, how="left", on=["permno", "date"])
+    ibes_anndats["cfacshr"] = lookup_cfacshr(
+        cfacshr, ibes_anndats["permno"], ibes_anndats["date"]
+    )
 
     # Adjust Estimates with CFACSHR from crsp
     # Put the estimate on the same per share basis as
@@ -306,9 +337,7 @@ def compute_earning_surprises(download_dir: Path, restricted_dir: Path) -> pd.Da
 
     # Merge with Compustat Data  #
     # get items from fundq
-    fundq = pd.read_parquet(
-        get_latest_file(download_dir / "compustat_quarterly.parquet")
-    )
+    fundq = read_dataset(download_dir / "compustat_quarterly.parquet")
     # Keep only
 
     # Calculate link date ranges for givken gvkey and ticker combination
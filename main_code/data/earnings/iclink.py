@@ -16,143 +16,140 @@ Reference: https://wrds-www.wharton.upenn.edu/pages/support/applications/python-
 Python code adapted from: https://github.com/Feng-CityUHK/EquityCharacteristics/blob/master/pychars/iclink.py
 """
 
-import os
+import logging
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
-import wrds
-from dateutil.relativedelta import *
-from dotenv import load_dotenv
-from fuzzywuzzy import fuzz
-from pandas.tseries.offsets import *
-from pandasql import *
+import pyarrow as pa
+import pyarrow.parquet as pq
+from rapidfuzz import fuzz, process, utils
 
-load_dotenv()
+from main_code.utils import get_latest_file, hash_files, timestamp_file
 
-data_dir = Path(os.getenv("DATADIR"))
-open_dir = data_dir / "open/"
-restricted_dir = data_dir / "restricted/"
-clean_dir = data_dir / "clean/"
-WRDS_USERNAME = os.getenv("WRDS_USERNAME")
-WRDS_PASSWORD = os.getenv("WRDS_PASSWORD")
+# files in the download cache the link is built from
+ICLINK_INPUTS = ["ibes_id.parquet", "crsp_stocknames.parquet"]
+# parquet schema metadata key holding the digest of the inputs
+ICLINK_INPUTS_KEY = b"iclink_inputs"
 
 
-def score1(row, name_ratio_p10):
+def name_ratio(comnam: pd.Series, cname: pd.Series, workers: int = -1) -> np.ndarray:
     """
-    Calculates a score for a given row based on specific conditions.
+    Computes the token set ratio between CRSP and IBES company names, pair by pair.
+
+    The pairs are scored in a single batched call spread over `workers` threads
+    instead of one Python call per row. Names are preprocessed (lowercase,
+    non-alphanumeric characters removed) and scores rounded to integers as in
+    fuzzywuzzy's `fuzz.token_set_ratio`.
 
     Args:
-        row (pandas.Series): A row of data containing the necessary columns.
+        comnam (pd.Series): CRSP company names.
+        cname (pd.Series): IBES company names, aligned with `comnam`.
+        workers (int): number of threads, -1 uses all cores.
 
     Returns:
-        int: The calculated score.
+        np.ndarray: integer name ratio between 0 (no match) and 100 (perfect match).
+    """
+    if len(comnam) == 0:
+        return np.zeros(0, dtype=int)
+    scores = process.cpdist(
+        comnam.fillna("").astype(str).to_numpy(),
+        cname.fillna("").astype(str).to_numpy(),
+        scorer=fuzz.token_set_ratio,
+        processor=utils.default_process,
+        workers=workers,
+    )
+    return np.rint(scores).astype(int)
+
+
+def score1(link: pd.DataFrame, name_ratio_p10: float) -> np.ndarray:
+    """
+    Scores links by full CUSIP using the cusip date ranges and company names.
+
+    Args:
+        link (pd.DataFrame): links with fdate, ldate, namedt, nameenddt and name_ratio columns.
+        name_ratio_p10 (float): name ratio cutoff for a name match.
 
-    Raises:
-        None
+    Returns:
+        np.ndarray: the score (0 to 3) of each link.
     """
+    dates_match = (link["fdate"] <= link["nameenddt"]) & (
+        link["ldate"] >= link["namedt"]
+    )
+    names_match = link["name_ratio"] >= name_ratio_p10
 
-    if (
-        (row["fdate"] <= row["nameenddt"])
-        & (row["ldate"] >= row["namedt"])
-        & (row["name_ratio"] >= name_ratio_p10)
-    ):
-        return 0
-    elif (row["fdate"] <= row["nameenddt"]) & (row["ldate"] >= row["namedt"]):
-        return 1
-    elif row["name_ratio"] >= name_ratio_p10:
-        return 2
-    else:
-        return 3
-
-
-def score2(row, name_ratio_p10):
+    return np.select(
+        [dates_match & names_match, dates_match, names_match], [0, 1, 2], default=3
+    )
+
+
+def score2(link: pd.DataFrame, name_ratio_p10: float) -> np.ndarray:
     """
-    Calculates a score based on specific conditions involving company names, 6-digit CUSIPs, and name spelling distance.
+    Scores links by exchange ticker using 6-digit CUSIPs and company names.
 
     Args:
-        row (pandas.Series): A row of data containing the necessary columns.
+        link (pd.DataFrame): links with cusip6, ncusip6 and name_ratio columns.
+        name_ratio_p10 (float): name ratio cutoff for a name match.
 
     Returns:
-        int: The calculated score.
+        np.ndarray: the score (0, 4, 5 or 6) of each link.
     """
-    # Score using company name using 6-digit CUSIP and company name spelling distance
-    if (row["cusip6"] == row["ncusip6"]) & (row["name_ratio"] >= name_ratio_p10):
-        return 0
-    elif row["cusip6"] == row["ncusip6"]:
-        return 4
-    elif row["name_ratio"] >= name_ratio_p10:
-        return 5
-    else:
-        return 6
+    cusip_match = link["cusip6"] == link["ncusip6"]
+    names_match = link["name_ratio"] >= name_ratio_p10
+
+    return np.select(
+        [cusip_match & names_match, cusip_match, names_match], [0, 4, 5], default=6
+    )
 
 
-def get_iclink(conn, path: Path):
+def get_iclink(
+    ibes_id: pd.DataFrame, stocknames: pd.DataFrame, workers: int = -1
+) -> pd.DataFrame:
     """
-    Connects to WRDS and performs a series of steps to link IBES and CRSP data based on CUSIP and ticker.
-    Returns a DataFrame with the linked data and saves it as a parquet file.
+    Links IBES and CRSP data based on CUSIP and ticker.
 
     Args:
-        path: The path where the parquet file will be saved.
+        ibes_id (pd.DataFrame): a copy of ibes.id (ticker, cusip, cname, oftic, sdates, usfirm).
+        stocknames (pd.DataFrame): a copy of crsp.stocknames (permno, ticker, ncusip, comnam, namedt, nameenddt).
+        workers (int): number of threads used to score company names, -1 uses all cores.
 
     Returns:
-        None
+        pd.DataFrame: the link table with ticker, permno, cname, comnam, name_ratio and score columns.
     """
 
     # Step 1: Link by CUSIP
 
     # 1.1 IBES: Get the list of IBES Tickers for US firms in IBES
-    _ibes1 = conn.raw_sql(
-        """
-                        select ticker, cusip, cname, sdates from ibes.id
-                        where usfirm=1 and cusip != ''
-                        """
-    )
+    _ibes1 = ibes_id.loc[
+        (ibes_id["usfirm"] == 1)
+        & ibes_id["cusip"].notna()
+        & (ibes_id["cusip"] != ""),
+        ["ticker", "cusip", "cname", "sdates"],
+    ]
 
     # Create first and last 'start dates' for a given cusip
-    # Use agg min and max to find the first and last date per group
-    # then rename to fdate and ldate respectively
-
-    _ibes1_date = (
-        _ibes1.groupby(["ticker", "cusip"])
-        .sdates.agg(["min", "max"])
-        .reset_index()
-        .rename(columns={"min": "fdate", "max": "ldate"})
+    # Use transform min and max to find the first and last date per group
+    _ibes2 = _ibes1.assign(
+        fdate=_ibes1.groupby(["ticker", "cusip"]).sdates.transform("min"),
+        ldate=_ibes1.groupby(["ticker", "cusip"]).sdates.transform("max"),
     )
-
-    # merge fdate ldate back to _ibes1 data
-    _ibes2 = pd.merge(_ibes1, _ibes1_date, how="left", on=["ticker", "cusip"])
     _ibes2 = _ibes2.sort_values(by=["ticker", "cusip", "sdates"])
 
     # keep only the most recent company name determined by having sdates = ldate
     _ibes2 = _ibes2.loc[_ibes2.sdates == _ibes2.ldate].drop(["sdates"], axis=1)
 
     # 1.2 CRSP: Get all permno-ncusip combinations
-    _crsp1 = conn.raw_sql(
-        """
-                        select permno, ncusip, comnam, namedt, nameenddt
-                        from crsp.stocknames
-                        where ncusip != ''
-                        """
-    )
-
-    # first namedt
-    _crsp1_fnamedt = _crsp1.groupby(["permno", "ncusip"]).namedt.min().reset_index()
-
-    # last nameenddt
-    _crsp1_lnameenddt = (
-        _crsp1.groupby(["permno", "ncusip"]).nameenddt.max().reset_index()
-    )
+    _crsp1 = stocknames.loc[
+        stocknames["ncusip"].notna() & (stocknames["ncusip"] != ""),
+        ["permno", "ncusip", "comnam", "namedt", "nameenddt"],
+    ]
 
-    # merge both
-    _crsp1_dtrange = pd.merge(
-        _crsp1_fnamedt, _crsp1_lnameenddt, on=["permno", "ncusip"], how="inner"
+    # first namedt and last nameenddt, keep only most recent company name
+    _crsp2 = _crsp1.rename(columns={"nameenddt": "enddt"}).assign(
+        namedt=_crsp1.groupby(["permno", "ncusip"]).namedt.transform("min"),
+        nameenddt=_crsp1.groupby(["permno", "ncusip"]).nameenddt.transform("max"),
     )
-
-    # replace namedt and nameenddt with the version from the dtrange
-    _crsp1 = _crsp1.drop(["namedt"], axis=1).rename(columns={"nameenddt": "enddt"})
-    _crsp2 = pd.merge(_crsp1, _crsp1_dtrange, on=["permno", "ncusip"], how="inner")
-
-    # keep only most recent company name
     _crsp2 = _crsp2.loc[_crsp2.enddt == _crsp2.nameenddt].drop(["enddt"], axis=1)
 
     # 1.3 Create CUSIP Link Table
@@ -163,12 +160,11 @@ def get_iclink(conn, path: Path):
     ).sort_values(["ticker", "permno", "ldate"])
 
     # Keep link with most recent company name
-    _link1_1_tmp = _link1_1.groupby(["ticker", "permno"]).ldate.max().reset_index()
-    _link1_2 = pd.merge(
-        _link1_1, _link1_1_tmp, how="inner", on=["ticker", "permno", "ldate"]
-    )
+    _link1_2 = _link1_1.loc[
+        _link1_1.ldate == _link1_1.groupby(["ticker", "permno"]).ldate.transform("max")
+    ].reset_index(drop=True)
 
-    # Calculate name matching ratio using FuzzyWuzzy
+    # Calculate name matching ratio
     # Note: fuzz ratio = 100 -> match perfectly
     #       fuzz ratio = 0   -> do not match at all
 
@@ -178,8 +174,8 @@ def get_iclink(conn, path: Path):
 
     # E.g., fuzz.ratio('AMAZON.COM INC',  'AMAZON COM INC') returns value of 93
 
-    _link1_2["name_ratio"] = _link1_2.apply(
-        lambda x: fuzz.token_set_ratio(x.comnam, x.cname), axis=1
+    _link1_2["name_ratio"] = name_ratio(
+        _link1_2["comnam"], _link1_2["cname"], workers=workers
     )
 
     # Note on parameters:
@@ -193,12 +189,10 @@ def get_iclink(conn, path: Path):
     # 10% percentile of the company name distance
     name_ratio_p10 = _link1_2.name_ratio.quantile(0.10)
 
-    # Function to assign score for companies matched by:
+    # Assign score for companies matched by:
     # full cusip and passing name_ratio
     # or meeting date range requirement
-
-    # assign size portfolio
-    _link1_2["score"] = _link1_2.apply(score1, name_ratio_p10=name_ratio_p10, axis=1)
+    _link1_2["score"] = score1(_link1_2, name_ratio_p10)
     _link1_2 = _link1_2[["ticker", "permno", "cname", "comnam", "name_ratio", "score"]]
     _link1_2 = _link1_2.drop_duplicates()
 
@@ -206,75 +200,41 @@ def get_iclink(conn, path: Path):
     # Find links for the remaining unmatched cases using Exchange Ticker
 
     # Identify remaining unmatched cases
-    _nomatch1 = pd.merge(
-        _ibes2[["ticker"]], _link1_2[["permno", "ticker"]], on="ticker", how="left"
-    )
-    _nomatch1 = (
-        _nomatch1.loc[_nomatch1.permno.isnull()]
-        .drop(["permno"], axis=1)
-        .drop_duplicates()
-    )
+    _nomatch1 = _ibes2[["ticker"]].drop_duplicates()
+    _nomatch1 = _nomatch1.loc[~_nomatch1.ticker.isin(_link1_2.ticker)]
 
     # Add IBES identifying information
-
-    ibesid = conn.raw_sql(
-        """ select ticker, cname, oftic, sdates, cusip from ibes.id """
-    )
-    ibesid = ibesid.loc[ibesid.oftic.notna()]
+    ibesid = ibes_id.loc[
+        ibes_id.oftic.notna(), ["ticker", "cname", "oftic", "sdates", "cusip"]
+    ]
 
     _nomatch2 = pd.merge(_nomatch1, ibesid, how="inner", on=["ticker"])
 
     # Create first and last 'start dates' for Exchange Tickers
     # Label date range variables and keep only most recent company name
-
-    _nomatch3 = (
-        _nomatch2.groupby(["ticker", "oftic"])
-        .sdates.agg(["min", "max"])
-        .reset_index()
-        .rename(columns={"min": "fdate", "max": "ldate"})
+    _nomatch3 = _nomatch2.assign(
+        fdate=_nomatch2.groupby(["ticker", "oftic"]).sdates.transform("min"),
+        ldate=_nomatch2.groupby(["ticker", "oftic"]).sdates.transform("max"),
     )
-
-    _nomatch3 = pd.merge(_nomatch2, _nomatch3, how="left", on=["ticker", "oftic"])
-
     _nomatch3 = _nomatch3.loc[_nomatch3.sdates == _nomatch3.ldate]
 
     # Get entire list of CRSP stocks with Exchange Ticker information
-
-    _crsp_n1 = conn.raw_sql(
-        """ select ticker, comnam, permno, ncusip, namedt, nameenddt
-                                from crsp.stocknames """
-    )
-
-    _crsp_n1 = _crsp_n1.loc[_crsp_n1.ticker.notna()].sort_values(
-        by=["permno", "ticker", "namedt"]
-    )
+    _crsp_n1 = stocknames.loc[
+        stocknames.ticker.notna(),
+        ["ticker", "comnam", "permno", "ncusip", "namedt", "nameenddt"],
+    ].sort_values(by=["permno", "ticker", "namedt"])
 
     # Arrange effective dates for link by Exchange Ticker
-
-    _crsp_n1_namedt = (
-        _crsp_n1.groupby(["permno", "ticker"])
-        .namedt.min()
-        .reset_index()
-        .rename(columns={"min": "namedt"})
-    )
-    _crsp_n1_nameenddt = (
-        _crsp_n1.groupby(["permno", "ticker"])
-        .nameenddt.max()
-        .reset_index()
-        .rename(columns={"max": "nameenddt"})
-    )
-
-    _crsp_n1_dt = pd.merge(
-        _crsp_n1_namedt, _crsp_n1_nameenddt, how="inner", on=["permno", "ticker"]
-    )
-
-    _crsp_n1 = _crsp_n1.rename(
-        columns={"namedt": "namedt_ind", "nameenddt": "nameenddt_ind"}
+    _crsp_n2 = _crsp_n1.rename(
+        columns={
+            "ticker": "crsp_ticker",
+            "namedt": "namedt_ind",
+            "nameenddt": "nameenddt_ind",
+        }
+    ).assign(
+        namedt=_crsp_n1.groupby(["permno", "ticker"]).namedt.transform("min"),
+        nameenddt=_crsp_n1.groupby(["permno", "ticker"]).nameenddt.transform("max"),
     )
-
-    _crsp_n2 = pd.merge(_crsp_n1, _crsp_n1_dt, how="left", on=["permno", "ticker"])
-
-    _crsp_n2 = _crsp_n2.rename(columns={"ticker": "crsp_ticker"})
     _crsp_n2 = _crsp_n2.loc[_crsp_n2.nameenddt_ind == _crsp_n2.nameenddt].drop(
         ["namedt_ind", "nameenddt_ind"], axis=1
     )
@@ -287,19 +247,18 @@ def get_iclink(conn, path: Path):
     )
     _link2_1 = _link2_1.loc[
         (_link2_1.ldate >= _link2_1.namedt) & (_link2_1.fdate <= _link2_1.nameenddt)
-    ]
+    ].reset_index(drop=True)
 
     # Score using company name using 6-digit CUSIP and company name spelling distance
-    _link2_1["name_ratio"] = _link2_1.apply(
-        lambda x: fuzz.token_set_ratio(x.comnam, x.cname), axis=1
+    _link2_1["name_ratio"] = name_ratio(
+        _link2_1["comnam"], _link2_1["cname"], workers=workers
     )
 
     _link2_2 = _link2_1
-    _link2_2["cusip6"] = _link2_2.apply(lambda x: x.cusip[:6], axis=1)
-    _link2_2["ncusip6"] = _link2_2.apply(lambda x: x.ncusip[:6], axis=1)
+    _link2_2["cusip6"] = _link2_2["cusip"].str[:6]
+    _link2_2["ncusip6"] = _link2_2["ncusip"].str[:6]
 
-    # assign size portfolio
-    _link2_2["score"] = _link2_2.apply(score2, name_ratio_p10=name_ratio_p10, axis=1)
+    _link2_2["score"] = score2(_link2_2, name_ratio_p10)
 
     # Some companies may have more than one TICKER-PERMNO link so re-sort and
     # keep the case (PERMNO & Company name from CRSP) that gives the lowest score for each IBES TICKER
@@ -307,22 +266,105 @@ def get_iclink(conn, path: Path):
     _link2_2 = _link2_2[
         ["ticker", "permno", "cname", "comnam", "name_ratio", "score"]
     ].sort_values(by=["ticker", "score"])
-    _link2_2_score = _link2_2.groupby(["ticker"]).score.min().reset_index()
 
-    _link2_3 = pd.merge(_link2_2, _link2_2_score, how="inner", on=["ticker", "score"])
+    _link2_3 = _link2_2.loc[
+        _link2_2.score == _link2_2.groupby("ticker").score.transform("min")
+    ]
     _link2_3 = _link2_3[
         ["ticker", "permno", "cname", "comnam", "score"]
     ].drop_duplicates()
 
     # Step 3: Finalize LInks and Scores
-    # Combine the output from both linking procedures. Save the output data for future usage
-
-    iclink = pd.concat([_link1_2, _link2_3])
+    # Combine the output from both linking procedures
 
+    iclink = pd.concat([_link1_2, _link2_3], ignore_index=True)
     iclink["permno"] = iclink["permno"].astype(int)
-    iclink.to_parquet(path / "iclink.parquet", index=False)
 
+    return iclink
+
+
+def iclink_inputs_hash(download_dir: Path) -> str:
+    """
+    Returns the digest of the latest cached copies of ibes.id and crsp.stocknames.
+
+    Args:
+        download_dir (Path): download cache directory
+    """
+    files = [get_latest_file(download_dir / name) for name in ICLINK_INPUTS]
+    if any(file is None for file in files):
+        raise FileNotFoundError(
+            f"{' and '.join(ICLINK_INPUTS)} are required in {download_dir} to build iclink"
+        )
+    return hash_files(*files)
+
+
+def build_iclink(
+    download_dir: Path, restricted_dir: Path, force: bool = False, workers: int = -1
+) -> Path:
+    """
+    Builds the IBES-CRSP link from the download cache and saves a timestamped
+    `iclink.parquet` in the restricted directory. The digest of the inputs is stored
+    in the parquet metadata and the link is only rebuilt when the inputs change.
 
-conn = wrds.Connection(wrds_username=WRDS_USERNAME, wrds_password=WRDS_PASSWORD)
+    The link is saved sorted by ticker, score and permno so that `load_iclink` reads
+    a ready-to-use ticker -> permno table.
 
-get_iclink(conn, restricted_dir)
+    Args:
+        download_dir (Path): download cache directory
+        restricted_dir (Path): directory where the link is saved
+        force (bool): rebuild the link even if the inputs did not change
+        workers (int): number of threads used to score company names, -1 uses all cores.
+
+    Returns:
+        Path: the path of the up-to-date link file.
+    """
+    inputs_hash = iclink_inputs_hash(download_dir)
+
+    latest = get_latest_file(restricted_dir / "iclink.parquet")
+    if latest is not None and not force:
+        metadata = pq.read_schema(latest).metadata or {}
+        if metadata.get(ICLINK_INPUTS_KEY) == inputs_hash.encode():
+            logging.info(f"iclink is up to date ({latest}), skipping.")
+            return latest
+
+    ibes_id = pd.read_parquet(get_latest_file(download_dir / "ibes_id.parquet"))
+    stocknames = pd.read_parquet(
+        get_latest_file(download_dir / "crsp_stocknames.parquet")
+    )
+    iclink = get_iclink(ibes_id, stocknames, workers=workers)
+    iclink = iclink.sort_values(["ticker", "score", "permno"], ignore_index=True)
+
+    table = pa.Table.from_pandas(iclink, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, ICLINK_INPUTS_KEY: inputs_hash.encode()}
+    )
+    path = timestamp_file(restricted_dir / "iclink.parquet")
+    pq.write_table(table, path)
+    logging.info(f"iclink saved to {path}")
+
+    return path
+
+
+def load_iclink(
+    restricted_dir: Path, score_mapping: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Loads the latest IBES-CRSP link as a ticker -> permno table sorted by ticker.
+    Falls back to the unversioned `iclink.parquet` when no link was built locally.
+
+    Args:
+        restricted_dir (Path): directory where the link is saved
+        score_mapping (int, optional): the maximum "matching" score to keep. Defaults to None (all links).
+
+    Returns:
+        pd.DataFrame: unique ticker, permno pairs.
+    """
+    path = get_latest_file(restricted_dir / "iclink.parquet") or (
+        restricted_dir / "iclink.parquet"
+    )
+    filters = None if score_mapping is None else [("score", "<=", score_mapping)]
+    iclink = pd.read_parquet(path, columns=["ticker", "permno"], filters=filters)
+
+    return iclink.drop_duplicates().sort_values(
+        "ticker", kind="stable", ignore_index=True
+    )
@@ -0,0 +1,184 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# an analyst forecast series: one analyst at one broker for one firm-fiscal period
+GROUP_KEYS = ["ticker", "fpedats", "estimator", "analys"]
+# order of the revisions within a series
+ORDER_KEYS = ["anndats", "anntims", "revdats", "revtims"]
+
+
+def _sort_codes(s: pd.Series) -> np.ndarray:
+    """
+    Integer codes that sort like the column, with missing values last as in sort_values.
+    """
+    codes, uniques = pd.factorize(s, sort=True)
+    return np.where(codes < 0, len(uniques), codes)
+
+
+def _combine_codes(codes: List[np.ndarray]) -> np.ndarray:
+    """
+    Folds sort codes into a single int64 code that sorts like the codes taken
+    lexicographically. The running code is re-ranked when the next column would
+    overflow it.
+    """
+    out = codes[0].astype(np.int64)
+    for c in codes[1:]:
+        size = int(c.max()) + 1 if len(c) else 1
+        if len(out) and int(out.max()) >= np.iinfo(np.int64).max // size - 1:
+            out = pd.factorize(out, sort=True)[0].astype(np.int64)
+        out = out * size + c
+    return out
+
+
+def _block_starts(codes: List[np.ndarray]) -> np.ndarray:
+    """
+    Boolean mask flagging the rows where any of the sorted codes changes.
+    """
+    n = len(codes[0]) if codes else 0
+    change = np.zeros(max(n - 1, 0), dtype=bool)
+    for c in codes:
+        change |= c[1:] != c[:-1]
+    return np.r_[True, change][:n]
+
+
+def build_revision_panel(
+    est: pd.DataFrame,
+    keys: List[str] = GROUP_KEYS,
+    order: List[str] = ORDER_KEYS,
+) -> pd.DataFrame:
+    """
+    Sorts IBES detail estimates by analyst forecast series and revision time.
+
+    The columns are integer-coded and folded into a single int64 sort key, so the
+    sort is one stable argsort instead of a multi-column sort over object columns.
+    The forecast series are numbered in the `series` column so later steps find
+    their boundaries by comparing neighbouring rows. Rows with a missing key are
+    dropped, as groupby does.
+
+    Args:
+        est (pd.DataFrame): IBES detail estimates.
+        keys (List[str]): columns identifying an analyst forecast series.
+        order (List[str]): columns ordering the revisions within a series.
+
+    Returns:
+        pd.DataFrame: the estimates sorted by keys and order with a `series` column.
+    """
+    complete = est[keys].notna().all(axis=1).to_numpy()
+    if not complete.all():
+        est = est[complete]
+
+    series = _combine_codes([_sort_codes(est[c]) for c in keys])
+    idx = np.argsort(
+        _combine_codes([series] + [_sort_codes(est[c]) for c in order]), kind="stable"
+    )
+
+    panel = est.iloc[idx].reset_index(drop=True)
+    panel["series"] = np.cumsum(_block_starts([series[idx]])) - 1
+
+    return panel
+
+
+def last_estimates(
+    panel: pd.DataFrame,
+    keys: List[str] = GROUP_KEYS,
+    before: Optional[str] = None,
+    date: str = "anndats",
+) -> pd.DataFrame:
+    """
+    Keeps the latest estimate of each analyst forecast series.
+
+    Equivalent to `groupby(keys).last()` on the sorted panel: every column takes its
+    last non-missing value within the series. The last row of each series is found
+    by comparing neighbouring `series` values, and only columns missing on that row
+    are back-filled from a running index, so no Python-level groupby is involved.
+
+    Args:
+        panel (pd.DataFrame): output of `build_revision_panel`.
+        keys (List[str]): columns identifying an analyst forecast series.
+        before (str, optional): column with a cutoff date; only estimates whose `date` is on or before the cutoff are considered. Defaults to None.
+        date (str): the estimate date compared with `before`.
+
+    Returns:
+        pd.DataFrame: one row per series with the key columns first.
+    """
+    if before is not None:
+        panel = panel[panel[date] <= panel[before]]
+
+    series = panel["series"].to_numpy()
+    n = len(series)
+    first = np.r_[True, series[1:] != series[:-1]][:n]
+    last = np.r_[series[1:] != series[:-1], True][:n]
+
+    columns = keys + [c for c in panel.columns if c not in keys and c != "series"]
+    out = panel.iloc[np.flatnonzero(last)][columns].reset_index(drop=True)
+
+    rows = np.arange(n)
+    series_start = np.maximum.accumulate(np.where(first, rows, 0))[last]
+    for col in columns:
+        missing = out[col].isna().to_numpy()
+        if not missing.any():
+            continue
+        # position of the last non-missing value up to each row
+        valid = panel[col].notna().to_numpy()
+        filled = np.maximum.accumulate(np.where(valid, rows, -1))[last][missing]
+        found = filled >= series_start[missing]
+        out.loc[np.flatnonzero(missing)[found], col] = (
+            panel[col].iloc[filled[found]].to_numpy()
+        )
+
+    return out
+
+
+def revision_features(
+    panel: pd.DataFrame,
+    keys: List[str] = ["ticker", "fpedats"],
+    value: str = "value",
+) -> pd.DataFrame:
+    """
+    Computes analyst revision counts and momentum for each firm-fiscal period.
+
+    A revision is a change in an analyst's estimate relative to the same analyst's
+    previous estimate for the period; reiterations (unchanged estimates) are not
+    counted, neither in the revision counts nor in the average revision.
+
+    Args:
+        panel (pd.DataFrame): output of `build_revision_panel`, sorted by `keys` first.
+        keys (List[str]): columns identifying a firm-fiscal period.
+        value (str): the estimate column.
+
+    Returns:
+        pd.DataFrame: per firm-fiscal period, the number of estimates (n_est),
+            analysts (n_analysts), upward (n_up) and downward (n_down) revisions,
+            the average of the upward and downward revisions (mean_rev) and the
+            revision momentum rev_momentum = (n_up - n_down) / n_analysts.
+    """
+    series = panel["series"].to_numpy()
+    values = panel[value].to_numpy(dtype=float)
+
+    new_series = np.r_[True, series[1:] != series[:-1]][: len(series)]
+    change = np.r_[np.nan, np.diff(values)][: len(series)]
+    change[new_series] = np.nan
+
+    period_start = np.flatnonzero(
+        _block_starts([_sort_codes(panel[c]) for c in keys])
+    )
+
+    def period_sum(x: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(x, period_start) if len(period_start) else x[:0]
+
+    features = panel[keys].iloc[period_start].reset_index(drop=True)
+    features["n_est"] = np.diff(np.r_[period_start, len(series)])
+    features["n_analysts"] = period_sum(new_series.astype(int))
+    features["n_up"] = period_sum((change > 0).astype(int))
+    features["n_down"] = period_sum((change < 0).astype(int))
+    n_rev = features["n_up"] + features["n_down"]
+    features["mean_rev"] = period_sum(np.nan_to_num(change)) / np.where(
+        n_rev > 0, n_rev, np.nan
+    )
+    features["rev_momentum"] = (
+        features["n_up"] - features["n_down"]
+    ) / features["n_analysts"]
+
+    return features
@@ -0,0 +1,188 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ..utils import read_dataset
+
+# reporting lags when the report date is unknown (rdq missing, annual data)
+QUARTERLY_LAG_MONTHS = 3
+ANNUAL_LAG_MONTHS = 6
+
+
+def _days(dates) -> np.ndarray:
+    # dates as int64 days since the epoch, NaT as the smallest int64
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def point_in_time_store(
+    compu: pd.DataFrame, items: list, available: pd.Series
+) -> pd.DataFrame:
+    """
+    Point-in-time store of Compustat items: one row per (gvkey, available date),
+    sorted by gvkey and available date.
+
+    A report is only kept if its fiscal period (datadate) is later than the
+    periods of all the reports available before it, so that a late filing of an
+    older period does not replace more recent data. Among the reports available on
+    the same day, the latest fiscal period is kept.
+
+    Args:
+        compu (pd.DataFrame): Compustat data with gvkey, datadate and the items.
+        items (list): Compustat items to keep.
+        available (pd.Series): date at which each row is public.
+
+    Returns:
+        pd.DataFrame: gvkey, available, datadate and the items.
+    """
+    store = compu[["gvkey", "datadate"] + items].assign(available=available)
+    store = store[store["gvkey"].notna() & store["available"].notna()]
+    store = store.sort_values(["gvkey", "available", "datadate"], kind="stable")
+    store = store.drop_duplicates(["gvkey", "available"], keep="last")
+
+    # latest fiscal period available before each report
+    latest = store.groupby("gvkey")["datadate"].cummax()
+    previous = latest.groupby(store["gvkey"]).shift()
+    store = store[previous.isna() | (store["datadate"] > previous)]
+
+    return store[["gvkey", "available", "datadate"] + items].reset_index(drop=True)
+
+
+def quarterly_store(
+    path: Path, items: list, lag_months: int = QUARTERLY_LAG_MONTHS
+) -> pd.DataFrame:
+    """
+    Point-in-time store of quarterly Compustat items, available on the report date
+    (rdq), or `lag_months` after the fiscal quarter end if rdq is missing.
+
+    Args:
+        path (Path): download cache directory.
+        items (list): fundq items, e.g. ["atq", "saleq"].
+        lag_months (int, optional): reporting lag without rdq. Defaults to QUARTERLY_LAG_MONTHS.
+
+    Returns:
+        pd.DataFrame: see `point_in_time_store`.
+    """
+    compu = read_dataset(
+        path / "compustat_quarterly.parquet",
+        columns=list(dict.fromkeys(["gvkey", "datadate", "rdq"] + items)),
+    )
+    lagged = compu["datadate"] + pd.DateOffset(months=lag_months)
+    available = compu["rdq"].fillna(lagged)
+    return point_in_time_store(compu, items, available)
+
+
+def annual_store(
+    path: Path, items: list, lag_months: int = ANNUAL_LAG_MONTHS
+) -> pd.DataFrame:
+    """
+    Point-in-time store of annual Compustat items, available `lag_months` after the
+    fiscal year end (compustat_annual has no report date).
+
+    Args:
+        path (Path): download cache directory.
+        items (list): funda items, e.g. ["at", "sale"].
+        lag_months (int, optional): reporting lag. Defaults to ANNUAL_LAG_MONTHS.
+
+    Returns:
+        pd.DataFrame: see `point_in_time_store`.
+    """
+    compu = read_dataset(
+        path / "compustat_annual.parquet",
+        columns=list(dict.fromkeys(["gvkey", "datadate"] + items)),
+    )
+    available = compu["datadate"] + pd.DateOffset(months=lag_months)
+    return point_in_time_store(compu, items, available)
+
+
+def asof_fundamentals(
+    df: pd.DataFrame,
+    store: pd.DataFrame,
+    items: Optional[list] = None,
+    datadate: Optional[str] = "datadate",
+) -> pd.DataFrame:
+    """
+    Attaches to each row of `df` the items of the latest report of its gvkey
+    available on or before its date. The lookup is a binary search of the (gvkey,
+    date) of each row in the sorted store, so `df` is neither sorted nor merged.
+
+    Args:
+        df (pd.DataFrame): panel with gvkey and date columns.
+        store (pd.DataFrame): store from `point_in_time_store`.
+        items (list, optional): items to attach. Defaults to None (all the items of the store).
+        datadate (str, optional): name of the column with the fiscal period end of the report, None to leave it out. Defaults to "datadate".
+
+    Returns:
+        pd.DataFrame: df with the items, NaN for the rows without an available report.
+    """
+    if items is None:
+        keys = ("gvkey", "available", "datadate")
+        items = [c for c in store.columns if c not in keys]
+    source = store[items + ["datadate"]].rename(columns={"datadate": datadate})
+    if not datadate:
+        source = source[items]
+    if clash := [c for c in source.columns if c in df.columns]:
+        raise ValueError(f"Columns already in the panel: {clash}")
+    if store.empty:
+        return df.assign(**{c: np.nan for c in source.columns})
+
+    # store rows keyed by gvkey code times a span larger than the dates, plus the date
+    codes, gvkeys = pd.factorize(store["gvkey"])
+    days = _days(store["available"])
+    origin = days.min()
+    span = days.max() - origin + 2
+    keys = codes * span + (days - origin)
+
+    # gvkey code of each row, through the distinct gvkeys of df
+    df_codes, df_gvkeys = pd.factorize(df["gvkey"])
+    row_codes = np.where(
+        df_codes >= 0, pd.Index(gvkeys).get_indexer(df_gvkeys)[df_codes], -1
+    )
+    row_days = np.clip(_days(df["date"]) - origin, -1, span - 2)
+
+    # last report available on the date, if it is one of the gvkey (a NaT date,
+    # clipped to the last day, has none)
+    pos = np.searchsorted(keys, row_codes * span + row_days, side="right") - 1
+    found = (row_codes >= 0) & (pos >= 0) & df["date"].notna().to_numpy()
+    found[found] = codes[pos[found]] == row_codes[found]
+    take = np.where(found, pos, 0)
+
+    return df.assign(
+        **{
+            col: pd.Series(source[col].to_numpy()[take], index=df.index).where(found)
+            for col in source.columns
+        }
+    )
+
+
+def add_fundamentals(
+    df: pd.DataFrame,
+    path: Path,
+    quarterly_items: list = [],
+    annual_items: list = [],
+    quarterly_lag_months: int = QUARTERLY_LAG_MONTHS,
+    annual_lag_months: int = ANNUAL_LAG_MONTHS,
+) -> pd.DataFrame:
+    """
+    Adds point-in-time quarterly and annual Compustat items to the panel, with the
+    fiscal period end of the reports in datadate_q and datadate_a.
+
+    Args:
+        df (pd.DataFrame): panel with gvkey and date columns.
+        path (Path): download cache directory.
+        quarterly_items (list, optional): fundq items. Defaults to [].
+        annual_items (list, optional): funda items. Defaults to [].
+        quarterly_lag_months (int, optional): reporting lag without rdq. Defaults to QUARTERLY_LAG_MONTHS.
+        annual_lag_months (int, optional): reporting lag of the annual data. Defaults to ANNUAL_LAG_MONTHS.
+
+    Returns:
+        pd.DataFrame: df with the items.
+    """
+    if quarterly_items:
+        store = quarterly_store(path, quarterly_items, quarterly_lag_months)
+        df = asof_fundamentals(df, store, datadate="datadate_q")
+    if annual_items:
+        store = annual_store(path, annual_items, annual_lag_months)
+        df = asof_fundamentals(df, store, datadate="datadate_a")
+    return df
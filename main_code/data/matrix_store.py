@@ -0,0 +1,158 @@
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+MATRIX_FIELDS = ["ret", "prc", "mcap", "shrout"]
+MANIFEST = "manifest.json"
+
+
+def build_matrix_store(
+    panel: pd.DataFrame,
+    store_dir: Path,
+    fields: list = MATRIX_FIELDS,
+    version: Optional[str] = None,
+) -> Path:
+    """
+    Writes the panel as dense (trading days x permnos) float32 matrices, one
+    memory-mapped .npy file per field, with the sorted dates and permnos indexing
+    the rows and columns. Missing permno-days are NaN.
+
+    Row t holds the cross-section of day t contiguously, so cross-sectional ranks or
+    portfolio returns are row operations, and a permno's time series is a column.
+    Each permno-day must appear once in the panel, duplicates raise a ValueError.
+
+    Args:
+        panel (pd.DataFrame): long panel with permno and date columns.
+        store_dir (Path): directory of the store.
+        fields (list, optional): panel columns to store. Defaults to MATRIX_FIELDS.
+        version (str, optional): version of the panel, e.g. the panel file name. The store is not rebuilt if it holds the same version and fields. Defaults to None (always rebuilt).
+
+    Returns:
+        Path: the store directory.
+    """
+    store_dir = Path(store_dir)
+    manifest_path = store_dir / MANIFEST
+    if version is not None and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest["version"] == version and set(fields) <= set(manifest["fields"]):
+            logging.info(f"Matrix store up to date: {store_dir}")
+            return store_dir
+
+    date_codes, dates = pd.factorize(panel["date"], sort=True)
+    permno_codes, permnos = pd.factorize(panel["permno"], sort=True)
+    cells = date_codes.astype(np.int64) * len(permnos) + permno_codes
+    n_duplicates = len(cells) - len(np.unique(cells))
+    if n_duplicates:
+        raise ValueError(f"The panel has {n_duplicates} duplicated (permno, date) rows")
+
+    store_dir.mkdir(parents=True, exist_ok=True)
+    # a store without manifest is incomplete
+    manifest_path.unlink(missing_ok=True)
+
+    np.save(store_dir / "dates.npy", dates.to_numpy(dtype="datetime64[ns]"))
+    np.save(store_dir / "permnos.npy", np.asarray(permnos))
+
+    shape = (len(dates), len(permnos))
+    for field in fields:
+        matrix = np.lib.format.open_memmap(
+            store_dir / f"{field}.npy", mode="w+", dtype=np.float32, shape=shape
+        )
+        matrix[:] = np.nan
+        matrix[date_codes, permno_codes] = panel[field].to_numpy(dtype=np.float32)
+        matrix.flush()
+        del matrix
+
+    manifest_path.write_text(
+        json.dumps({"version": version, "fields": list(fields), "shape": shape})
+    )
+    logging.info(f"Matrix store {shape} saved to {store_dir}")
+    return store_dir
+
+
+def load_matrix_store(
+    store_dir: Path, fields: Optional[list] = None, mode: str = "r"
+) -> dict:
+    """
+    Opens the matrices of a store as memory maps; only the pages that are used are
+    read.
+
+    Args:
+        store_dir (Path): directory of the store.
+        fields (list, optional): fields to open. Defaults to None (all fields).
+        mode (str, optional): memory-map mode, "r+" to modify the matrices in place. Defaults to "r".
+
+    Returns:
+        dict: "dates" (pd.DatetimeIndex), "permnos" (np.ndarray) and one (dates x permnos) matrix per field.
+    """
+    store_dir = Path(store_dir)
+    manifest_path = store_dir / MANIFEST
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No complete matrix store in {store_dir}")
+    manifest = json.loads(manifest_path.read_text())
+
+    store = {
+        "dates": pd.DatetimeIndex(np.load(store_dir / "dates.npy")),
+        "permnos": np.load(store_dir / "permnos.npy"),
+    }
+    for field in fields or manifest["fields"]:
+        store[field] = np.load(store_dir / f"{field}.npy", mmap_mode=mode)
+    return store
+
+
+def matrix_to_long(
+    store: dict, fields: Optional[list] = None, how: str = "any"
+) -> pd.DataFrame:
+    """
+    Converts matrices of a store, or matrices computed from them with the same
+    shape (e.g. ranks), back to a long panel sorted by date and permno.
+
+    Args:
+        store (dict): "dates", "permnos" and the matrices, as returned by `load_matrix_store`.
+        fields (list, optional): matrices to convert. Defaults to None (all matrices).
+        how (str, optional): keep the permno-days where "any" or "all" the fields are present. Defaults to "any".
+
+    Returns:
+        pd.DataFrame: date, permno and one column per field.
+    """
+    fields = fields or [k for k in store if k not in ("dates", "permnos")]
+    present = [~np.isnan(store[field]) for field in fields]
+    combine = np.logical_or if how == "any" else np.logical_and
+    keep = combine.reduce(present)
+    rows, cols = np.nonzero(keep)
+
+    long = pd.DataFrame(
+        {"date": store["dates"][rows], "permno": store["permnos"][cols]}
+    )
+    for field in fields:
+        long[field] = np.asarray(store[field])[rows, cols]
+    return long
+
+
+def long_to_matrix(
+    df: pd.DataFrame, field: str, dates: pd.DatetimeIndex, permnos: np.ndarray
+) -> np.ndarray:
+    """
+    Scatters a column of a long panel into a (dates x permnos) float32 matrix aligned
+    with a store, e.g. a characteristic computed on the long panel. Permno-days
+    outside the store are dropped.
+
+    Args:
+        df (pd.DataFrame): long panel with permno and date columns.
+        field (str): column to scatter.
+        dates (pd.DatetimeIndex): row index of the store.
+        permnos (np.ndarray): column index of the store.
+
+    Returns:
+        np.ndarray: the matrix, NaN where the panel has no value.
+    """
+    rows = dates.get_indexer(df["date"])
+    cols = pd.Index(permnos).get_indexer(df["permno"])
+    inside = (rows >= 0) & (cols >= 0)
+
+    matrix = np.full((len(dates), len(permnos)), np.nan, dtype=np.float32)
+    matrix[rows[inside], cols[inside]] = df[field].to_numpy(dtype=np.float32)[inside]
+    return matrix
@@ -1,11 +1,17 @@
 # %%
+import logging
+import tempfile
 from pathlib import Path
+from typing import Callable, Optional
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
-from ..utils import get_latest_file
+from ..utils import get_latest_file, interval_join, read_dataset
+from .characteristics import compute_characteristics
 
 load_dotenv()
 
@@ -15,21 +21,29 @@ CRSP_END_DATE = "2025-12-31"
 
 
 # load crsp file
-def load_crsp_file(path: Path) -> pd.DataFrame:
-    crsp = pd.read_parquet(get_latest_file(path / "crsp_daily.parquet"))
+def load_crsp_file(path: Path, start=None, end=None) -> pd.DataFrame:
+    # [start, end) restricts the read to a chunk of dates (see build_panel_chunked)
+    filters = [("date", ">=", pd.Timestamp(start))] if start is not None else []
+    if end is not None:
+        filters.append(("date", "<", pd.Timestamp(end)))
+    crsp = pd.read_parquet(
+        get_latest_file(path / "crsp_daily.parquet"), filters=filters or None
+    )
     crsp = crsp[crsp["date"] >= CRSP_START_DATE]  # filter for dates after 2007-01-01
     crsp["year_month"] = crsp["date"].dt.to_period("M")
     crsp["year"] = crsp["date"].dt.year
     crsp = crsp.rename(columns={"ncusip": "cusip"})
 
     # merge on permno and select only the dates where the link is valid
-    link_tab = pd.read_parquet(
-        get_latest_file(path / "crsp_compu_link_table.parquet")
+    link_tab = read_dataset(
+        path / "crsp_compu_link_table.parquet",
+        columns=["gvkey", "lpermno", "linkdt", "linkenddt"],
     ).rename(columns={"lpermno": "permno"})
     link_tab = link_tab[["gvkey", "permno", "linkdt", "linkenddt"]]
     link_tab["linkenddt"] = link_tab["linkenddt"].fillna(pd.to_datetime(CRSP_END_DATE))
-    crsp = crsp.merge(link_tab, on="permno", how="left")
-    crsp = crsp[crsp["date"].between(crsp["linkdt"], crsp["linkenddt"])]
+    crsp = interval_join(
+        crsp, link_tab, on="permno", point="date", start="linkdt", end="linkenddt"
+    )
     crsp = crsp.drop(columns=["linkdt", "linkenddt"])
     # drop_duplicates
     crsp = crsp.drop_duplicates(subset=["permno", "date"])
@@ -100,9 +114,14 @@ def load_fama_french_25_portfolios(df: pd.DataFrame, path: Path) -> pd.DataFrame
 
 
 def load_ibes_data(
-    df: pd.DataFrame, path: Path, adjust_ibes_date_with_timestamp: bool = False
+    df: pd.DataFrame,
+    path: Path,
+    adjust_ibes_date_with_timestamp: bool = False,
+    trading_dates: pd.DatetimeIndex | None = None,
 ) -> pd.DataFrame:
-    ibes = pd.read_parquet(get_latest_file(path / "ibes_sue.parquet"))
+    ibes = read_dataset(
+        path / "ibes_sue.parquet", columns=["permno", "datetime", "sue"]
+    )
     ibes = ibes[ibes["datetime"] >= "1984-01-01"]  # filter for dates after 1984-01-01
     ibes = ibes[ibes["datetime"] <= "2024-12-31"]  # filter for dates before 2025-12-31
     ibes["ea_date"] = pd.to_datetime(ibes["datetime"].dt.date)
@@ -118,12 +137,13 @@ def load_ibes_data(
     ibes["ea_date_adj"] = pd.to_datetime(ibes["ea_date_adj"].dt.date)
 
     # check if the column "date" in ibes is in crsp_dates, it not, take the next date in crsp_dates
-    crsp_dates = df[df["date"].dt.dayofweek < 5]["date"].unique()
-    # remove weekends from crsp_dates
-    crsp_dates = pd.to_datetime(crsp_dates)
-    ibes["ea_date_adj"] = ibes["ea_date_adj"].apply(
-        lambda x: crsp_dates[crsp_dates >= x][0]
-    )
+    # (the dates of the whole sample are passed when df only holds a chunk of dates)
+    if trading_dates is None:
+        trading_dates = trading_calendar(df["date"])
+    next_date = np.searchsorted(trading_dates, ibes["ea_date_adj"], side="left")
+    keep = next_date < len(trading_dates)
+    ibes = ibes[keep]
+    ibes["ea_date_adj"] = trading_dates[next_date[keep]]
     ibes_ = ibes[["permno", "ea_date_adj", "sue"]].copy()
     ibes_["ea"] = 1
     # there about 100 dups (dual shares related to the same permno and date)
@@ -133,11 +153,21 @@ def load_ibes_data(
     return df.merge(ibes_, on=["permno", "date"], how="left")
 
 
+def trading_calendar(dates: pd.Series) -> pd.DatetimeIndex:
+    """
+    Sorted unique CRSP dates, without weekends.
+    """
+    dates = pd.DatetimeIndex(dates.unique()).sort_values()
+    return dates[dates.dayofweek < 5]
+
+
 def load_ibes_analyst_coverage_data(df: pd.DataFrame, path: Path) -> pd.DataFrame:
     """
     Loads the IBES analyst coverage data.
     """
-    ibes = pd.read_parquet(get_latest_file(path / "ibes_sue.parquet"))
+    ibes = read_dataset(
+        path / "ibes_sue.parquet", columns=["permno", "datetime", "numest"]
+    )
     ibes = ibes[ibes["datetime"] >= "1984-01-01"]  # filter for dates after 1984-01-01
     ibes = ibes[["permno", "datetime", "numest"]]
     ibes = ibes.rename(columns={"numest": "n_analysts"})
@@ -227,33 +257,55 @@ def load_gic(df, path: Path) -> pd.DataFrame:
     gic["indthru"] = gic["indthru"].fillna(pd.to_datetime(CRSP_END_DATE))
     gic = gic[["gvkey", "gsector", "ggroup", "indfrom", "indthru"]]
 
-    df = df.merge(gic, on="gvkey", how="left")
-    df = df[df["date"].between(df["indfrom"], df["indthru"])]
+    df = interval_join(
+        df, gic, on="gvkey", point="date", start="indfrom", end="indthru"
+    )
 
     return df.drop(columns=["indfrom", "indthru"])
 
 
-def load_quarterly_compustat_data(df: pd.DataFrame, path: Path) -> pd.DataFrame:
-    compu = pd.read_parquet(get_latest_file(path / "compustat_quarterly.parquet"))
-    # compute book to market ratio
-    compu["market_value"] = (
-        compu["prccq"] * compu["cshprq"]
-        + compu["dlcq"].fillna(0)
-        + compu["dlttq"].fillna(0)
-        + compu["pstkq"].fillna(0)
-        - compu["txditcq"].fillna(0)
+def quarterly_bm_ratio(path: Path) -> pd.DataFrame:
+    """
+    Book-to-market ratio (bm_ratio of `characteristics.definitions`) of the last
+    fiscal quarter of each gvkey and year with a ratio, keyed by the following
+    year for the merge with CRSP.
+
+    Args:
+        path (Path): download cache directory.
+
+    Returns:
+        pd.DataFrame: gvkey, year and bm_ratio.
+    """
+    compu = read_dataset(
+        path / "compustat_quarterly.parquet",
+        columns=[
+            "gvkey",
+            "datadate",
+            "prccq",
+            "cshprq",
+            "dlcq",
+            "dlttq",
+            "pstkq",
+            "txditcq",
+            "atq",
+        ],
     )
-    compu["bm_ratio"] = compu["atq"] / compu["market_value"]
+    # compute book to market ratio
+    compu["bm_ratio"] = compute_characteristics(compu, "quarterly", ["bm_ratio"])[
+        "bm_ratio"
+    ]
 
     compu["year"] = compu["datadate"].dt.year + 1
 
     compu = compu[["gvkey", "year", "bm_ratio"]]
     compu = compu[compu["bm_ratio"].notna()]
-    compu = compu.groupby(["gvkey", "year"]).last().reset_index()
+    return compu.groupby(["gvkey", "year"]).last().reset_index()
 
+
+def load_quarterly_compustat_data(df: pd.DataFrame, path: Path) -> pd.DataFrame:
     # merge on gvkey and nearest date prior to crsp date
     df = df.merge(
-        compu,
+        quarterly_bm_ratio(path),
         on=["gvkey", "year"],
         how="left",
     )
@@ -328,19 +380,16 @@ def clean_panel_data(df: pd.DataFrame, path: Path, add_gic: bool = False) -> Non
     return df
 
 
-def build_panel(
+def merge_panel_data(
+    df: pd.DataFrame,
     download_dir: Path,
-    open_dir: Path,
-    restricted_dir: Path,
-    clean_dir: Path,
     preprocess_dir: Path,
     add_gic: bool = False,
-) -> None:
+    trading_dates: pd.DatetimeIndex | None = None,
+) -> pd.DataFrame:
     """
-    Main function to process the panel data.
+    Merges the Compustat, Fama-French and IBES data with the CRSP data.
     """
-    print("Loading CRSP data...")
-    df = load_crsp_file(download_dir)
     if add_gic:
         print("Loading GIC data...")
         df = load_gic(df, download_dir)
@@ -352,9 +401,141 @@ def build_panel(
     df = load_fama_french_bm_breakpoints(df, download_dir)
     df = load_fama_french_25_portfolios(df, download_dir)
     print("Loading IBES data...")
-    df = load_ibes_data(df, preprocess_dir, adjust_ibes_date_with_timestamp=False)
+    df = load_ibes_data(
+        df,
+        preprocess_dir,
+        adjust_ibes_date_with_timestamp=False,
+        trading_dates=trading_dates,
+    )
     print("Loading IBES analyst coverage data...")
     df = load_ibes_analyst_coverage_data(df, preprocess_dir)
     # df = load_vix_data(df, download_dir)
 
+    return df
+
+
+def build_panel(
+    download_dir: Path,
+    open_dir: Path,
+    restricted_dir: Path,
+    clean_dir: Path,
+    preprocess_dir: Path,
+    add_gic: bool = False,
+) -> None:
+    """
+    Main function to process the panel data.
+    """
+    print("Loading CRSP data...")
+    df = load_crsp_file(download_dir)
+    df = merge_panel_data(df, download_dir, preprocess_dir, add_gic=add_gic)
+
     return clean_panel_data(df, clean_dir, add_gic=add_gic)
+
+
+def _add_chunk_columns(
+    df: pd.DataFrame,
+    lookback: Optional[pd.DataFrame],
+    add_columns: Callable[[pd.DataFrame], pd.DataFrame],
+    lookback_days: int,
+) -> tuple:
+    # the chunk with the new columns, and the rows of its last lookback_days dates
+    # (with the previous lookback rows if the chunk has fewer dates)
+    extended = df if lookback is None else pd.concat([lookback, df], ignore_index=True)
+    n_lookback = len(extended) - len(df)
+    out = add_columns(extended).iloc[n_lookback:]
+    out.index = df.index
+
+    if not lookback_days:
+        return out, None
+    dates = np.sort(extended["date"].unique())[-lookback_days:]
+    lookback = extended[extended["date"] >= dates[0]].reset_index(drop=True)
+    return out, lookback
+
+
+def build_panel_chunked(
+    download_dir: Path,
+    open_dir: Path,
+    restricted_dir: Path,
+    clean_dir: Path,
+    preprocess_dir: Path,
+    panel_file: Path,
+    chunk_months: int = 12,
+    add_gic: bool = False,
+    add_columns: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    lookback_days: int = 0,
+) -> Path:
+    """
+    Builds the panel data by chunks of `chunk_months` months of CRSP data and
+    writes it to `panel_file`, so that peak memory is bounded by one chunk.
+
+    Each chunk goes through the same load, merge and clean steps as `build_panel`.
+    All the steps are row-wise or merges on the date, except the shift of the
+    announcement dates to the next trading date, which uses the trading calendar
+    of the whole sample. The chunks are written to temporary files and streamed
+    into `panel_file` with a common schema (a column that is empty in a chunk has
+    the type of the other chunks). The rows are the ones of `build_panel`, but
+    ordered by chunk, then by permno and date within each chunk, where
+    `build_panel` sorts all of them by permno and date: sort the loaded panel if
+    the order matters.
+
+    `add_columns` adds columns to each cleaned chunk, e.g. the rolling risk
+    characteristics and the point-in-time fundamentals. It is applied to the chunk
+    preceded by the rows of the last `lookback_days` trading dates of the previous
+    chunks, so that a rolling window of up to `lookback_days` days gets the same
+    values as on the whole panel, and the lookback rows are dropped afterwards.
+
+    Args:
+        panel_file (Path): output file.
+        chunk_months (int, optional): number of months of CRSP data per chunk. Defaults to 12.
+        add_gic (bool, optional): keep the stocks with a GIC sector. Defaults to False.
+        add_columns (Callable, optional): function of a panel chunk returning it with more columns and the same rows. Defaults to None.
+        lookback_days (int, optional): trading dates of the previous chunks given to `add_columns`. Defaults to 0.
+
+    Returns:
+        Path: the panel file.
+    """
+    # trading calendar of the whole sample, read by batches of the date column
+    crsp_file = pq.ParquetFile(get_latest_file(download_dir / "crsp_daily.parquet"))
+    dates = pd.DatetimeIndex([])
+    for batch in crsp_file.iter_batches(columns=["date"]):
+        dates = dates.union(batch.column("date").unique().to_pandas())
+    trading_dates = trading_calendar(pd.Series(dates))
+
+    bounds = pd.date_range(CRSP_START_DATE, CRSP_END_DATE, freq=f"{chunk_months}MS")
+    bounds = bounds.append(pd.DatetimeIndex([CRSP_END_DATE]) + pd.Timedelta(days=1))
+
+    with tempfile.TemporaryDirectory(dir=panel_file.parent) as tmp_dir:
+        parts = []
+        lookback = None
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            print(f"Loading CRSP data from {start:%Y-%m-%d} to {end:%Y-%m-%d}...")
+            df = load_crsp_file(download_dir, start, end)
+            if df.empty:
+                continue
+            df = merge_panel_data(
+                df, download_dir, preprocess_dir, add_gic, trading_dates
+            )
+            df = clean_panel_data(df, clean_dir, add_gic=add_gic)
+            if df.empty:
+                continue
+            if add_columns is not None:
+                df, lookback = _add_chunk_columns(
+                    df, lookback, add_columns, lookback_days
+                )
+            part = Path(tmp_dir) / f"part_{len(parts):04d}.parquet"
+            df.to_parquet(part, index=False, engine="pyarrow")
+            parts.append(part)
+            logging.info(f"Panel chunk {start:%Y-%m} written. Shape: {df.shape}")
+            del df
+
+        if not parts:
+            raise ValueError("No CRSP data in the panel period")
+        schema = pa.unify_schemas(
+            [pq.read_schema(part) for part in parts], promote_options="permissive"
+        )
+        with pq.ParquetWriter(panel_file, schema) as writer:
+            for part in parts:
+                table = pq.read_table(part).select(schema.names)
+                writer.write_table(table.cast(schema))
+
+    return panel_file
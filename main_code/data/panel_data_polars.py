@@ -0,0 +1,323 @@
+from pathlib import Path
+
+import pandas as pd
+import polars as pl
+
+from ..utils import get_latest_file
+from .panel_data import (
+    CRSP_END_DATE,
+    CRSP_START_DATE,
+    build_panel,
+    quarterly_bm_ratio,
+)
+
+FF_ME = {
+    "size_bp4": "ff_me_20",
+    "size_bp8": "ff_me_40",
+    "size_bp12": "ff_me_60",
+    "size_bp16": "ff_me_80",
+}
+FF_BM = {
+    "bm_bp4": "ff_bm_20",
+    "bm_bp8": "ff_bm_40",
+    "bm_bp12": "ff_bm_60",
+    "bm_bp16": "ff_bm_80",
+}
+
+
+def scan(file: Path) -> pl.LazyFrame:
+    """
+    Lazy scan of the latest version of a Parquet cache, with the timestamps in
+    nanoseconds (the resolution of pandas) so that the date keys of all the files
+    join.
+    """
+    lf = pl.scan_parquet(get_latest_file(file))
+    return lf.with_columns(pl.col(pl.Datetime).cast(pl.Datetime("ns")))
+
+
+def _present(x: pl.Expr) -> pl.Expr:
+    # pandas notna: neither null nor NaN
+    return x.fill_nan(None).is_not_null()
+
+
+def _quintile(x: pl.Expr, breakpoints: list) -> pl.Expr:
+    # as assign_mcap_breakpoints / assign_bm_breakpoints: NaN values and missing
+    # breakpoints give a missing quintile
+    x = x.fill_nan(None)
+    expr = pl.when(x < pl.col(breakpoints[0])).then(0.0)
+    for q in range(1, 4):
+        expr = expr.when(
+            (x >= pl.col(breakpoints[q - 1])) & (x < pl.col(breakpoints[q]))
+        ).then(float(q))
+    return expr.when(x >= pl.col(breakpoints[3])).then(4.0).otherwise(None)
+
+
+def crsp_query(path: Path) -> pl.LazyFrame:
+    """
+    Polars version of `load_crsp_file`.
+    """
+    crsp = (
+        scan(path / "crsp_daily.parquet")
+        .with_row_index("_crsp_row")
+        .filter(pl.col("date") >= pd.Timestamp(CRSP_START_DATE))
+        .with_columns(
+            pl.col("date").dt.truncate("1mo").alias("year_month"),
+            pl.col("date").dt.year().alias("year"),
+        )
+        .rename({"ncusip": "cusip"})
+    )
+    link = (
+        scan(path / "crsp_compu_link_table.parquet")
+        .select(["gvkey", pl.col("lpermno").alias("permno"), "linkdt", "linkenddt"])
+        .with_row_index("_link_row")
+        .with_columns(
+            pl.col("linkenddt").fill_null(pd.Timestamp(CRSP_END_DATE)),
+            pl.col("permno").cast(crsp.collect_schema()["permno"]),
+        )
+    )
+    n_links = link.select(pl.len()).collect().item()
+
+    # interval join, then the first (CRSP row, link row) match of each permno-date
+    crsp = crsp.join(link, on="permno", how="inner").filter(
+        pl.col("date").is_between(pl.col("linkdt"), pl.col("linkenddt"))
+    )
+    rank = pl.col("_crsp_row").cast(pl.Int64) * n_links + pl.col("_link_row")
+    return crsp.filter(rank == rank.min().over(["permno", "date"])).drop(
+        ["_crsp_row", "_link_row", "linkdt", "linkenddt"]
+    )
+
+
+def gic_query(lf: pl.LazyFrame, path: Path) -> pl.LazyFrame:
+    """
+    Polars version of `load_gic`.
+    """
+    gic = (
+        scan(path / "compustat_gic_codes.parquet")
+        .select(["gvkey", "gsector", "ggroup", "indfrom", "indthru"])
+        .with_columns(pl.col("indthru").fill_null(pd.Timestamp(CRSP_END_DATE)))
+    )
+    return (
+        lf.join(gic, on="gvkey", how="inner")
+        .filter(pl.col("date").is_between(pl.col("indfrom"), pl.col("indthru")))
+        .drop(["indfrom", "indthru"])
+    )
+
+
+def compustat_query(lf: pl.LazyFrame, path: Path) -> pl.LazyFrame:
+    """
+    Polars version of `load_quarterly_compustat_data`. The book-to-market ratios
+    are the ones of `quarterly_bm_ratio`, computed from the characteristic
+    definitions.
+    """
+    compu = pl.from_pandas(quarterly_bm_ratio(path)).lazy()
+    return lf.join(compu, on=["gvkey", "year"], how="left")
+
+
+def fama_french_query(lf: pl.LazyFrame, path: Path) -> pl.LazyFrame:
+    """
+    Polars version of the Fama-French loaders: returns, size and book-to-market
+    breakpoints and the 25 size-B/M portfolios.
+    """
+    ff = scan(path / "ff5_daily.parquet").with_columns(
+        (pl.col("mkt_rf") + pl.col("rf")).alias("mkt")
+    )
+    lf = lf.join(ff, on="date", how="left")
+
+    ff_me = scan(path / "ff_size_breakpoints.parquet").select(
+        pl.col("date").dt.truncate("1mo").alias("year_month_merge"),
+        *[pl.col(bp).alias(name) for bp, name in FF_ME.items()],
+    )
+    lf = lf.with_columns(
+        pl.col("year_month").dt.offset_by("-1mo").alias("year_month_merge")
+    ).join(ff_me, on="year_month_merge", how="left")
+
+    year = pl.col("date").dt.year()
+    year_merge = pl.when(pl.col("date").dt.month() < 7).then(year - 1).otherwise(year)
+    ff_bm = scan(path / "ff_bm_breakpoints.parquet").select(
+        year_merge.alias("_year"),
+        *[pl.col(bp).alias(name) for bp, name in FF_BM.items()],
+        year_merge.alias("year_merge"),
+    )
+    lf = lf.join(ff_bm, left_on="year", right_on="_year", how="left")
+
+    ff_25 = scan(path / "ff_25_size_bm_portfolios_daily.parquet")
+    return lf.join(ff_25, on="date", how="left")
+
+
+def ibes_query(lf: pl.LazyFrame, path: Path) -> pl.LazyFrame:
+    """
+    Polars version of `load_ibes_data` (announcement dates moved to the next
+    trading date, without the timestamp adjustment) and
+    `load_ibes_analyst_coverage_data`.
+    """
+    calendar = (
+        lf.select("date")
+        .unique()
+        .filter(pl.col("date").dt.weekday() <= 5)
+        .sort("date")
+    )
+    ibes = (
+        scan(path / "ibes_sue.parquet")
+        .select(["permno", "datetime", "sue"])
+        .with_row_index("_ibes_row")
+        .filter(
+            (pl.col("datetime") >= pd.Timestamp("1984-01-01"))
+            & (pl.col("datetime") <= pd.Timestamp("2024-12-31"))
+        )
+        .with_columns(pl.col("datetime").dt.truncate("1d").alias("ea_date"))
+        .sort("ea_date")
+        .join_asof(calendar, left_on="ea_date", right_on="date", strategy="forward")
+        .filter(pl.col("date").is_not_null())
+        # there about 100 dups (dual shares related to the same permno and date)
+        .filter(
+            pl.col("_ibes_row") == pl.col("_ibes_row").min().over(["permno", "date"])
+        )
+        .select(["permno", "date", "sue", pl.lit(1.0).alias("ea")])
+    )
+    ibes = ibes.with_columns(pl.col("permno").cast(lf.collect_schema()["permno"]))
+    lf = lf.join(ibes, on=["permno", "date"], how="left")
+
+    coverage = (
+        scan(path / "ibes_sue.parquet")
+        .filter(pl.col("datetime") >= pd.Timestamp("1984-01-01"))
+        .select(
+            pl.col("datetime").dt.truncate("1q").alias("year_quarter"),
+            pl.col("permno").cast(lf.collect_schema()["permno"]),
+            pl.col("numest").cast(pl.Float64).alias("n_analysts"),
+        )
+        .group_by(["year_quarter", "permno"])
+        .agg(pl.col("n_analysts").drop_nulls().first())
+    )
+    return (
+        lf.with_columns(pl.col("date").dt.truncate("1q").alias("year_quarter"))
+        .join(coverage, on=["year_quarter", "permno"], how="left")
+        .drop("year_quarter")
+        .with_columns(pl.col("n_analysts").fill_null(0))
+        .with_columns((pl.col("n_analysts") + 1).log().alias("ln_n_analysts"))
+    )
+
+
+def clean_query(lf: pl.LazyFrame, add_gic: bool = False) -> pl.LazyFrame:
+    """
+    Polars version of `clean_panel_data`.
+    """
+    lf = (
+        lf.with_columns(
+            pl.col("date").dt.year().alias("year"),
+            pl.col("date").dt.month().cast(pl.Int32).alias("month"),
+        )
+        .filter(
+            (pl.col("date") >= pd.Timestamp("1983-12-01"))
+            & (pl.col("date") <= pd.Timestamp("2024-12-31"))
+            & _present(pl.col("ret"))
+            & _present(pl.col("prc"))
+            & (pl.col("date").dt.weekday() <= 5)
+        )
+        .with_columns(pl.col("date").dt.month_end().alias("year_month"))
+        .with_columns(
+            ((pl.col("prc") - pl.col("openprc")) / pl.col("openprc")).alias("ret_oc")
+        )
+        .with_columns(
+            ((1 + pl.col("ret")) / (1 + pl.col("ret_oc")) - 1).alias("ret_on"),
+            pl.col("ret").abs().alias("abs_ret"),
+            (pl.col("ret") - pl.col("mkt")).alias("abn_ret"),
+        )
+        .with_columns(
+            (pl.col("ret") < 0).cast(pl.Int64).alias("neg_ret"),
+            (pl.col("abn_ret") < 0)
+            .fill_null(False)
+            .cast(pl.Int64)
+            .alias("neg_abn_ret"),
+            pl.col("abn_ret").abs().alias("abs_abn_ret"),
+            (pl.col("prc") * pl.col("shrout") * 1000).alias("mcap"),
+        )
+        .with_columns(
+            pl.col("mcap").log().alias("ln_mcap"),
+            _quintile(pl.col("mcap"), list(FF_ME.values())).alias("mcap_qnt"),
+        )
+        .drop(list(FF_ME.values()))
+        .with_columns(
+            _quintile(pl.col("bm_ratio"), list(FF_BM.values())).alias("bm_qnt")
+        )
+        .drop(list(FF_BM.values()))
+        .with_columns(pl.col("ea").fill_null(0))
+    )
+    if add_gic:
+        lf = lf.filter(pl.col("gsector").is_not_null())
+
+    # return of the FF portfolio of the size and B/M quintiles of the stock
+    ff_port = pl.lit(None, dtype=pl.Float64)
+    for i in range(1, 6):
+        for j in range(1, 6):
+            ff_port = (
+                pl.when((pl.col("bm_qnt") == j - 1) & (pl.col("mcap_qnt") == i - 1))
+                .then(pl.col(f"ff_size{i}_bm{j}"))
+                .otherwise(ff_port)
+            )
+
+    return lf.sort(["permno", "date"]).with_columns(
+        (1 + pl.col("ret")).log().alias("ln_ret"), ff_port.alias("ff_port")
+    )
+
+
+def panel_query(
+    download_dir: Path, preprocess_dir: Path, add_gic: bool = False
+) -> pl.LazyFrame:
+    """
+    The panel data as a single Polars lazy query over the Parquet caches.
+    """
+    lf = crsp_query(download_dir)
+    if add_gic:
+        lf = gic_query(lf, download_dir)
+    lf = compustat_query(lf, download_dir)
+    lf = fama_french_query(lf, download_dir)
+    lf = ibes_query(lf, preprocess_dir)
+    return clean_query(lf, add_gic=add_gic)
+
+
+def build_panel_polars(
+    download_dir: Path,
+    open_dir: Path,
+    restricted_dir: Path,
+    clean_dir: Path,
+    preprocess_dir: Path,
+    add_gic: bool = False,
+) -> pd.DataFrame:
+    """
+    Polars backend of `build_panel`: the same load, merge and clean steps expressed
+    as one lazy query, so that the date, missing return and weekday filters and the
+    column projections are pushed into the Parquet scans and the query runs on all
+    cores. Returns the same DataFrame as `build_panel` (see `check_panel_parity`).
+    """
+    print("Building panel data with Polars...")
+    df = panel_query(download_dir, preprocess_dir, add_gic=add_gic).collect()
+    df = df.to_pandas()
+    # Polars has no period type
+    df["year_month_merge"] = df["year_month_merge"].dt.to_period("M")
+    return df
+
+
+def check_panel_parity(
+    download_dir: Path,
+    open_dir: Path,
+    restricted_dir: Path,
+    clean_dir: Path,
+    preprocess_dir: Path,
+    add_gic: bool = False,
+) -> pd.DataFrame:
+    """
+    Builds the panel with both backends and raises an AssertionError if they
+    differ. The rows are compared after sorting by permno and date.
+
+    Returns:
+        pd.DataFrame: the panel built with Polars.
+    """
+    args = (download_dir, open_dir, restricted_dir, clean_dir, preprocess_dir)
+    expected = build_panel(*args, add_gic=add_gic)
+    result = build_panel_polars(*args, add_gic=add_gic)
+    pd.testing.assert_frame_equal(
+        result.sort_values(["permno", "date"], kind="stable").reset_index(drop=True),
+        expected.sort_values(["permno", "date"], kind="stable").reset_index(drop=True),
+        check_dtype=False,
+    )
+    return result
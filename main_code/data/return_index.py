@@ -0,0 +1,254 @@
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+STOCK_RETURNS = ["ret", "ff_port"]
+FACTOR_RETURNS = ["mkt"] + [
+    f"ff_size{i}_bm{j}" for i in range(1, 6) for j in range(1, 6)
+]
+MANIFEST = "manifest.json"
+# bump when the layout of the index changes, to rebuild the existing indexes
+INDEX_FORMAT = 2
+
+
+def _days(dates) -> np.ndarray:
+    # dates as int64 days since the epoch
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def cumulative_log_returns(
+    df: pd.DataFrame, columns: list, by: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Running sums of the log gross returns, of the number of non-missing returns and
+    of the number of total losses (returns of -100% or less) of each column, along
+    the rows of `df` (sorted by `by` and date). A missing return or a total loss
+    adds 0 to the log sum, so that a window that does not contain the total loss
+    compounds the other returns, and a window that contains it returns -1 (see
+    `window_returns`). A missing return is not counted.
+
+    Args:
+        df (pd.DataFrame): returns sorted by `by` and date.
+        columns (list): return columns.
+        by (str, optional): column of the series, e.g. permno. Defaults to None (a single series).
+
+    Returns:
+        pd.DataFrame: cum_ln_{col}, cum_n_{col} and cum_loss_{col} for each column.
+    """
+    out = {}
+    for col in columns:
+        ret = df[col].to_numpy(dtype=np.float64)
+        present = ~np.isnan(ret)
+        loss = ret <= -1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ln_ret = np.log1p(ret)
+        cum = pd.DataFrame(
+            {
+                "ln": np.where(present & ~loss, ln_ret, 0.0),
+                "n": present.astype(np.int32),
+                "loss": loss.astype(np.int32),
+            },
+            index=df.index,
+        )
+        cum = cum.groupby(df[by], sort=False).cumsum() if by else cum.cumsum()
+        out[f"cum_ln_{col}"] = cum["ln"].to_numpy()
+        out[f"cum_n_{col}"] = cum["n"].to_numpy(dtype=np.int32)
+        out[f"cum_loss_{col}"] = cum["loss"].to_numpy(dtype=np.int32)
+    return pd.DataFrame(out, index=df.index)
+
+
+def build_return_index(
+    panel: pd.DataFrame,
+    index_dir: Path,
+    stock_columns: list = STOCK_RETURNS,
+    factor_columns: list = FACTOR_RETURNS,
+    version: Optional[str] = None,
+) -> Path:
+    """
+    Writes the cumulative log-return index of the panel: per permno for the stock
+    return and its FF25 benchmark (stocks.parquet, sorted by permno and date), and
+    per date for the market and each FF25 portfolio (factors.parquet). The
+    compounded return over any window is then the difference of two lookups (see
+    `window_returns`).
+
+    Args:
+        panel (pd.DataFrame): long panel with permno, date and the return columns.
+        index_dir (Path): directory of the index.
+        stock_columns (list, optional): returns indexed per permno. Defaults to STOCK_RETURNS.
+        factor_columns (list, optional): returns indexed per date. Defaults to FACTOR_RETURNS.
+        version (str, optional): version of the panel, e.g. the panel file name. The index is not rebuilt if it holds the same version. Defaults to None (always rebuilt).
+
+    Returns:
+        Path: the index directory.
+    """
+    index_dir = Path(index_dir)
+    manifest_path = index_dir / MANIFEST
+    if version is not None and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if [manifest["version"], manifest.get("format")] == [version, INDEX_FORMAT]:
+            logging.info(f"Return index up to date: {index_dir}")
+            return index_dir
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    # an index without manifest is incomplete
+    manifest_path.unlink(missing_ok=True)
+
+    stocks = (
+        panel[["permno", "date"] + stock_columns]
+        .sort_values(["permno", "date"])
+        .reset_index(drop=True)
+    )
+    cum = cumulative_log_returns(stocks, stock_columns, by="permno")
+    stocks = pd.concat([stocks[["permno", "date"]], cum], axis=1)
+    stocks.to_parquet(index_dir / "stocks.parquet", index=False)
+
+    factors = (
+        panel[["date"] + factor_columns]
+        .drop_duplicates("date")
+        .sort_values("date")
+        .reset_index(drop=True)
+    )
+    factors = pd.concat(
+        [factors[["date"]], cumulative_log_returns(factors, factor_columns)], axis=1
+    )
+    factors.to_parquet(index_dir / "factors.parquet", index=False)
+
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "version": version,
+                "format": INDEX_FORMAT,
+                "stocks": stock_columns,
+                "factors": factor_columns,
+            }
+        )
+    )
+    logging.info(f"Return index of {len(stocks)} stock-days saved to {index_dir}")
+    return index_dir
+
+
+def load_return_index(index_dir: Path) -> dict:
+    """
+    Reads the return index written by `build_return_index`.
+
+    Args:
+        index_dir (Path): directory of the index.
+
+    Returns:
+        dict: "stocks" and "factors" DataFrames.
+    """
+    index_dir = Path(index_dir)
+    if not (index_dir / MANIFEST).exists():
+        raise FileNotFoundError(f"No complete return index in {index_dir}")
+    return {
+        "stocks": pd.read_parquet(index_dir / "stocks.parquet"),
+        "factors": pd.read_parquet(index_dir / "factors.parquet"),
+    }
+
+
+def _columns(index: pd.DataFrame, columns: Optional[list]) -> list:
+    if columns is None:
+        return [c[len("cum_ln_") :] for c in index.columns if c.startswith("cum_ln_")]
+    return columns
+
+
+def _window(keys, index, columns, first_key, last_key, first_seg, last_seg):
+    # last row before the window and last row of the window, -1 if none in the series
+    before = np.searchsorted(keys, first_key, side="left") - 1
+    last = np.searchsorted(keys, last_key, side="right") - 1
+    before = np.where(before >= first_seg, before, -1)
+    last = np.where(last >= first_seg, np.minimum(last, last_seg), -1)
+    # empty window
+    before = np.minimum(before, last)
+
+    out = {}
+    for col in columns:
+        for kind in ("ln", "n", "loss"):
+            cum = index[f"cum_{kind}_{col}"].to_numpy()
+            # running sums with a leading 0 at position -1
+            cum = np.concatenate([cum, np.zeros(1, dtype=cum.dtype)])
+            out[f"{kind}_{col}"] = cum[last] - cum[before]
+        # a total loss in the window loses everything
+        loss = out.pop(f"loss_{col}") > 0
+        out[col] = np.where(loss, -1.0, np.expm1(out.pop(f"ln_{col}")))
+    return out
+
+
+def window_returns(
+    index: pd.DataFrame,
+    permno,
+    start,
+    end,
+    columns: Optional[list] = None,
+) -> pd.DataFrame:
+    """
+    Compounded returns of each (permno, start, end) query over the days of
+    [start, end] in the panel, from the per-permno index:
+    exp(cum_ln(end) - cum_ln(day before start)) - 1, or -1 if the window contains a
+    total loss. The queries are answered with binary searches on the sorted index,
+    whatever the window lengths.
+
+    Args:
+        index (pd.DataFrame): the "stocks" index of `load_return_index`.
+        permno (array-like): permno of each query.
+        start (array-like): first date of each window (included).
+        end (array-like): last date of each window (included).
+        columns (list, optional): returns to compound. Defaults to None (all the indexed returns).
+
+    Returns:
+        pd.DataFrame: per query, the compounded return of each column and n_{col}, the number of non-missing returns in the window (0 for a permno not in the index).
+    """
+    columns = _columns(index, columns)
+    permnos = index["permno"].to_numpy()
+    days = _days(index["date"])
+    origin = days.min() if len(days) else 0
+    # permno code times a span larger than the dates, plus the date
+    codes, uniques = pd.factorize(permnos, sort=True)
+    span = days.max() - origin + 2 if len(days) else 1
+    keys = codes * span + (days - origin)
+
+    permno = np.asarray(permno)
+    query = pd.Index(uniques).get_indexer(permno)
+    first_seg = np.searchsorted(codes, query, side="left")
+    last_seg = np.searchsorted(codes, query, side="right") - 1
+    # start and end clipped to the dates of the index
+    first = np.clip(_days(start) - origin, 0, span - 1)
+    last = np.clip(_days(end) - origin, -1, span - 2)
+    first_key = np.where(query >= 0, query * span + first, -1)
+    last_key = np.where(query >= 0, query * span + last, -2)
+
+    out = _window(keys, index, columns, first_key, last_key, first_seg, last_seg)
+    return pd.DataFrame(
+        {"permno": permno, "start": np.asarray(start), "end": np.asarray(end), **out}
+    )
+
+
+def factor_window_returns(
+    index: pd.DataFrame, start, end, columns: Optional[list] = None
+) -> pd.DataFrame:
+    """
+    Compounded market and FF25 portfolio returns over the days of each
+    [start, end] window, from the per-date index.
+
+    Args:
+        index (pd.DataFrame): the "factors" index of `load_return_index`.
+        start (array-like): first date of each window (included).
+        end (array-like): last date of each window (included).
+        columns (list, optional): returns to compound. Defaults to None (all the indexed returns).
+
+    Returns:
+        pd.DataFrame: per window, the compounded return of each column and n_{col}, the number of non-missing returns in the window.
+    """
+    columns = _columns(index, columns)
+    keys = _days(index["date"])
+    first_key = _days(start)
+    last_key = _days(end)
+    first_seg = np.zeros(len(first_key), dtype=np.int64)
+    last_seg = np.full(len(first_key), len(keys) - 1)
+
+    out = _window(keys, index, columns, first_key, last_key, first_seg, last_seg)
+    return pd.DataFrame({"start": np.asarray(start), "end": np.asarray(end), **out})
@@ -0,0 +1,85 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from ..utils import grouped_rolling_ols
+
+FACTOR_MODELS = {
+    "capm": ["mkt_rf"],
+    "ff3": ["mkt_rf", "smb", "hml"],
+    "ff5": ["mkt_rf", "smb", "hml", "rmw", "cma"],
+}
+
+
+def risk_columns(models: list, windows: list) -> list:
+    """
+    Names of the columns added by `add_risk_characteristics`:
+    b_{factor}_{model}_{window}d for the loadings (b_mkt_rf_capm_252d is the market
+    beta) and ivol_{model}_{window}d for the idiosyncratic volatility.
+    """
+    return [
+        name
+        for model in models
+        for window in windows
+        for name in [f"b_{f}_{model}_{window}d" for f in FACTOR_MODELS[model]]
+        + [f"ivol_{model}_{window}d"]
+    ]
+
+
+def add_risk_characteristics(
+    panel: pd.DataFrame,
+    models: list = ["capm"],
+    windows: list = [252],
+    min_obs: float = 0.5,
+) -> pd.DataFrame:
+    """
+    Adds rolling factor loadings and idiosyncratic volatility to the panel.
+
+    For each permno-day, the excess return (ret - rf) is regressed on a constant and
+    the factors of each model over the last `window` trading days of the panel,
+    including the day. The windows are measured on the trading calendar, so days
+    missing for a stock shorten its window instead of reaching further back. The
+    idiosyncratic volatility is the standard deviation of the daily residuals. All
+    the windows are computed in one pass of rolling cross-product sums (see
+    `grouped_rolling_ols`).
+
+    Args:
+        panel (pd.DataFrame): panel with permno, date, ret, rf and the factor returns.
+        models (list, optional): factor models, keys of FACTOR_MODELS. Defaults to ["capm"].
+        windows (list, optional): window lengths in trading days. Defaults to [252].
+        min_obs (float, optional): minimum number of returns in a window, or a fraction of the window length if below 1. Defaults to 0.5.
+
+    Returns:
+        pd.DataFrame: the panel with the columns of `risk_columns(models, windows)`, NaN where a window has too few returns.
+    """
+    unknown = set(models) - set(FACTOR_MODELS)
+    if unknown:
+        raise ValueError(f"Unknown factor models: {sorted(unknown)}")
+
+    # rows sorted by permno and date, and their position in the trading calendar
+    order = np.lexsort((panel["date"].to_numpy(), panel["permno"].to_numpy()))
+    times = pd.factorize(panel["date"], sort=True)[0][order]
+    permnos = panel["permno"].to_numpy()[order]
+    excess = (panel["ret"] - panel["rf"]).to_numpy(dtype=float)[order]
+
+    columns = {}
+    for model in models:
+        factors = FACTOR_MODELS[model]
+        X = panel[factors].to_numpy(dtype=float)[order]
+        for window in windows:
+            logging.info(f"Rolling {model} regressions over {window} days...")
+            n_min = int(np.ceil(min_obs * window)) if min_obs < 1 else int(min_obs)
+            coef, _, resid_std = grouped_rolling_ols(
+                excess, X, permnos, times, window, min_obs=n_min
+            )
+            for j, factor in enumerate(factors, start=1):
+                columns[f"b_{factor}_{model}_{window}d"] = coef[:, j]
+            columns[f"ivol_{model}_{window}d"] = resid_std
+
+    # back to the order of the panel
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return panel.assign(
+        **{name: values[inverse] for name, values in columns.items()}
+    )
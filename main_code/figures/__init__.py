@@ -1,6 +1,21 @@
-from .event_study_earnings import plot_event_study_earnings
-from .event_study_ann_ret import plot_event_study_earnings_ann_ret
-from .n_ea_per_year import plot_n_earnings_per_year
-from .n_stocks_per_year import plot_n_stocks_per_year
+from .event_study_earnings import event_study_earnings_jobs, plot_event_study_earnings
+from .event_study_ann_ret import (
+    event_study_ann_ret_jobs,
+    plot_event_study_earnings_ann_ret,
+)
+from .n_ea_per_year import n_earnings_per_year_jobs, plot_n_earnings_per_year
+from .n_stocks_per_year import n_stocks_per_year_jobs, plot_n_stocks_per_year
+from .render import figure_job, render_figures
 
-__all__ = ["plot_n_stocks_per_year", "plot_n_earnings_per_year", "plot_event_study_earnings"]
+__all__ = [
+    "plot_n_stocks_per_year",
+    "plot_n_earnings_per_year",
+    "plot_event_study_earnings",
+    "plot_event_study_earnings_ann_ret",
+    "n_stocks_per_year_jobs",
+    "n_earnings_per_year_jobs",
+    "event_study_earnings_jobs",
+    "event_study_ann_ret_jobs",
+    "figure_job",
+    "render_figures",
+]
@@ -1,9 +1,48 @@
 from pathlib import Path
+from typing import Optional
 
-import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
-from scipy import stats
+
+from .event_study_earnings import bhar_by_quintile, compute_bhar, render_bhar_quintiles
+from .plot_data import cached_plot_data, once, required
+from .render import figure_job, render_figures
+
+
+def event_study_ann_ret_jobs(
+    event_df: Optional[pd.DataFrame], fig_dir: Path, version: Optional[str] = None
+) -> list:
+    """
+    Figure jobs of the BHAR event study by earnings announcement return quintile
+    with 95% CI, for small and large cap stocks. The plot data are cached next to
+    the figures for the event data `version` (see `cached_plot_data`).
+    """
+    events = required(event_df, "Event data")
+    bhar = once(compute_bhar)
+
+    jobs = []
+    for size, cap, name in [
+        ("small", "Small Cap", "microcap"),
+        ("large", "Large Cap", "large"),
+    ]:
+        fig_path = fig_dir / f"event_study_bhar_by_ann_ret_quintile_{name}.png"
+        jobs.append(
+            figure_job(
+                render_bhar_quintiles,
+                cached_plot_data(
+                    fig_path,
+                    version,
+                    bhar_by_quintile,
+                    events,
+                    bhar,
+                    size=size,
+                    quintile="ann_ret_qnt",
+                ),
+                fig_path,
+                title=f"Average BHAR by Earnings Announcement Return Quintile ({cap})",
+                quintile="ann_ret_qnt",
+            )
+        )
+    return jobs
 
 
 def plot_event_study_earnings_ann_ret(event_df: pd.DataFrame, fig_dir: Path) -> None:
@@ -17,137 +56,4 @@ def plot_event_study_earnings_ann_ret(event_df: pd.DataFrame, fig_dir: Path) ->
     fig_dir : Path
         Directory to save the figures
     """
-
-    event_df = event_df[event_df["date"].dt.year >= 2010]
-    # event_df = event_df[event_df["event_t"] >= 1]
-
-    event_df["gret"] = 1 + event_df["ret"]
-    event_df["gmkt"] = 1 + event_df["mkt"]
-    event_df["gff_port"] = 1 + event_df["ff_port"]
-    event_df["cumret"] = event_df.groupby(["permno", "ea_date"])["gret"].cumprod()
-    event_df["cum_mkt"] = event_df.groupby(["permno", "ea_date"])["gmkt"].cumprod()
-    event_df["cum_ff_port"] = event_df.groupby(["permno", "ea_date"])[
-        "gff_port"
-    ].cumprod()
-    event_df["bhar"] = event_df["cumret"] - event_df["cum_ff_port"]
-
-    # Plot 1: Average BHAR for small cap (mcap_qnt == 0)
-    avg_bhar_small = (
-        event_df[event_df["mcap_qnt"] == 0]
-        .groupby("event_t")["bhar"]
-        .mean()
-        .reset_index()
-    )
-    avg_bhar_small = avg_bhar_small.sort_values("event_t")
-
-    # Plot 1: BHAR by earnings announcement return quintile with 95% CI (small cap)
-    def calc_stats(group):
-        n = len(group)
-        mean = group["bhar"].mean()
-        se = group["bhar"].std() / np.sqrt(n)
-        ci_95 = stats.t.ppf(0.975, n - 1) * se if n > 1 else 0
-        return pd.Series({"mean_bhar": mean, "ci_95": ci_95, "n": n})
-
-    bhar_by_quintile = (
-        event_df[event_df["mcap_qnt"] == 0]
-        .groupby(["ann_ret_qnt", "event_t"])
-        .apply(calc_stats)
-        .reset_index()
-    )
-
-    fig3, ax3 = plt.subplots(figsize=(12, 7))
-    colors = plt.cm.RdYlGn(np.linspace(0.1, 0.9, 5))
-    quintile_labels = [
-        "Q1 (Negative Surprise)",
-        "Q2",
-        "Q3",
-        "Q4",
-        "Q5 (Positive Surprise)",
-    ]
-
-    for q in range(5):
-        q_data = bhar_by_quintile[bhar_by_quintile["ann_ret_qnt"] == q].sort_values(
-            "event_t"
-        )
-        ax3.plot(
-            q_data["event_t"],
-            q_data["mean_bhar"],
-            color=colors[q],
-            linewidth=1.5,
-            label=quintile_labels[q],
-        )
-        ax3.fill_between(
-            q_data["event_t"],
-            q_data["mean_bhar"] - q_data["ci_95"],
-            q_data["mean_bhar"] + q_data["ci_95"],
-            color=colors[q],
-            alpha=0.2,
-        )
-
-    ax3.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
-    ax3.axvline(x=0, color="black", linestyle="--", linewidth=0.8)
-    ax3.set_xlabel("Days Relative to Earnings Announcement")
-    ax3.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
-    ax3.set_title("Average BHAR by Earnings Announcement Return Quintile (Small Cap)")
-    ax3.legend(loc="upper left")
-    ax3.grid(True, alpha=0.3)
-    plt.tight_layout()
-    fig3.savefig(
-        fig_dir / "event_study_bhar_by_ann_ret_quintile_microcap.png",
-        dpi=300,
-        bbox_inches="tight",
-    )
-    plt.close(fig3)
-
-    # Plot 2: BHAR by earnings surprise quintile with 95% CI (large cap)
-
-    bhar_by_quintile = (
-        event_df[event_df["mcap_qnt"] > 0]
-        .groupby(["ann_ret_qnt", "event_t"])
-        .apply(calc_stats)
-        .reset_index()
-    )
-
-    fig3, ax3 = plt.subplots(figsize=(12, 7))
-    colors = plt.cm.RdYlGn(np.linspace(0.1, 0.9, 5))
-    quintile_labels = [
-        "Q1 (Negative Surprise)",
-        "Q2",
-        "Q3",
-        "Q4",
-        "Q5 (Positive Surprise)",
-    ]
-
-    for q in range(5):
-        q_data = bhar_by_quintile[bhar_by_quintile["ann_ret_qnt"] == q].sort_values(
-            "event_t"
-        )
-        ax3.plot(
-            q_data["event_t"],
-            q_data["mean_bhar"],
-            color=colors[q],
-            linewidth=1.5,
-            label=quintile_labels[q],
-        )
-        ax3.fill_between(
-            q_data["event_t"],
-            q_data["mean_bhar"] - q_data["ci_95"],
-            q_data["mean_bhar"] + q_data["ci_95"],
-            color=colors[q],
-            alpha=0.2,
-        )
-
-    ax3.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
-    ax3.axvline(x=0, color="black", linestyle="--", linewidth=0.8)
-    ax3.set_xlabel("Days Relative to Earnings Announcement")
-    ax3.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
-    ax3.set_title("Average BHAR by Earnings Announcement Return Quintile (Large Cap)")
-    ax3.legend(loc="upper left")
-    ax3.grid(True, alpha=0.3)
-    plt.tight_layout()
-    fig3.savefig(
-        fig_dir / "event_study_bhar_by_ann_ret_quintile_large.png",
-        dpi=300,
-        bbox_inches="tight",
-    )
-    plt.close(fig3)
+    render_figures(event_study_ann_ret_jobs(event_df, fig_dir))
@@ -1,139 +1,121 @@
 from pathlib import Path
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from scipy import stats
 
+from .plot_data import cached_plot_data, once, required
+from .render import figure_job, render_figures
 
-def plot_event_study_earnings(event_df: pd.DataFrame, fig_dir: Path) -> None:
-    """
-    Create event study plots for earnings announcements showing BHAR.
+QUINTILE_LABELS = [
+    "Q1 (Negative Surprise)",
+    "Q2",
+    "Q3",
+    "Q4",
+    "Q5 (Positive Surprise)",
+]
 
-    Parameters
-    ----------
-    panel : pd.DataFrame
-        Panel dataset with columns: permno, date, ret, mkt, ea, sue, mcap_qnt
-    fig_dir : Path
-        Directory to save the figures
-    """
 
+def compute_bhar(event_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Buy-and-hold abnormal returns (against the FF portfolio) of the events since
+    2010, with the columns used by the plots.
+    """
     event_df = event_df[event_df["date"].dt.year >= 2010]
     # event_df = event_df[event_df["event_t"] >= 1]
 
-    event_df["gret"] = 1 + event_df["ret"]
-    event_df["gmkt"] = 1 + event_df["mkt"]
-    event_df["gff_port"] = 1 + event_df["ff_port"]
-    event_df["cumret"] = event_df.groupby(["permno", "ea_date"])["gret"].cumprod()
-    event_df["cum_mkt"] = event_df.groupby(["permno", "ea_date"])["gmkt"].cumprod()
-    event_df["cum_ff_port"] = event_df.groupby(["permno", "ea_date"])[
-        "gff_port"
-    ].cumprod()
-    event_df["bhar"] = event_df["cumret"] - event_df["cum_ff_port"]
-
-    # Plot 1: Average BHAR for small cap (mcap_qnt == 0)
-    avg_bhar_small = (
-        event_df[event_df["mcap_qnt"] == 0]
-        .groupby("event_t")["bhar"]
-        .mean()
-        .reset_index()
-    )
-    avg_bhar_small = avg_bhar_small.sort_values("event_t")
+    # cumulative gross returns of the stock and its FF portfolio within each event
+    cum = (1 + event_df[["ret", "ff_port"]]).groupby(
+        [event_df["permno"], event_df["ea_date"]]
+    ).cumprod()
 
-    fig1, ax1 = plt.subplots(figsize=(10, 6))
-    ax1.plot(
-        avg_bhar_small["event_t"],
-        avg_bhar_small["bhar"],
-        marker="o",
-        markersize=4,
-        linewidth=1.5,
-    )
-    ax1.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
-    ax1.axvline(
-        x=0, color="red", linestyle="--", linewidth=0.8, label="Earnings Announcement"
-    )
-    ax1.set_xlabel("Days Relative to Earnings Announcement")
-    ax1.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
-    ax1.set_title("Average BHAR Around Earnings Announcements (Small Cap)")
-    ax1.legend()
-    ax1.grid(True, alpha=0.3)
-    plt.tight_layout()
-    fig1.savefig(
-        fig_dir / "event_study_bhar_small_cap.png", dpi=300, bbox_inches="tight"
+    columns = ["event_t", "mcap_qnt", "sue_qnt", "ann_ret_qnt"]
+    return event_df[[c for c in columns if c in event_df]].assign(
+        bhar=cum["ret"] - cum["ff_port"]
     )
-    plt.close(fig1)
-    print(f"Figure saved to {fig_dir / 'event_study_bhar_small_cap.png'}")
 
-    # Plot 2: Average BHAR for large cap (mcap_qnt > 0)
-    avg_bhar_large = (
-        event_df[event_df["mcap_qnt"] > 0]
+
+def size_group(event_df: pd.DataFrame, size: str) -> pd.DataFrame:
+    # small cap: mcap_qnt == 0, large cap: mcap_qnt > 0
+    if size == "small":
+        return event_df[event_df["mcap_qnt"] == 0]
+    return event_df[event_df["mcap_qnt"] > 0]
+
+
+def avg_bhar(event_df: pd.DataFrame, size: str) -> pd.DataFrame:
+    """
+    Average BHAR by event day for small or large cap stocks.
+    """
+    return (
+        size_group(event_df, size)
         .groupby("event_t")["bhar"]
         .mean()
         .reset_index()
+        .sort_values("event_t")
     )
-    avg_bhar_large = avg_bhar_large.sort_values("event_t")
 
-    fig2, ax2 = plt.subplots(figsize=(10, 6))
-    ax2.plot(
-        avg_bhar_large["event_t"],
-        avg_bhar_large["bhar"],
+
+def bhar_by_quintile(event_df: pd.DataFrame, size: str, quintile: str) -> pd.DataFrame:
+    """
+    Average BHAR and 95% confidence interval by quintile and event day for small or
+    large cap stocks.
+    """
+    grouped = (
+        size_group(event_df, size)
+        .groupby([quintile, "event_t"])["bhar"]
+        .agg(["mean", "std", "size"])
+    )
+    n = grouped["size"].to_numpy(dtype=float)
+    se = grouped["std"].to_numpy() / np.sqrt(n)
+    with np.errstate(invalid="ignore"):
+        ci_95 = np.where(n > 1, stats.t.ppf(0.975, n - 1) * se, 0)
+    return pd.DataFrame(
+        {"mean_bhar": grouped["mean"].to_numpy(), "ci_95": ci_95, "n": n},
+        index=grouped.index,
+    ).reset_index()
+
+
+def render_avg_bhar(avg: pd.DataFrame, fig_path: Path, title: str) -> None:
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(
+        avg["event_t"],
+        avg["bhar"],
         marker="o",
         markersize=4,
         linewidth=1.5,
     )
-    ax2.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
-    ax2.axvline(
+    ax.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
+    ax.axvline(
         x=0, color="red", linestyle="--", linewidth=0.8, label="Earnings Announcement"
     )
-    ax2.set_xlabel("Days Relative to Earnings Announcement")
-    ax2.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
-    ax2.set_title("Average BHAR Around Earnings Announcements (Large Cap)")
-    ax2.legend()
-    ax2.grid(True, alpha=0.3)
+    ax.set_xlabel("Days Relative to Earnings Announcement")
+    ax.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
+    ax.set_title(title)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    fig2.savefig(
-        fig_dir / "event_study_bhar_large_cap.png", dpi=300, bbox_inches="tight"
-    )
-    plt.close(fig2)
-    print(f"Figure saved to {fig_dir / 'event_study_bhar_large_cap.png'}")
-
-    # Plot 3: BHAR by earnings surprise quintile with 95% CI (small cap)
-    def calc_stats(group):
-        n = len(group)
-        mean = group["bhar"].mean()
-        se = group["bhar"].std() / np.sqrt(n)
-        ci_95 = stats.t.ppf(0.975, n - 1) * se if n > 1 else 0
-        return pd.Series({"mean_bhar": mean, "ci_95": ci_95, "n": n})
-
-    bhar_by_quintile = (
-        event_df[event_df["mcap_qnt"] == 0]
-        .groupby(["sue_qnt", "event_t"])
-        .apply(calc_stats)
-        .reset_index()
-    )
+    fig.savefig(fig_path, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+
 
-    fig3, ax3 = plt.subplots(figsize=(12, 7))
+def render_bhar_quintiles(
+    bhar: pd.DataFrame, fig_path: Path, title: str, quintile: str
+) -> None:
+    fig, ax = plt.subplots(figsize=(12, 7))
     colors = plt.cm.RdYlGn(np.linspace(0.1, 0.9, 5))
-    quintile_labels = [
-        "Q1 (Negative Surprise)",
-        "Q2",
-        "Q3",
-        "Q4",
-        "Q5 (Positive Surprise)",
-    ]
 
     for q in range(5):
-        q_data = bhar_by_quintile[bhar_by_quintile["sue_qnt"] == q].sort_values(
-            "event_t"
-        )
-        ax3.plot(
+        q_data = bhar[bhar[quintile] == q].sort_values("event_t")
+        ax.plot(
             q_data["event_t"],
             q_data["mean_bhar"],
             color=colors[q],
             linewidth=1.5,
-            label=quintile_labels[q],
+            label=QUINTILE_LABELS[q],
         )
-        ax3.fill_between(
+        ax.fill_between(
             q_data["event_t"],
             q_data["mean_bhar"] - q_data["ci_95"],
             q_data["mean_bhar"] + q_data["ci_95"],
@@ -141,74 +123,78 @@ def plot_event_study_earnings(event_df: pd.DataFrame, fig_dir: Path) -> None:
             alpha=0.2,
         )
 
-    ax3.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
-    ax3.axvline(x=0, color="black", linestyle="--", linewidth=0.8)
-    ax3.set_xlabel("Days Relative to Earnings Announcement")
-    ax3.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
-    ax3.set_title("Average BHAR by Earnings Surprise Quintile (Small Cap)")
-    ax3.legend(loc="upper left")
-    ax3.grid(True, alpha=0.3)
+    ax.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
+    ax.axvline(x=0, color="black", linestyle="--", linewidth=0.8)
+    ax.set_xlabel("Days Relative to Earnings Announcement")
+    ax.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
+    ax.set_title(title)
+    ax.legend(loc="upper left")
+    ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    fig3.savefig(
-        fig_dir / "event_study_bhar_by_surprise_quintile.png",
-        dpi=300,
-        bbox_inches="tight",
-    )
-    plt.close(fig3)
-    print(f"Figure saved to {fig_dir / 'event_study_bhar_by_surprise_quintile.png'}")
-
-    # Plot 3: BHAR by earnings surprise quintile with 95% CI (large cap)
+    fig.savefig(fig_path, dpi=300, bbox_inches="tight")
+    plt.close(fig)
 
-    bhar_by_quintile = (
-        event_df[event_df["mcap_qnt"] > 0]
-        .groupby(["sue_qnt", "event_t"])
-        .apply(calc_stats)
-        .reset_index()
-    )
 
-    fig3, ax3 = plt.subplots(figsize=(12, 7))
-    colors = plt.cm.RdYlGn(np.linspace(0.1, 0.9, 5))
-    quintile_labels = [
-        "Q1 (Negative Surprise)",
-        "Q2",
-        "Q3",
-        "Q4",
-        "Q5 (Positive Surprise)",
-    ]
-
-    for q in range(5):
-        q_data = bhar_by_quintile[bhar_by_quintile["sue_qnt"] == q].sort_values(
-            "event_t"
+def event_study_earnings_jobs(
+    event_df: Optional[pd.DataFrame], fig_dir: Path, version: Optional[str] = None
+) -> list:
+    """
+    Figure jobs of the BHAR event study around earnings announcements: average BHAR
+    and BHAR by earnings surprise quintile with 95% CI, for small and large cap
+    stocks. The plot data are cached next to the figures for the event data
+    `version` (see `cached_plot_data`); the BHAR are only computed if a cache is
+    stale.
+    """
+    events = required(event_df, "Event data")
+    bhar = once(compute_bhar)
+
+    jobs = []
+    for size, cap in [("small", "Small Cap"), ("large", "Large Cap")]:
+        fig_path = fig_dir / f"event_study_bhar_{size}_cap.png"
+        jobs.append(
+            figure_job(
+                render_avg_bhar,
+                cached_plot_data(
+                    fig_path, version, avg_bhar, events, bhar, size=size
+                ),
+                fig_path,
+                title=f"Average BHAR Around Earnings Announcements ({cap})",
+            )
         )
-        ax3.plot(
-            q_data["event_t"],
-            q_data["mean_bhar"],
-            color=colors[q],
-            linewidth=1.5,
-            label=quintile_labels[q],
-        )
-        ax3.fill_between(
-            q_data["event_t"],
-            q_data["mean_bhar"] - q_data["ci_95"],
-            q_data["mean_bhar"] + q_data["ci_95"],
-            color=colors[q],
-            alpha=0.2,
+    for size, cap, name in [
+        ("small", "Small Cap", "event_study_bhar_by_surprise_quintile"),
+        ("large", "Large Cap", "event_study_bhar_by_surprise_quintile_large"),
+    ]:
+        fig_path = fig_dir / f"{name}.png"
+        jobs.append(
+            figure_job(
+                render_bhar_quintiles,
+                cached_plot_data(
+                    fig_path,
+                    version,
+                    bhar_by_quintile,
+                    events,
+                    bhar,
+                    size=size,
+                    quintile="sue_qnt",
+                ),
+                fig_path,
+                title=f"Average BHAR by Earnings Surprise Quintile ({cap})",
+                quintile="sue_qnt",
+            )
         )
+    return jobs
 
-    ax3.axhline(y=0, color="gray", linestyle="--", linewidth=0.8)
-    ax3.axvline(x=0, color="black", linestyle="--", linewidth=0.8)
-    ax3.set_xlabel("Days Relative to Earnings Announcement")
-    ax3.set_ylabel("Average Buy-and-Hold Abnormal Return (BHAR)")
-    ax3.set_title("Average BHAR by Earnings Surprise Quintile (Large Cap)")
-    ax3.legend(loc="upper left")
-    ax3.grid(True, alpha=0.3)
-    plt.tight_layout()
-    fig3.savefig(
-        fig_dir / "event_study_bhar_by_surprise_quintile_large.png",
-        dpi=300,
-        bbox_inches="tight",
-    )
-    plt.close(fig3)
-    print(
-        f"Figure saved to {fig_dir / 'event_study_bhar_by_surprise_quintile_large.png'}"
-    )
+
+def plot_event_study_earnings(event_df: pd.DataFrame, fig_dir: Path) -> None:
+    """
+    Create event study plots for earnings announcements showing BHAR.
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        Panel dataset with columns: permno, date, ret, mkt, ea, sue, mcap_qnt
+    fig_dir : Path
+        Directory to save the figures
+    """
+    render_figures(event_study_earnings_jobs(event_df, fig_dir))
@@ -1,31 +1,32 @@
 from pathlib import Path
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from .plot_data import cached_plot_data, required
+from .render import figure_job, render_figures
 
-def plot_n_earnings_per_year(panel: pd.DataFrame, fig_dir: Path) -> None:
+
+def n_earnings_per_year_data(panel: pd.DataFrame) -> pd.DataFrame:
     """
-    Plot the number of earnings announcements per year.
+    Number of earnings announcements per year.
 
     Parameters
     ----------
     panel : pd.DataFrame
         Panel dataset with daily frequency containing earnings announcement data
-    fig_dir : Path
-        Directory to save the figure
     """
     # Filter to rows that have earnings announcements
-    # Assuming earnings announcements are identified by non-null 'sue' column
-    ea_data = panel[panel["ea"].notna()].copy()
-
-    # Extract year from date
-    ea_data["year"] = ea_data["date"].dt.year
+    # Assuming earnings announcements are identified by non-null 'ea' column
+    ea_years = panel.loc[panel["ea"].notna(), "date"].dt.year.rename("year")
 
     # Count number of earnings announcements per year
-    n_earnings = ea_data.groupby("year").size().reset_index()
-    n_earnings.columns = ["year", "n_earnings"]
+    n_earnings = ea_years.groupby(ea_years).size().rename("n_earnings").reset_index()
+    return n_earnings
+
 
+def render_n_earnings_per_year(n_earnings: pd.DataFrame, fig_path: Path) -> None:
     # Create the plot
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.plot(n_earnings["year"], n_earnings["n_earnings"], linewidth=2, marker="o")
@@ -35,9 +36,35 @@ def plot_n_earnings_per_year(panel: pd.DataFrame, fig_dir: Path) -> None:
     ax.grid(True, alpha=0.3)
 
     # Save the figure
-    fig_path = fig_dir / "n_earnings_per_year.pdf"
     plt.tight_layout()
     plt.savefig(fig_path, bbox_inches="tight")
     plt.close()
 
-    print(f"Figure saved to {fig_path}")
+
+def n_earnings_per_year_jobs(
+    panel: Optional[pd.DataFrame], fig_dir: Path, version: Optional[str] = None
+) -> list:
+    """
+    Figure job of the number of earnings announcements per year. The plot data are
+    cached next to the figure for the panel `version` (see `cached_plot_data`), in
+    which case the panel is not needed.
+    """
+    fig_path = fig_dir / "n_earnings_per_year.pdf"
+    data = cached_plot_data(
+        fig_path, version, n_earnings_per_year_data, required(panel, "Panel data")
+    )
+    return [figure_job(render_n_earnings_per_year, data, fig_path)]
+
+
+def plot_n_earnings_per_year(panel: pd.DataFrame, fig_dir: Path) -> None:
+    """
+    Plot the number of earnings announcements per year.
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        Panel dataset with daily frequency containing earnings announcement data
+    fig_dir : Path
+        Directory to save the figure
+    """
+    render_figures(n_earnings_per_year_jobs(panel, fig_dir), workers=1)
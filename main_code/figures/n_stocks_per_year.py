@@ -1,28 +1,35 @@
 from pathlib import Path
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from .plot_data import cached_plot_data, required
+from .render import figure_job, render_figures
 
-def plot_n_stocks_per_year(panel: pd.DataFrame, fig_dir: Path) -> None:
+
+def n_stocks_per_year_data(panel: pd.DataFrame) -> pd.DataFrame:
     """
-    Plot the number of unique firms (PERMNOs) per year.
+    Number of unique firms (PERMNOs) per year.
 
     Parameters
     ----------
     panel : pd.DataFrame
         Panel dataset with daily frequency containing 'PERMNO' and 'date' columns
-    fig_dir : Path
-        Directory to save the figure
     """
-    # Extract year from date
-    panel_yearly = panel.copy()
-    panel_yearly["year"] = panel_yearly["date"].dt.year
-
-    # Count unique PERMNOs per year
-    n_stocks = panel_yearly.groupby("year")["permno"].nunique().reset_index()
+    # Count unique PERMNOs per year (grouping by the year of the date column,
+    # without adding a column to a copy of the panel)
+    n_stocks = (
+        panel["permno"]
+        .groupby(panel["date"].dt.year.rename("year"))
+        .nunique()
+        .reset_index()
+    )
     n_stocks.columns = ["year", "n_stocks"]
+    return n_stocks
+
 
+def render_n_stocks_per_year(n_stocks: pd.DataFrame, fig_path: Path) -> None:
     # Create the plot
     fig, ax = plt.subplots(figsize=(10, 6))
     ax.plot(n_stocks["year"], n_stocks["n_stocks"], linewidth=2, marker="o")
@@ -32,9 +39,35 @@ def plot_n_stocks_per_year(panel: pd.DataFrame, fig_dir: Path) -> None:
     ax.grid(True, alpha=0.3)
 
     # Save the figure
-    fig_path = fig_dir / "n_stocks_per_year.pdf"
     plt.tight_layout()
     plt.savefig(fig_path, bbox_inches="tight")
     plt.close()
 
-    print(f"Figure saved to {fig_path}")
+
+def n_stocks_per_year_jobs(
+    panel: Optional[pd.DataFrame], fig_dir: Path, version: Optional[str] = None
+) -> list:
+    """
+    Figure job of the number of firms per year. The plot data are cached next to
+    the figure for the panel `version` (see `cached_plot_data`), in which case the
+    panel is not needed.
+    """
+    fig_path = fig_dir / "n_stocks_per_year.pdf"
+    data = cached_plot_data(
+        fig_path, version, n_stocks_per_year_data, required(panel, "Panel data")
+    )
+    return [figure_job(render_n_stocks_per_year, data, fig_path)]
+
+
+def plot_n_stocks_per_year(panel: pd.DataFrame, fig_dir: Path) -> None:
+    """
+    Plot the number of unique firms (PERMNOs) per year.
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        Panel dataset with daily frequency containing 'PERMNO' and 'date' columns
+    fig_dir : Path
+        Directory to save the figure
+    """
+    render_figures(n_stocks_per_year_jobs(panel, fig_dir), workers=1)
@@ -0,0 +1,107 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+METADATA_KEY = b"plot_data_key"
+
+
+def plot_data_path(fig_path: Path) -> Path:
+    """
+    Plot data are stored next to the figure, e.g. n_stocks_per_year.parquet.
+    """
+    return fig_path.with_suffix(".parquet")
+
+
+def cached_plot_data(
+    fig_path: Path,
+    version: Optional[str],
+    aggregate: Callable,
+    source: Callable,
+    transform: Optional[Callable] = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Returns the aggregated data of a figure, from the Parquet file next to the
+    figure when it was computed from the same version of the input data by the
+    same transformation and aggregation, otherwise by running
+    `aggregate(transform(source()), **kwargs)` and storing the result.
+
+    The input data (e.g. the panel) are only requested from `source` when the
+    cache is stale, so figures can be restyled and re-rendered without loading
+    them.
+
+    Args:
+        fig_path (Path): path of the figure.
+        version (str, optional): version of the input data, e.g. the name of the
+            timestamped panel file. None disables the cache.
+        aggregate (Callable): aggregation, returns a small tidy DataFrame.
+        source (Callable): returns the input data, e.g. the panel.
+        transform (Callable, optional): transformation of the input data before
+            the aggregation, e.g. `compute_bhar`. Its source code is part of the
+            cache key, like the one of `aggregate`.
+        kwargs: arguments of the aggregation.
+
+    Returns:
+        pd.DataFrame: the plot data
+    """
+    path = plot_data_path(fig_path)
+    code = [inspect.getsource(f) for f in [aggregate, transform] if f is not None]
+    key = hashlib.sha1(
+        json.dumps([version, code, kwargs], sort_keys=True).encode()
+    ).hexdigest()
+
+    if version is not None and path.exists():
+        metadata = pq.read_schema(path).metadata or {}
+        if metadata.get(METADATA_KEY) == key.encode():
+            logging.info(f"Loading plot data from {path}")
+            return pd.read_parquet(path)
+
+    data = source()
+    if transform is not None:
+        data = transform(data)
+    data = aggregate(data, **kwargs)
+    if version is not None:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), METADATA_KEY: key.encode()}
+        )
+        pq.write_table(table, path)
+    return data
+
+
+def required(data: Optional[pd.DataFrame], name: str) -> Callable:
+    """
+    Source of `cached_plot_data` that raises if the data were not loaded.
+    """
+
+    def source() -> pd.DataFrame:
+        if data is None:
+            raise ValueError(f"{name} required to compute the plot data")
+        return data
+
+    return source
+
+
+def once(transform: Callable) -> Callable:
+    """
+    Transformation of `cached_plot_data` that is only computed once when several
+    figures transform the same input data. The source code of `transform` is
+    still used in the cache key.
+    """
+
+    @functools.wraps(transform)
+    def wrapper(data: pd.DataFrame) -> pd.DataFrame:
+        if wrapper.cache is None or wrapper.cache[0] is not data:
+            wrapper.cache = (data, transform(data))
+        return wrapper.cache[1]
+
+    wrapper.cache = None
+    return wrapper
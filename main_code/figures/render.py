@@ -0,0 +1,112 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from ..utils import configure_pyplot
+
+MANIFEST = ".figure_hashes.json"
+
+
+def figure_job(render: Callable, data: pd.DataFrame, path: Path, **kwargs) -> dict:
+    """
+    A figure to render: `render(data, path, **kwargs)` draws the plot data and saves
+    the figure. `render` must be a module-level function so that it can be sent to
+    a worker process.
+    """
+    return {"render": render, "data": data, "path": Path(path), "kwargs": kwargs}
+
+
+def job_hash(job: dict, style: Optional[dict] = None) -> str:
+    """
+    Hash of everything that determines a figure: the plot data, the source code of
+    the render function, its arguments and the pyplot style.
+    """
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(job["data"], index=True).to_numpy().tobytes())
+    h.update(json.dumps(list(map(str, job["data"].columns))).encode())
+    h.update(inspect.getsource(job["render"]).encode())
+    h.update(json.dumps([job["kwargs"], style], sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _init_worker(style: Optional[dict]) -> None:
+    # headless backend; the workers do not inherit the rcParams set in main
+    plt.switch_backend("Agg")
+    if style is not None:
+        configure_pyplot(**style)
+
+
+def _render(job: dict) -> Path:
+    job["render"](job["data"], job["path"], **job["kwargs"])
+    return job["path"]
+
+
+def render_figures(
+    jobs: list,
+    style: Optional[dict] = None,
+    workers: int = -1,
+    force: bool = False,
+) -> list:
+    """
+    Renders independent figures in a process pool with the Agg backend.
+
+    The plot data of each job are computed beforehand (they are small tables), so
+    only the drawing and saving run in the workers, each configured with
+    `configure_pyplot(**style)`. A figure is skipped when its file exists and the
+    hash of its data, render function, arguments and style matches the one recorded
+    in the figure directory at its last render.
+
+    Args:
+        jobs (list): figures from `figure_job`.
+        style (dict, optional): arguments of `configure_pyplot`. Defaults to None (rcParams of the workers left as is).
+        workers (int, optional): number of processes, -1 uses all cores. Defaults to -1.
+        force (bool, optional): render all the figures. Defaults to False.
+
+    Returns:
+        list: paths of the rendered figures
+    """
+    manifests = {}
+    todo = []
+    for job in jobs:
+        fig_dir = job["path"].parent
+        if fig_dir not in manifests:
+            path = fig_dir / MANIFEST
+            manifests[fig_dir] = json.loads(path.read_text()) if path.exists() else {}
+        job["hash"] = job_hash(job, style)
+        if (
+            not force
+            and job["path"].exists()
+            and manifests[fig_dir].get(job["path"].name) == job["hash"]
+        ):
+            logging.info(f"Figure up to date: {job['path']}")
+        else:
+            todo.append(job)
+
+    workers = os.cpu_count() if workers == -1 else workers
+    if workers == 1 or len(todo) <= 1:
+        if style is not None:
+            configure_pyplot(**style)
+        rendered = list(map(_render, todo))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(todo)),
+            initializer=_init_worker,
+            initargs=(style,),
+        ) as pool:
+            rendered = list(pool.map(_render, todo))
+
+    for job in todo:
+        manifests[job["path"].parent][job["path"].name] = job["hash"]
+        print(f"Figure saved to {job['path']}")
+    for fig_dir, manifest in manifests.items():
+        (fig_dir / MANIFEST).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+    return rendered
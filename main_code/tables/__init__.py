@@ -1,10 +1,13 @@
 from .ea_regression import create_ea_regression_table
-from .format import regression_table, reorder_reg_output
+from .format import regression_table, regression_tables, reorder_reg_output
 from .oos_exmkt_vrp import oos_regression_example
+from .oos_forecast import oos_predictors_table
 
 __all__ = [
     "regression_table",
+    "regression_tables",
     "reorder_reg_output",
     "create_ea_regression_table",
     "oos_regression_example",
+    "oos_predictors_table",
 ]
@@ -1,39 +1,44 @@
 from pathlib import Path
+from typing import Optional
 
 import pandas as pd
 
-from ..utils import panel_ols
+from ..utils import run_specs, spec_grid
 from .format import regression_table, reorder_reg_output
 
 
-def create_ea_regression_table(panel: pd.DataFrame, tab_dir: Path) -> None:
+def create_ea_regression_table(
+    panel: pd.DataFrame, tab_dir: Path, cache_dir: Optional[Path] = None
+) -> None:
     """
     Create regression table: regress excess returns (ret - rf) on EA dummy.
 
     Parameters
     ----------
     panel : pd.DataFrame
-        Panel dataset with 'ret', 'rf', 'ea', 'permno', and 'date' columns
+        Panel dataset with 'ret', 'rf', 'ea', 'mkt', 'permno', and 'date' columns
     tab_dir : Path
         Directory to save the table
+    cache_dir : Path, optional
+        Directory of the cached regression results (see `run_specs`)
     """
-    # Prepare the data for panel regression
-    # Set multi-index for panel data (entity, time)
-    panel_reg = panel[["permno", "date", "ret", "mkt", "rf", "ea"]].copy()
-    panel_reg["ret_rf"] = (panel_reg["ret"] - panel_reg["rf"]) 
-    panel_reg["mkt_rf"] = (
-        panel_reg["mkt"] - panel_reg["rf"] 
-    )  # market excess return
-    panel_reg = panel_reg.set_index(["permno", "date"])
+    # Variables of the regressions (entity: permno, time: date)
+    data = {
+        "ea": panel["ea"],
+        "ret_rf": panel["ret"] - panel["rf"],
+        "mkt_rf": panel["mkt"] - panel["rf"],  # market excess return
+        "permno": panel["permno"],
+        "date": panel["date"],
+    }
 
     # Run the regression: ret - rf ~ ea
-    models = [
-        "ret_rf ~ ea",
-        "ret_rf ~ ea + mkt_rf",
-        "ret_rf ~ ea + mkt_rf + EntityEffects",
-    ]
+    specs = spec_grid(["ret_rf"], [["ea"], ["ea", "mkt_rf"]]) + spec_grid(
+        ["ret_rf"], [["ea", "mkt_rf"]], effects=[("EntityEffects",)]
+    )
 
-    reg_results = [panel_ols(panel_reg, model) for model in models]
+    reg_results = run_specs(
+        data, specs, entity="permno", time="date", cache_dir=cache_dir
+    )
     reg_df = pd.concat(reg_results, axis=1)
 
     # Reorder the output to have the correct format
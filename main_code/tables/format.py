@@ -1,3 +1,4 @@
+import html
 from typing import Iterable, Optional, Union
 
 import numpy as np
@@ -53,65 +54,169 @@ def format_tstat_decimal(pct: Union[int, float]) -> str:
     return f"[{pct:.2f}]"
 
 
-def regression_table_header(
-    reg: pd.DataFrame,
-    n_cols: int,
-    include_tabular: bool = True,
-    include_column_names: bool = True,
+def stars_array(pval: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `stars`: significance stars for an array of p-values.
+    """
+    pval = np.asarray(pval, dtype=float)
+    return np.select([pval < 0.01, pval < 0.05, pval < 0.1], ["***", "**", "*"], "")
+
+
+def format_coef_array(
+    coef: np.ndarray, pval: np.ndarray, decimal: int = 3
+) -> np.ndarray:
+    """
+    Vectorized `format_coef`: formats a matrix of coefficients with their stars.
+    """
+    coef = np.asarray(coef, dtype=float)
+    cells = np.char.add(np.char.mod(f"%0.{decimal}f", coef), stars_array(pval))
+    return np.where(np.isnan(coef), "", cells)
+
+
+def format_bse_array(bse: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `format_bse`: formats a matrix of standard errors in parentheses.
+    """
+    bse = np.asarray(bse, dtype=float)
+    cells = np.char.add(np.char.add("(", np.char.mod("%0.3f", bse)), ")")
+    return np.where(np.isnan(bse), "", cells)
+
+
+def _column_groups(columns, skip_cols: Iterable[int] = ()) -> list:
+    # Count number of columns with same name. Assumes duplicates are adjacent.
+    col_names_cnt = []
+    for i, col in enumerate(columns):
+        if i in skip_cols:
+            col_names_cnt.append(["", 1])
+        elif col_names_cnt and (col == col_names_cnt[-1][0]):
+            col_names_cnt[-1][1] += 1
+        else:
+            col_names_cnt.append([col, 1])
+    return col_names_cnt
+
+
+def regression_cells(
+    regs: list,
+    rows: Iterable[str],
+    include_nobs: bool = True,
+    include_rsquared: bool = True,
+    include_fixed_effects: bool = False,
     header_title: Optional[str] = "Dependent variable",
     header_subtitle: Optional[str] = None,
-    skip_cols: Iterable[str] = (),
+    skip_cols: Iterable[int] = (),
+    fe_name: str = "Firm FE",
+) -> list:
+    """
+    Formats regression outputs into the intermediate representation shared by the
+    LaTeX, HTML and Markdown renderers.
+
+    The coefficients, standard errors and p-values of all the tables are stacked
+    into matrices and formatted at once with vectorized string operations, then
+    split back into one table per output.
+
+    Args:
+        regs (list): regression outputs, one DataFrame per table with one column per
+            model (see `panel_ols`).
+        rows (list): variables to report, e.g. [r"$1_{EA}$", "$Ret^M$"].
+        include_nobs (bool, optional): add the number of observations. Defaults to True.
+        include_rsquared (bool, optional): add the R-squared (%). Defaults to True.
+        include_fixed_effects (bool, optional): add the fixed effects row. Defaults to False.
+        header_title (str, optional): title spanning the columns. Defaults to "Dependent variable".
+        header_subtitle (str, optional): line added below the title. Defaults to None.
+        skip_cols (list, optional): positions of columns left empty. Defaults to ().
+        fe_name (str, optional): label of the fixed effects row. Defaults to "Firm FE".
+
+    Returns:
+        list: one dict per table with the title, subtitle, column groups, column
+            numbers, body (row labels and cells) and footer (row keys and cells).
+    """
+    rows = list(rows)
+    stats = [f"{row}_{stat}" for row in rows for stat in ["coef", "bse", "pval"]]
+    values = pd.concat([reg.reindex(stats) for reg in regs], axis=1)
+    values = values.to_numpy(dtype=float).reshape(len(rows), 3, -1)
+
+    # coefficient and standard error lines alternate in the body
+    body = np.empty((2 * len(rows), values.shape[2]), dtype=object)
+    body[0::2] = format_coef_array(values[:, 0], values[:, 2])
+    body[1::2] = format_bse_array(values[:, 1])
+
+    tables = []
+    start = 0
+    for reg in regs:
+        n_cols = reg.shape[1]
+        cells = body[:, start : start + n_cols].copy()
+        start += n_cols
+
+        footer = {}
+        if include_nobs:
+            footer["nobs"] = [format_nobs(n) for n in reg.loc["nobs"]]
+        if include_rsquared:
+            footer["rsquared"] = [format_rsquared(r * 100) for r in reg.loc["rsquared"]]
+        if include_fixed_effects:
+            footer["fe"] = list(reg.loc["fe"])
+        footer = {k: np.array(v, dtype=object) for k, v in footer.items()}
+
+        for i in skip_cols:
+            cells[:, i] = ""
+            for v in footer.values():
+                v[i] = ""
+
+        tables.append(
+            {
+                "title": header_title,
+                "subtitle": header_subtitle,
+                "n_cols": n_cols,
+                "columns": _column_groups(reg.columns, skip_cols),
+                "numbers": [
+                    f"({i + 1})" if i not in skip_cols else "" for i in range(n_cols)
+                ],
+                "labels": [label for row in rows for label in [row, ""]],
+                "body": cells,
+                "footer": footer,
+                "fe_name": fe_name,
+            }
+        )
+    return tables
+
+
+def render_latex(
+    table: dict, include_tabular: bool = True, include_column_names: bool = True
 ) -> str:
+    """
+    Renders a table from `regression_cells` as a LaTeX tabular.
+    """
+    n_cols = table["n_cols"]
     header = "\\begin{tabular}{r" + ("c" * n_cols) + "}\n" if include_tabular else ""
-    if header_title is not None:
+    if table["title"] is not None:
         header += (
             "\\hline\\hline\n{} & \\multicolumn{"
             + str(n_cols)
             + "}{c}{"
-            + header_title
+            + table["title"]
             + "} \\\\\n"
         )
     else:
         header += "\\hline\\hline\n"
-    # Count number of columns with same name. Assumes duplicates are adjacent.
-    if header_subtitle is not None:
-        header += header_subtitle + "\n"
-    col_names_cnt = []
-    for i, col in enumerate(reg.columns):
-        if i in skip_cols:
-            col_names_cnt.append(["", 1])
-        elif col_names_cnt and (col == col_names_cnt[-1][0]):
-            col_names_cnt[-1][1] += 1
-        else:
-            col_names_cnt.append([col, 1])
+    if table["subtitle"] is not None:
+        header += table["subtitle"] + "\n"
     format_multicolumn = lambda col, cnt: (
-        col if cnt == 1 else "\multicolumn{" + str(cnt) + "}{c}{" + col + "}"
+        col if cnt == 1 else "\\multicolumn{" + str(cnt) + "}{c}{" + col + "}"
     )
     if include_column_names:
         header += (
             " & ".join(
-                ["{}"] + [format_multicolumn(col, cnt) for col, cnt in col_names_cnt]
-            )
-            + "\\\\\n"
-        )
-    header += (
-        " & ".join(
-            (
                 ["{}"]
-                + [
-                    (f"({i + 1})" if i not in skip_cols else "")
-                    for i, _ in enumerate(reg.columns)
-                ]
+                + [format_multicolumn(col, cnt) for col, cnt in table["columns"]]
             )
+            + "\\\\\n"
         )
-        + "\\\\\n"
-    )
+    header += " & ".join(["{}"] + table["numbers"]) + "\\\\\n"
     midrule_cnt = 1
-    for col, cnt in col_names_cnt:
+    for col, cnt in table["columns"]:
         if col != "":
             header += "  " * cnt
             header += (
-                "\cmidrule(lr){"
+                "\\cmidrule(lr){"
                 + str(midrule_cnt + 1)
                 + "-"
                 + str(midrule_cnt + cnt)
@@ -119,105 +224,145 @@ def regression_table_header(
             )
         midrule_cnt += cnt
     header += "\n"
-    return header
 
+    lines = [
+        " & ".join([label] + list(cells))
+        for label, cells in zip(table["labels"], table["body"])
+    ]
+    body = "".join(line + "\\\\\n" for line in lines)
 
-def regression_table_body(
-    reg: pd.DataFrame,
-    rows: Iterable[str],
-    skip_cols: Iterable[str] = (),
-) -> str:
-    body = ""
-    for row in rows:
-        body += row + " & "
-        body += (
-            " & ".join(
-                [
-                    (
-                        format_coef(
-                            reg.iloc[:, i][f"{row}_coef"],
-                            reg.iloc[:, i][f"{row}_pval"],
-                        )
-                        if i not in skip_cols
-                        else ""
-                    )
-                    for i, _ in enumerate(reg.columns)
-                ]
-            )
-            + "\\\\\n & "
-        )
-        body += (
-            " & ".join(
-                [
-                    (
-                        format_bse(reg.iloc[:, i][f"{row}_bse"])
-                        if i not in skip_cols
-                        else ""
-                    )
-                    for i, _ in enumerate(reg.columns)
-                ]
-            )
-            + "\\\\\n"
+    labels = {"nobs": "$N$", "rsquared": "$R^2(\\%)$", "fe": table["fe_name"]}
+    footer = "\\midrule \\ \n"
+    for key, cells in table["footer"].items():
+        footer += " & ".join([labels[key]] + list(cells)) + "\\\\\n"
+    footer += "\\hline\\hline\n"
+    footer += "\\end{tabular}\n" if include_tabular else ""
+
+    return header + body + footer
+
+
+def render_html(table: dict, include_column_names: bool = True) -> str:
+    """
+    Renders a table from `regression_cells` as an HTML table.
+    """
+    cell = lambda tag, text, span=1: (
+        f"<{tag}"
+        + (f' colspan="{span}"' if span > 1 else "")
+        + f">{html.escape(str(text))}</{tag}>"
+    )
+    row = lambda cells: "<tr>" + "".join(cells) + "</tr>\n"
+
+    head = ""
+    if table["title"] is not None:
+        head += row([cell("th", ""), cell("th", table["title"], table["n_cols"])])
+    if table["subtitle"] is not None:
+        head += row([cell("th", table["subtitle"], table["n_cols"] + 1)])
+    if include_column_names:
+        head += row(
+            [cell("th", "")]
+            + [cell("th", col, cnt) for col, cnt in table["columns"]]
         )
-    return body
+    head += row([cell("th", "")] + [cell("th", n) for n in table["numbers"]])
 
+    body = "".join(
+        row([cell("td", label)] + [cell("td", c) for c in cells])
+        for label, cells in zip(table["labels"], table["body"])
+    )
+    labels = {"nobs": "N", "rsquared": "R2 (%)", "fe": table["fe_name"]}
+    foot = "".join(
+        row([cell("td", labels[key])] + [cell("td", c) for c in cells])
+        for key, cells in table["footer"].items()
+    )
 
-def regression_table_footer(
-    reg: pd.DataFrame,
+    return (
+        "<table>\n<thead>\n"
+        + head
+        + "</thead>\n<tbody>\n"
+        + body
+        + "</tbody>\n<tfoot>\n"
+        + foot
+        + "</tfoot>\n</table>\n"
+    )
+
+
+def render_markdown(table: dict, include_column_names: bool = True) -> str:
+    """
+    Renders a table from `regression_cells` as a Markdown (pipe) table. Column
+    groups are repeated on each of their columns.
+    """
+    row = lambda cells: "| " + " | ".join(cells) + " |\n"
+
+    names = [col for col, cnt in table["columns"] for _ in range(cnt)]
+    header = [
+        f"{name} {n}".strip() if include_column_names else n
+        for name, n in zip(names, table["numbers"])
+    ]
+
+    text = f"**{table['title']}**\n\n" if table["title"] is not None else ""
+    if table["subtitle"] is not None:
+        text += table["subtitle"] + "\n\n"
+    text += row([""] + header) + row(["---"] + [":---:"] * table["n_cols"])
+    text += "".join(
+        row([label] + list(cells))
+        for label, cells in zip(table["labels"], table["body"])
+    )
+    labels = {"nobs": "N", "rsquared": "R2 (%)", "fe": table["fe_name"]}
+    text += "".join(
+        row([labels[key]] + list(cells)) for key, cells in table["footer"].items()
+    )
+    return text
+
+
+RENDERERS = {"latex": render_latex, "html": render_html, "markdown": render_markdown}
+
+
+def regression_tables(
+    regs,
+    rows: Iterable[str],
+    target: str = "latex",
     include_nobs: bool = True,
     include_rsquared: bool = True,
     include_fixed_effects: bool = False,
-    include_time_effects_only: bool = False,
     include_tabular: bool = True,
-    skip_cols: Iterable[str] = (),
-) -> str:
-    table = "\\midrule \\ \n"
-    if include_nobs:
-        table += (
-            "$N$ & "
-            + " & ".join(
-                [
-                    (format_nobs(reg.iloc[:, i]["nobs"]) if i not in skip_cols else "")
-                    for i, _ in enumerate(reg.columns)
-                ]
-            )
-            + "\\\\\n"
-        )
-    if include_rsquared:
-        table += (
-            "$R^2(\%)$ & "
-            + " & ".join(
-                [
-                    (
-                        format_rsquared(reg.iloc[:, i]["rsquared"] * 100)
-                        if i not in skip_cols
-                        else ""
-                    )
-                    for i, _ in enumerate(reg.columns)
-                ]
-            )
-            + "\\\\\n"
-        )
-    if include_fixed_effects:
-        if include_time_effects_only:
-            fe_name = "Date FE"
-        if include_fixed_effects and not include_time_effects_only:
-            fe_name = "Firm FE"
-        else:
-            fe_name = "Firm \& Yr-mth FE"
-        table += (
-            f"{fe_name} & "
-            + " & ".join(
-                [
-                    (reg.iloc[:, i]["fe"] if i not in skip_cols else "")
-                    for i, _ in enumerate(reg.columns)
-                ]
-            )
-            + "\\\\\n"
-        )
-    table += "\\hline\\hline\n"
-    table += "\\end{tabular}\n" if include_tabular else ""
-    return table
+    include_column_names: bool = True,
+    header_title: Optional[str] = "Dependent variable",
+    header_subtitle: Optional[str] = None,
+    skip_cols: Iterable[int] = (),
+    fe_name: str = "Firm FE",
+):
+    """
+    Renders a batch of regression tables with the same rows in one call.
+
+    Args:
+        regs (list or dict): regression outputs, one DataFrame per table.
+        rows (list): variables to report.
+        target (str, optional): "latex", "html" or "markdown". Defaults to "latex".
+        include_tabular (bool, optional): wrap LaTeX tables in a tabular environment. Defaults to True.
+        include_column_names (bool, optional): add the model names. Defaults to True.
+        The other arguments are passed to `regression_cells`.
+
+    Returns:
+        list or dict: the rendered tables, keyed like `regs`.
+    """
+    keys = list(regs) if isinstance(regs, dict) else None
+    tables = regression_cells(
+        [regs[k] for k in keys] if keys is not None else list(regs),
+        rows,
+        include_nobs=include_nobs,
+        include_rsquared=include_rsquared,
+        include_fixed_effects=include_fixed_effects,
+        header_title=header_title,
+        header_subtitle=header_subtitle,
+        skip_cols=skip_cols,
+        fe_name=fe_name,
+    )
+
+    kwargs = {"include_column_names": include_column_names}
+    if target == "latex":
+        kwargs["include_tabular"] = include_tabular
+    rendered = [RENDERERS[target](table, **kwargs) for table in tables]
+
+    return dict(zip(keys, rendered)) if keys is not None else rendered
 
 
 def regression_table(
@@ -232,24 +377,15 @@ def regression_table(
     header_subtitle: Optional[str] = None,
     skip_cols: Iterable[str] = (),
 ) -> str:
-    n_cols = reg.shape[1]
-    print(include_tabular)
-    return (
-        regression_table_header(
-            reg,
-            n_cols,
-            include_tabular,
-            include_column_names,
-            header_title,
-            header_subtitle,
-            skip_cols,
-        )
-        + regression_table_body(reg, rows, skip_cols)
-        + regression_table_footer(
-            reg,
-            include_nobs,
-            include_rsquared,
-            include_fixed_effects,
-            skip_cols,
-        )
-    )
+    return regression_tables(
+        [reg],
+        rows,
+        include_nobs=include_nobs,
+        include_rsquared=include_rsquared,
+        include_fixed_effects=include_fixed_effects,
+        include_tabular=include_tabular,
+        include_column_names=include_column_names,
+        header_title=header_title,
+        header_subtitle=header_subtitle,
+        skip_cols=skip_cols,
+    )[0]
@@ -1,29 +1,41 @@
+import warnings
 from pathlib import Path
+from typing import Optional
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import statsmodels.formula.api as smf
 from .format import regression_table
 
-from ..utils import ols_reg
+from ..utils import bootstrap_predictive, expanding_ols, run_specs, spec_grid
 from ..utils.files import get_latest_file
 
 
-def insample_regression(df: pd.DataFrame, indep_var: str, tab_dir: Path, savename: str):
-
-    df_sub = df[df[indep_var].notnull()]
+def insample_regression(
+    df: pd.DataFrame,
+    indep_var: str,
+    tab_dir: Path,
+    savename: str,
+    pre_2020: bool = False,
+    cache_dir: Optional[Path] = None,
+):
+    horizons = [1, 3, 6, 12]
     # put market return in %
-    for var in ["exmkt_h1", "exmkt_h3", "exmkt_h6", "exmkt_h12"]:
-        df_sub[var] = df_sub[var] * 100
+    data = {f"exmkt_h{h}": df[f"exmkt_h{h}"] * 100 for h in horizons}
+    data[indep_var] = df[indep_var]
+    data["pre2020"] = df["date"] <= "2019-12-31"
 
     reg_output = pd.concat(
-        [
-            ols_reg(df_sub[df_sub["exmkt_h1"].notnull()], f"exmkt_h1~1+{indep_var}"),
-            ols_reg(df_sub[df_sub["exmkt_h3"].notnull()], f"exmkt_h3~1+{indep_var}"),
-            ols_reg(df_sub[df_sub["exmkt_h6"].notnull()], f"exmkt_h6~1+{indep_var}"),
-            ols_reg(df_sub[df_sub["exmkt_h12"].notnull()], f"exmkt_h12~1+{indep_var}"),
-        ],
+        run_specs(
+            data,
+            spec_grid(
+                [f"exmkt_h{h}" for h in horizons],
+                [[indep_var]],
+                samples=["pre2020" if pre_2020 else None],
+                estimator="ols",
+            ),
+            cache_dir=cache_dir,
+        ),
         axis=1,
     )
 
@@ -44,19 +56,35 @@ def insample_regression(df: pd.DataFrame, indep_var: str, tab_dir: Path, savenam
 
 
 def outofsample_regression(
-    df_dict: dict, indep_var: str, tab_dir: Path, savename: str, pre_2020: bool = False
+    df_dict: dict,
+    indep_var: str,
+    tab_dir: Path,
+    savename: str,
+    pre_2020: bool = False,
+    cache_dir: Optional[Path] = None,
 ):
-    reg_output = []
-    for h in df_dict:
-        df = df_dict[h].copy()
-        if pre_2020:
-            df = df[:"2019-12-31"]
-
-        reg_output.append(
-            ols_reg(df[df[f"exmkt_h{h}"].notnull()], f"exmkt_h{h}~1+{indep_var}_h{h}")
-        )
+    # forecasts of all horizons side by side
+    data = pd.concat(
+        [df_dict[h][[f"exmkt_h{h}", f"{indep_var}_h{h}"]] for h in df_dict], axis=1
+    )
+    data["pre2020"] = data.index <= "2019-12-31"
 
-    reg_output = pd.concat(reg_output, axis=1)
+    reg_output = pd.concat(
+        run_specs(
+            data,
+            [
+                {
+                    "dep": f"exmkt_h{h}",
+                    "regressors": [f"{indep_var}_h{h}"],
+                    "sample": "pre2020" if pre_2020 else None,
+                    "estimator": "ols",
+                }
+                for h in df_dict
+            ],
+            cache_dir=cache_dir,
+        ),
+        axis=1,
+    )
 
     reg_output.columns = ["h=1", "h=3", "h=6", "h=12"]
 
@@ -94,23 +122,17 @@ def get_individual_predictor_oos_forecast(
         time-series of the out-of-sample forecast
     """
     pred = df[["date", dep_var, indep_var]].dropna()
-    output = []
+    # expanding-window regression up to each date
+    coef = expanding_ols(pred[dep_var].to_numpy(), pred[indep_var].to_numpy())
+    output = pd.DataFrame(
+        {
+            "date": pred["date"].to_numpy(),
+            "pred_loading": coef[:, 1],
+            "intercept": coef[:, 0],
+        }
+    )
     # select the starting oos sample
-    dates = pred[pred["date"] >= start_date_oos]["date"]
-    for dt in dates:
-        pred_ = pred[pred["date"] <= dt]
-        reg = smf.ols(dep_var + "~" + indep_var, data=pred_).fit()
-        res_out = pd.DataFrame(
-            data={
-                "date": dt,
-                "pred_loading": reg.params[indep_var],
-                "intercept": reg.params["Intercept"],
-            },
-            index=[0],
-        )
-        output.append(res_out)
-    output = pd.concat(output)
-    output.index = range(len(output))
+    output = output[output["date"] >= start_date_oos].reset_index(drop=True)
     output = output.merge(df[["exmkt", dep_var, indep_var, "date"]], on="date")
     # lag the intercept and pred coefficient to construct the oos-forecast
     output["intercept"] = output["intercept"].shift()
@@ -137,7 +159,71 @@ def oos_r2_with_stars(oos_r2_, tval: float) -> str:
         return "{:.3f}".format(oos_r2_) + "$^{***}$"
 
 
-def compute_exmkt_oos_r2(vrp_for, df, restriction=False):
+def evaluate_oos(
+    forecasts: pd.DataFrame, horizon: int, restriction: bool = False
+) -> tuple:
+    """
+    Out-of-sample R-squared, Clark-West statistic and cumulative SSE difference
+    relative to the historical average for every model of one horizon.
+
+    Each model is evaluated on the months where its forecast, the realized return
+    and the benchmark are available, so a model with missing forecasts does not
+    shorten the sample of the others.
+
+    Args:
+        forecasts (pd.DataFrame): realized returns, benchmark and model forecasts for
+            one horizon, e.g. one horizon of `oos_forecasts`.
+        horizon (int): the forecast horizon.
+        restriction (bool, optional): set negative forecasts to zero. Defaults to False.
+
+    Returns:
+        tuple: a DataFrame indexed by model with oos_r2, cw_tstat and nobs columns,
+            and a DataFrame of cumulative SSE differences (historical - model)
+            indexed by date with one column per model, flat over the months
+            without a forecast of the model.
+    """
+    actual = f"exmkt_h{horizon}"
+    benchmark = f"hist_exmkt_h{horizon}"
+    forecasts = forecasts.dropna(subset=[actual, benchmark])
+
+    models = forecasts.drop(columns=[actual, benchmark])
+    if restriction:
+        models = models.clip(lower=0)
+
+    r = forecasts[[actual]].to_numpy()
+    hist = forecasts[[benchmark]].to_numpy()
+    f = models.to_numpy(dtype=float)
+    valid = ~np.isnan(f)
+
+    # squared errors of each model and of the benchmark on the model's months
+    sfe = np.where(valid, (r - f) ** 2, 0.0)
+    sfe_hist = np.where(valid, (r - hist) ** 2, 0.0)
+    # Clark-West adjusted loss differential, tested with a t-test on its mean
+    cw = np.where(valid, sfe_hist - (sfe - (hist - f) ** 2), np.nan)
+    n = valid.sum(axis=0)
+
+    with warnings.catch_warnings():
+        # models without forecasts
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        stats = pd.DataFrame(
+            {
+                "oos_r2": 1 - sfe.sum(axis=0) / sfe_hist.sum(axis=0),
+                "cw_tstat": np.nanmean(cw, axis=0)
+                / (np.nanstd(cw, axis=0, ddof=1) / np.sqrt(n)),
+                "nobs": n,
+            },
+            index=models.columns,
+        )
+    diff_sse = pd.DataFrame(
+        sfe_hist.cumsum(axis=0) - sfe.cumsum(axis=0),
+        index=forecasts.index,
+        columns=models.columns,
+    )
+
+    return stats, diff_sse
+
+
+def compute_exmkt_oos_r2(vrp_for, df, restriction=False, indep_var="vrp") -> dict:
     """
     Computes the out-of-sample R-squared for the given exogenous market variable.
 
@@ -148,52 +234,144 @@ def compute_exmkt_oos_r2(vrp_for, df, restriction=False):
 
     Statistical significance is determined by a Clark-West test.
 
+    The evaluation is run once per (predictor, restriction); the table and figure
+    writers read from the returned results.
+
     Args:
-    df_oos: DataFrame containing out-of-sample predictions and historical values
+    vrp_for: dict of out-of-sample forecasts by horizon from get_individual_predictor_oos_forecast
+    df: DataFrame with the historical average forecasts hist_exmkt_h{h}
     restriction: Whether to apply out-of-sample restriction (default False)
+    indep_var: the predictor (default "vrp")
 
     Returns:
-    oos_r2_exmkt: List of out-of-sample R-squared values with stars indicating significance
+    dict with the out-of-sample R-squared (oos_r2) and Clark-West t-statistics
+    (cw_tstat) indexed by horizon, and the cumulative difference in sum of squared
+    errors (diff_sse) with one column per horizon
 
     """
-    oos_r2_exmkt = []
-    diff_sse_vrp = []
-    for h in [1, 3, 6, 12]:
+    if restriction:  # add the restriction
+        print("Add OOS restriction that OOS is positive")
+
+    oos_r2, cw_tstat, diff_sse = {}, {}, []
+    for h in vrp_for:
         df_oos = (
-            vrp_for[h].reset_index().merge(df[["date", f"hist_exmkt_h{h}"]], on="date")
-        )
-        if restriction:  # add the restriction
-            print("Add OOS restriction that OOS is positive")
-            df_oos.loc[df_oos[f"vrp_h{h}"] < 0, f"vrp_h{h}"] = 0
-
-        df_oos["msfe"] = (df_oos[f"exmkt_h{h}"] - df_oos[f"vrp_h{h}"]) ** 2
-        df_oos["msfe_hist"] = (df_oos[f"exmkt_h{h}"] - df_oos[f"hist_exmkt_h{h}"]) ** 2
-        df_oos["hist_minus_pred"] = (
-            df_oos[f"hist_exmkt_h{h}"] - df_oos[f"vrp_h{h}"]
-        ) ** 2
-        # add the significance of the OOS-R2
-        df_oos["cw_fstat"] = df_oos["msfe_hist"] - (
-            df_oos["msfe"] - df_oos["hist_minus_pred"]
+            vrp_for[h]
+            .reset_index()
+            .merge(df[["date", f"hist_exmkt_h{h}"]], on="date")
+            .set_index("date")[
+                [f"exmkt_h{h}", f"hist_exmkt_h{h}", f"{indep_var}_h{h}"]
+            ]
         )
+        stats, diff = evaluate_oos(df_oos, h, restriction=restriction)
 
-        df_oos[f"diff_sse_vrp_h{h}"] = (
-            df_oos["msfe_hist"].cumsum() - df_oos["msfe"].cumsum()
+        oos_r2[h] = stats.loc[f"{indep_var}_h{h}", "oos_r2"]
+        cw_tstat[h] = stats.loc[f"{indep_var}_h{h}", "cw_tstat"]
+        diff_sse.append(
+            diff[f"{indep_var}_h{h}"].rename(f"diff_sse_{indep_var}_h{h}")
         )
-        df_oos = df_oos.set_index("date")
-        diff_sse_vrp.append(df_oos[f"diff_sse_vrp_h{h}"])
 
-        reg = smf.ols("cw_fstat~1", data=df_oos).fit()
-        tval = reg.tvalues["Intercept"]
+    return {
+        "oos_r2": pd.Series(oos_r2),
+        "cw_tstat": pd.Series(cw_tstat),
+        "diff_sse": pd.concat(diff_sse, axis=1),
+    }
+
+
+def oos_r2_table(oos_results: dict, tab_dir: Path, savename: str) -> pd.DataFrame:
+    """
+    Exports the out-of-sample R-squared with Clark-West significance stars, one row
+    per set of results and one column per horizon.
+
+    Args:
+        oos_results (dict): row label -> results from compute_exmkt_oos_r2
+        tab_dir (Path): table directory
+        savename (str): Filename for the saved table (without extension)
+
+    Returns:
+        pd.DataFrame: the formatted table
+    """
+    oos_tab = pd.DataFrame(
+        {
+            f"h={h}": [
+                oos_r2_with_stars(res["oos_r2"][h], res["cw_tstat"][h])
+                for res in oos_results.values()
+            ]
+            for h in next(iter(oos_results.values()))["oos_r2"].index
+        },
+        index=list(oos_results),
+    )
+
+    oos_tab.to_latex(tab_dir / f"{savename}.tex", escape=False)
 
-        oos_r2_val = 1 - df_oos["msfe"].sum() / df_oos["msfe_hist"].sum()
-        oos_r2_exmkt.append(oos_r2_with_stars(oos_r2_val, tval))
+    return oos_tab
 
-    diff_sse_vrp = pd.concat(diff_sse_vrp, axis=1)
 
-    return [oos_r2_exmkt, diff_sse_vrp]
+def bootstrap_exmkt_oos(
+    df: pd.DataFrame,
+    indep_var: str,
+    tab_dir: Path,
+    savename: str,
+    start_date_oos="1999-11-30",
+    n_boot: int = 1000,
+    method: str = "block",
+    restriction: bool = False,
+) -> pd.DataFrame:
+    """
+    Bootstrap p-values of the in-sample t-statistic and the OOS R-squared of the
+    predictive regressions of the excess market return, by horizon. The OOS
+    R-squared is measured against the historical average hist_exmkt_h{h}, which
+    includes the returns before the predictor is available, as in
+    `compute_exmkt_oos_r2`.
 
+    Args:
+        df (pd.DataFrame): output of load_exmkt_data
+        indep_var (str): the predictor
+        tab_dir (Path): table directory
+        savename (str): Filename for the saved table (without extension)
+        start_date_oos (str, optional): last date of the initial estimation window. Defaults to "1999-11-30".
+        n_boot (int, optional): number of bootstrap replications. Defaults to 1000.
+        method (str, optional): "wild" or "block" bootstrap. Defaults to "block".
+        restriction (bool, optional): set negative forecasts to zero. Defaults to False.
 
-def plot_diff_sse(diff_sse: pd.DataFrame, fig_dir: Path, savename: str) -> None:
+    Returns:
+        pd.DataFrame: statistics and p-values, one column per horizon
+    """
+    output = {}
+    for h in [1, 3, 6, 12]:
+        pred = df[["date", f"exmkt_h{h}", indep_var]].dropna()
+        start = int((pred["date"] < start_date_oos).sum())
+        # returns before the predictor sample, in the historical average
+        prior = df.loc[df["date"] < pred["date"].iloc[0], f"exmkt_h{h}"].dropna()
+        boot = bootstrap_predictive(
+            pred[f"exmkt_h{h}"].to_numpy(),
+            pred[indep_var].to_numpy(),
+            start,
+            n_boot=n_boot,
+            method=method,
+            block_size=max(12, h),
+            restriction=restriction,
+            y_prior=prior.to_numpy(),
+        )
+        output[f"h={h}"] = [
+            boot["tstat"],
+            boot["pval_tstat"],
+            boot["oos_r2"],
+            boot["pval_oos_r2"],
+        ]
+
+    output = pd.DataFrame(
+        output,
+        index=["$t$-stat", "$p$-value ($t$-stat)", "OOS $R^2$", "$p$-value (OOS $R^2$)"],
+    )
+
+    output.to_latex(tab_dir / f"{savename}.tex", escape=False, float_format="%.3f")
+
+    return output
+
+
+def plot_diff_sse(
+    diff_sse: pd.DataFrame, fig_dir: Path, savename: str, model: str = "VRP"
+) -> None:
     """
     Plot the cumulative difference in sum of squared errors for all horizons.
 
@@ -201,6 +379,7 @@ def plot_diff_sse(diff_sse: pd.DataFrame, fig_dir: Path, savename: str) -> None:
         diff_sse: DataFrame with columns diff_sse_vrp_h1, diff_sse_vrp_h3, etc.
         fig_dir: Directory to save the figure
         savename: Filename for the saved figure (without extension)
+        model: label of the forecasts in the y-axis title (default "VRP")
     """
     fig, ax = plt.subplots(figsize=(10, 6))
 
@@ -216,7 +395,7 @@ def plot_diff_sse(diff_sse: pd.DataFrame, fig_dir: Path, savename: str) -> None:
 
     ax.axhline(y=0, color="black", linestyle="--", linewidth=0.8)
     ax.set_xlabel("Date")
-    ax.set_ylabel("Cumulative $\\Delta$ SSE (Historical - VRP)")
+    ax.set_ylabel(f"Cumulative $\\Delta$ SSE (Historical - {model})")
     ax.legend()
     ax.grid(True, alpha=0.3)
 
@@ -244,7 +423,19 @@ def load_vrp(download_dir: Path) -> pd.DataFrame:
     return vrp[["date", "vrp"]]
 
 
-def oos_regression_example(download_dir: Path, tab_dir: Path, fig_dir: Path):
+def load_exmkt_data(download_dir: Path, horizons=(1, 3, 6, 12)) -> pd.DataFrame:
+    """
+    Builds the monthly forecasting data: excess market returns over the next h
+    months, their historical average (the benchmark forecast), the VRP and the
+    Fama-French factors as candidate predictors.
+
+    Args:
+        download_dir (Path): download cache directory
+        horizons (tuple, optional): forecast horizons in months. Defaults to (1, 3, 6, 12).
+
+    Returns:
+        pd.DataFrame: monthly time-series ending in 2023
+    """
     # load fama french factors for the market return and risk free rate
     ff_file = get_latest_file(download_dir / "ff5_monthly.parquet")
     ff = pd.read_parquet(ff_file)
@@ -256,17 +447,23 @@ def oos_regression_example(download_dir: Path, tab_dir: Path, fig_dir: Path):
     vrp = load_vrp(download_dir)
 
     # merge
-    df = pd.merge(ff[["date", "mkt", "rf"]], vrp, on="date", how="left")
+    df = pd.merge(
+        ff[["date", "mkt", "rf", "mkt_rf", "smb", "hml", "rmw", "cma"]],
+        vrp,
+        on="date",
+        how="left",
+    )
     df["exmkt"] = df["mkt"] - df["rf"]
-    # h=1
-    df["exmkt_h1"] = df["exmkt"].shift(-1)
 
-    # create log returns to compute total 3, 6, 12 months ahead returns
+    # create log returns to compute total h months ahead returns
     df["ln_mkt"] = np.log(1 + df["mkt"])
     df["ln_rf"] = np.log(1 + df["rf"])
 
-    # returns at different horizons (for 3, 6, 12 months)
-    for h in [3, 6, 12]:
+    # returns at different horizons
+    for h in horizons:
+        if h == 1:
+            df["exmkt_h1"] = df["exmkt"].shift(-1)
+            continue
         df[f"ln_mkt_h{h}"] = df["ln_mkt"].rolling(h, min_periods=h).sum()
         df[f"ln_rf_h{h}"] = df["ln_rf"].rolling(h, min_periods=h).sum()
         df[f"mkt_h{h}"] = np.exp(df[f"ln_mkt_h{h}"]) - 1
@@ -276,16 +473,35 @@ def oos_regression_example(download_dir: Path, tab_dir: Path, fig_dir: Path):
         df = df.drop(columns=[f"ln_mkt_h{h}", f"ln_rf_h{h}", f"mkt_h{h}", f"rf_h{h}"])
 
     # Compute historical average of exmkt
-    for h in [1, 3, 6, 12]:
+    for h in horizons:
         df[f"hist_exmkt_h{h}"] = df[f"exmkt_h{h}"].expanding().mean().shift()
 
     # End data in 2023
-    df = df[df["date"] <= "2023-12-31"]
+    return df[df["date"] <= "2023-12-31"]
+
+
+def oos_regression_example(
+    download_dir: Path,
+    tab_dir: Path,
+    fig_dir: Path,
+    cache_dir: Optional[Path] = None,
+    bootstrap: bool = False,
+    n_boot: int = 1000,
+    bootstrap_method: str = "block",
+):
+    df = load_exmkt_data(download_dir)
 
     # Insample regression
-    is_reg = insample_regression(df, "vrp", tab_dir, "reg_insample_exmkt_vrp")
     is_reg = insample_regression(
-        df[df["date"] <= "2019-12-31"], "vrp", tab_dir, "reg_insample_exmkt_vrp_pre2020"
+        df, "vrp", tab_dir, "reg_insample_exmkt_vrp", cache_dir=cache_dir
+    )
+    is_reg = insample_regression(
+        df,
+        "vrp",
+        tab_dir,
+        "reg_insample_exmkt_vrp_pre2020",
+        pre_2020=True,
+        cache_dir=cache_dir,
     )
 
     vrp_oos = {
@@ -299,26 +515,48 @@ def oos_regression_example(download_dir: Path, tab_dir: Path, fig_dir: Path):
         for h in [1, 3, 6, 12]
     }
 
-    outofsample_regression(vrp_oos, "vrp", tab_dir, "reg_outofsample_exmkt_vrp")
     outofsample_regression(
-        vrp_oos, "vrp", tab_dir, "reg_outofsample_exmkt_vrp_pre2020", pre_2020=True
+        vrp_oos, "vrp", tab_dir, "reg_outofsample_exmkt_vrp", cache_dir=cache_dir
     )
-
-    oos_tab = pd.concat(
-        [
-            pd.DataFrame(compute_exmkt_oos_r2(vrp_oos, df, restriction=False)[0]).T,
-            pd.DataFrame(compute_exmkt_oos_r2(vrp_oos, df, restriction=True)[0]).T,
-        ]
+    outofsample_regression(
+        vrp_oos,
+        "vrp",
+        tab_dir,
+        "reg_outofsample_exmkt_vrp_pre2020",
+        pre_2020=True,
+        cache_dir=cache_dir,
     )
 
-    oos_tab.columns = ["h=1", "h=3", "h=6", "h=12"]
-    oos_tab.index = ["No restriction", "Restriction: $E_t[r_{M,t+h}]>0$"]
+    # evaluate the forecasts once per restriction
+    oos_results = {
+        restriction: compute_exmkt_oos_r2(vrp_oos, df, restriction=restriction)
+        for restriction in [False, True]
+    }
 
-    oos_tab.to_latex(tab_dir / "oos_r2_exmkt_vrp.tex", escape=False)
+    oos_r2_table(
+        {
+            "No restriction": oos_results[False],
+            "Restriction: $E_t[r_{M,t+h}]>0$": oos_results[True],
+        },
+        tab_dir,
+        "oos_r2_exmkt_vrp",
+    )
 
-    # cumulative difference in sum of squared errors - plot figures
-    diff_sse_no_restriction = compute_exmkt_oos_r2(vrp_oos, df, restriction=False)[1]
-    plot_diff_sse(diff_sse_no_restriction, fig_dir, "diff_sse_vrp_no_restriction")
+    # bootstrap p-values of the in-sample and OOS statistics
+    if bootstrap:
+        bootstrap_exmkt_oos(
+            df,
+            "vrp",
+            tab_dir,
+            "oos_bootstrap_exmkt_vrp",
+            n_boot=n_boot,
+            method=bootstrap_method,
+        )
 
-    diff_sse_with_restriction = compute_exmkt_oos_r2(vrp_oos, df, restriction=True)[1]
-    plot_diff_sse(diff_sse_with_restriction, fig_dir, "diff_sse_vrp_with_restriction")
+    # cumulative difference in sum of squared errors - plot figures
+    plot_diff_sse(
+        oos_results[False]["diff_sse"], fig_dir, "diff_sse_vrp_no_restriction"
+    )
+    plot_diff_sse(
+        oos_results[True]["diff_sse"], fig_dir, "diff_sse_vrp_with_restriction"
+    )
@@ -0,0 +1,201 @@
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ..utils import expanding_ols, expanding_univariate_ols
+from .oos_exmkt_vrp import (
+    evaluate_oos,
+    load_exmkt_data,
+    oos_r2_with_stars,
+    plot_diff_sse,
+)
+
+# candidate predictors available in `load_exmkt_data`
+DEFAULT_PREDICTORS = ["vrp", "mkt_rf", "smb", "hml", "rmw", "cma", "rf"]
+COMBINATIONS = ["mean", "median", "dmspe"]
+
+
+def _lagged_forecast(coef: np.ndarray, X: np.ndarray) -> np.ndarray:
+    """
+    Forecast for each row from the coefficients estimated up to the previous row.
+
+    Args:
+        coef (np.ndarray): coefficient paths [intercept, betas...], shape (T, ..., k + 1).
+        X (np.ndarray): predictors aligned with `coef`, shape (T, ...) or (T, ..., k).
+
+    Returns:
+        np.ndarray: forecasts, shape (T, ...).
+    """
+    lagged = np.full_like(coef, np.nan)
+    lagged[1:] = coef[:-1]
+    if X.ndim == coef.ndim - 1:
+        X = X[..., None]
+    return lagged[..., 0] + (lagged[..., 1:] * X).sum(axis=-1)
+
+
+def dmspe_weights(
+    errors: np.ndarray, theta: float = 1.0, horizon: int = 1
+) -> np.ndarray:
+    """
+    Discount mean squared prediction error weights (Stock and Watson, 2004).
+
+    The weight of forecast i at t is proportional to the inverse of its discounted
+    sum of the squared errors known at t, phi_i,t = sum_{s<=t-h} theta^(t-h-s)
+    e_i,s^2: the error of the forecast made at s is the return over the next h
+    months, only realized at s + h. Equal weights are used until errors are
+    available.
+
+    Args:
+        errors (np.ndarray): forecast errors, shape (T, k); NaN errors are ignored.
+        theta (float, optional): discount factor. Defaults to 1.0 (no discounting).
+        horizon (int, optional): forecast horizon h in months. Defaults to 1.
+
+    Returns:
+        np.ndarray: combination weights, shape (T, k), summing to one on each row.
+    """
+    sq = np.nan_to_num(errors**2)
+    phi = np.zeros_like(sq)
+    for t in range(horizon, len(sq)):
+        phi[t] = theta * phi[t - 1] + sq[t - horizon]
+
+    with np.errstate(divide="ignore"):
+        inv = np.where(phi > 0, 1 / phi, 0.0)
+    total = inv.sum(axis=1, keepdims=True)
+    equal = np.full_like(inv, 1 / inv.shape[1])
+
+    return np.where(total > 0, inv / np.where(total > 0, total, 1), equal)
+
+
+def oos_forecasts(
+    df: pd.DataFrame,
+    predictors=DEFAULT_PREDICTORS,
+    horizons=(1, 3, 6, 12),
+    start_date_oos="1999-11-30",
+    kitchen_sink: bool = True,
+    combinations=COMBINATIONS,
+    theta: float = 1.0,
+) -> dict:
+    """
+    Out-of-sample forecasts of the h-month excess market return for a set of
+    predictors.
+
+    For every horizon, the univariate regressions of all predictors and the
+    kitchen-sink regression are estimated on an expanding window in one pass
+    (see `expanding_univariate_ols` and `expanding_ols`), and the forecast for a
+    month uses the coefficients estimated up to the previous month, as in
+    `get_individual_predictor_oos_forecast`. Combination forecasts average the
+    univariate forecasts (mean, median or DMSPE weights).
+
+    Args:
+        df (pd.DataFrame): output of `load_exmkt_data`.
+        predictors (list, optional): predictor columns. Defaults to DEFAULT_PREDICTORS.
+        horizons (tuple, optional): forecast horizons in months. Defaults to (1, 3, 6, 12).
+        start_date_oos (str, optional): last date of the initial estimation window. Defaults to "1999-11-30".
+        kitchen_sink (bool, optional): add the regression on all predictors. Defaults to True.
+        combinations (list, optional): combination forecasts among "mean", "median" and "dmspe". Defaults to COMBINATIONS.
+        theta (float, optional): DMSPE discount factor. Defaults to 1.0.
+
+    Returns:
+        dict: for each horizon, a DataFrame indexed by date with the realized return
+            (exmkt_h{h}), the historical average benchmark (hist_exmkt_h{h}) and one
+            column of forecasts per model.
+    """
+    predictors = list(predictors)
+    X = df[predictors].to_numpy(dtype=float)
+    oos = np.r_[False, (df["date"] >= start_date_oos).to_numpy()[:-1]]
+
+    output = {}
+    for h in horizons:
+        y = df[f"exmkt_h{h}"].to_numpy(dtype=float)
+        keep = oos & ~np.isnan(y)
+
+        forecasts = _lagged_forecast(expanding_univariate_ols(y, X), X)[keep]
+        models = {p: forecasts[:, i] for i, p in enumerate(predictors)}
+
+        if kitchen_sink and len(predictors) > 1:
+            models["kitchen_sink"] = _lagged_forecast(expanding_ols(y, X), X)[keep]
+
+        with warnings.catch_warnings():
+            # months where no predictor is available
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            if "mean" in combinations:
+                models["mean"] = np.nanmean(forecasts, axis=1)
+            if "median" in combinations:
+                models["median"] = np.nanmedian(forecasts, axis=1)
+        if "dmspe" in combinations:
+            weights = dmspe_weights(y[keep, None] - forecasts, theta, h)
+            models["dmspe"] = (weights * forecasts).sum(axis=1)
+            models["dmspe"][np.isnan(forecasts).any(axis=1)] = np.nan
+
+        output[h] = pd.DataFrame(
+            {
+                f"exmkt_h{h}": y[keep],
+                f"hist_exmkt_h{h}": df[f"hist_exmkt_h{h}"].to_numpy()[keep],
+                **models,
+            },
+            index=pd.Index(df["date"].to_numpy()[keep], name="date"),
+        )
+
+    return output
+
+
+def oos_predictors_table(
+    download_dir: Path,
+    tab_dir: Path,
+    fig_dir: Path,
+    predictors=DEFAULT_PREDICTORS,
+    horizons=(1, 3, 6, 12),
+) -> dict:
+    """
+    Exports the OOS R-squared of the univariate, kitchen-sink and combination
+    forecasts of the excess market return, with Clark-West significance stars and
+    t-statistics, without and with the restriction that forecasts are non-negative,
+    and plots the cumulative difference in sum of squared errors of every model by
+    horizon. The forecasts are computed once and evaluated under both restrictions.
+
+    Args:
+        download_dir (Path): download cache directory
+        tab_dir (Path): table directory
+        fig_dir (Path): figure directory
+        predictors (list, optional): predictor columns. Defaults to DEFAULT_PREDICTORS.
+        horizons (tuple, optional): forecast horizons in months. Defaults to (1, 3, 6, 12).
+
+    Returns:
+        dict: restriction -> formatted table, models by (horizon, statistic)
+    """
+    df = load_exmkt_data(download_dir, horizons)
+    forecasts = oos_forecasts(df, predictors, horizons)
+
+    tables = {}
+    for restriction in [False, True]:
+        suffix = "_restriction" if restriction else ""
+        oos_tab = {}
+        for h in horizons:
+            stats, diff_sse = evaluate_oos(forecasts[h], h, restriction=restriction)
+            oos_tab[(f"h={h}", "OOS $R^2$")] = pd.Series(
+                [
+                    oos_r2_with_stars(r2, tval)
+                    for r2, tval in zip(stats["oos_r2"], stats["cw_tstat"])
+                ],
+                index=stats.index,
+            )
+            oos_tab[(f"h={h}", "CW $t$-stat")] = stats["cw_tstat"].map(
+                "{:.2f}".format
+            )
+            plot_diff_sse(
+                diff_sse,
+                fig_dir,
+                f"diff_sse_exmkt_predictors_h{h}{suffix}",
+                model="Model",
+            )
+        oos_tab = pd.DataFrame(oos_tab)
+
+        savename = f"oos_r2_exmkt_predictors{suffix}"
+        oos_tab.to_latex(
+            tab_dir / f"{savename}.tex", escape=False, multicolumn_format="c"
+        )
+        tables[restriction] = oos_tab
+
+    return tables
@@ -1,3 +1,19 @@
-from .files import get_latest_file, timestamp_file
+from .bootstrap import bootstrap_predictive
+from .datasets import (
+    clear_dataset_cache,
+    configure_dataset_cache,
+    dataset_table,
+    read_dataset,
+)
+from .expanding_ols import (
+    expanding_ols,
+    expanding_univariate_ols,
+    grouped_rolling_ols,
+)
+from .fama_macbeth import fama_macbeth
+from .files import get_latest_file, hash_files, timestamp_file
+from .hdfe import build_design, hdfe_ols
+from .interval_join import interval_join
 from .panel_ols_reg import PREFIX_MAP, ols_reg, panel_ols
 from .pyplot_config import configure_pyplot
+from .spec_runner import run_specs, spec_grid
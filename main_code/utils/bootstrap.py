@@ -0,0 +1,189 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from .expanding_ols import expanding_univariate_ols
+
+
+def predictive_stats(
+    y: np.ndarray,
+    x: np.ndarray,
+    start: int,
+    restriction: bool = False,
+    y_prior: Optional[np.ndarray] = None,
+) -> dict:
+    """
+    In-sample and out-of-sample statistics of the predictive regression
+    y_t = a + b x_t + e_t, computed for every column at once.
+
+    The out-of-sample forecast for row t uses the expanding-window coefficients
+    estimated up to row t - 1 and is compared with the historical average of y up
+    to t - 1, for the rows after `start`. The historical average also includes
+    `y_prior`, the history of y before the sample.
+
+    Args:
+        y (np.ndarray): dependent variable, shape (T, B).
+        x (np.ndarray): predictor, shape (T, B).
+        start (int): row of the last date of the initial estimation window.
+        restriction (bool, optional): set negative forecasts to zero. Defaults to False.
+        y_prior (np.ndarray, optional): values of y before the first row, e.g. the returns before the predictor is available. Defaults to None (none).
+
+    Returns:
+        dict: slope, HC1 t-statistic (tstat) and OOS R-squared (oos_r2), each of shape (B,).
+    """
+    T = len(y)
+
+    # full-sample slope with HC1 standard errors
+    xd = x - x.mean(axis=0)
+    sxx = (xd**2).sum(axis=0)
+    slope = (xd * (y - y.mean(axis=0))).sum(axis=0) / sxx
+    resid = y - y.mean(axis=0) - slope * xd
+    se = np.sqrt(T / (T - 2) * (xd**2 * resid**2).sum(axis=0)) / sxx
+
+    # expanding-window forecasts against the historical average
+    coef = expanding_univariate_ols(y, x)
+    forecast = coef[start:-1, :, 0] + coef[start:-1, :, 1] * x[start + 1 :]
+    if restriction:
+        forecast = np.maximum(forecast, 0)
+    prior = np.zeros(0) if y_prior is None else np.asarray(y_prior, dtype=float)
+    hist = (
+        (prior.sum() + np.cumsum(y, axis=0))
+        / (len(prior) + np.arange(1, T + 1))[:, None]
+    )[start:-1]
+    actual = y[start + 1 :]
+    oos_r2 = 1 - ((actual - forecast) ** 2).sum(axis=0) / (
+        (actual - hist) ** 2
+    ).sum(axis=0)
+
+    return {"slope": slope, "tstat": slope / se, "oos_r2": oos_r2}
+
+
+def _null_samples(
+    y: np.ndarray,
+    x: np.ndarray,
+    n: int,
+    method: str,
+    block_size: int,
+    rng: np.random.Generator,
+) -> tuple:
+    """
+    Simulates `n` samples under the null of no predictability: y_t = a + u_t and
+    x_t = mu + rho x_t-1 + v_t, resampling the residual pairs (u_t, v_t+1) jointly
+    so the correlation between return and predictor innovations is preserved. The
+    u_t are the residuals of the predictive regression, so that resampling does not
+    carry the predictor's signal into the null samples.
+    """
+    T = len(y)
+    b, a = np.polyfit(x, y, 1)
+    u = y - a - b * x
+    rho, mu = np.polyfit(x[:-1], x[1:], 1)
+    v = x[1:] - mu - rho * x[:-1]
+
+    if method == "wild":
+        # Rademacher weights shared by u_t and v_t+1
+        eta = rng.choice([-1.0, 1.0], size=(T, n))
+        u_star = u[:, None] * eta
+        v_star = v[:, None] * eta[:-1]
+    elif method == "block":
+        # circular moving blocks over the T - 1 residual pairs
+        n_blocks = -(-T // block_size)
+        starts = rng.integers(0, T - 1, size=(n_blocks, n))
+        idx = (starts[:, None, :] + np.arange(block_size)[None, :, None]) % (T - 1)
+        idx = idx.reshape(-1, n)[:T]
+        u_star = u[idx]
+        v_star = v[idx[:-1]]
+    else:
+        raise ValueError(f"Unknown bootstrap method {method}")
+
+    x_star = np.empty((T, n))
+    x_star[0] = x[0]
+    for t in range(1, T):
+        x_star[t] = mu + rho * x_star[t - 1] + v_star[t - 1]
+
+    return y.mean() + u_star, x_star
+
+
+def _bootstrap_batch(args: tuple) -> dict:
+    y, x, start, n, method, block_size, restriction, y_prior, seed = args
+    rng = np.random.default_rng(seed)
+    y_star, x_star = _null_samples(y, x, n, method, block_size, rng)
+    return predictive_stats(y_star, x_star, start, restriction, y_prior)
+
+
+def bootstrap_predictive(
+    y: np.ndarray,
+    x: np.ndarray,
+    start: int,
+    n_boot: int = 1000,
+    method: str = "wild",
+    block_size: int = 12,
+    restriction: bool = False,
+    y_prior: Optional[np.ndarray] = None,
+    seed: int = 0,
+    workers: int = -1,
+    batch_size: int = 250,
+) -> dict:
+    """
+    Bootstrap p-values of the in-sample slope t-statistic and the OOS R-squared of
+    a predictive regression under the null of no predictability.
+
+    Pseudo-samples are generated with a wild (Rademacher) or circular block
+    bootstrap of the residuals of the null model, and the regressions of a batch of
+    replications are estimated together as columns of one array. Batches are
+    spread over a process pool. Each batch draws from its own child of
+    `SeedSequence(seed)`, so results only depend on `seed` and `batch_size`, not on
+    the number of workers.
+
+    Args:
+        y (np.ndarray): dependent variable, shape (T,), without missing values.
+        x (np.ndarray): predictor, shape (T,), without missing values.
+        start (int): row of the last date of the initial estimation window.
+        n_boot (int, optional): number of replications. Defaults to 1000.
+        method (str, optional): "wild" or "block". Defaults to "wild".
+        block_size (int, optional): block length of the block bootstrap. Defaults to 12.
+        restriction (bool, optional): set negative forecasts to zero. Defaults to False.
+        y_prior (np.ndarray, optional): values of y before the sample, included in the historical average benchmark of every replication. Defaults to None (none).
+        seed (int, optional): random seed. Defaults to 0.
+        workers (int, optional): number of processes, -1 uses all cores. Defaults to -1.
+        batch_size (int, optional): replications per batch. Defaults to 250.
+
+    Returns:
+        dict: observed slope, tstat and oos_r2, their one-sided bootstrap p-values
+            (pval_tstat, pval_oos_r2) and the bootstrap distributions (boot_tstat,
+            boot_oos_r2).
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    observed = {
+        k: v[0]
+        for k, v in predictive_stats(
+            y[:, None], x[:, None], start, restriction, y_prior
+        ).items()
+    }
+
+    sizes = [min(batch_size, n_boot - i) for i in range(0, n_boot, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    batches = [
+        (y, x, start, n, method, block_size, restriction, y_prior, s)
+        for n, s in zip(sizes, seeds)
+    ]
+
+    workers = os.cpu_count() if workers == -1 else workers
+    if workers == 1 or len(batches) == 1:
+        results = list(map(_bootstrap_batch, batches))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            results = list(pool.map(_bootstrap_batch, batches))
+
+    boot_tstat = np.concatenate([r["tstat"] for r in results])
+    boot_oos_r2 = np.concatenate([r["oos_r2"] for r in results])
+
+    return {
+        **observed,
+        "pval_tstat": (boot_tstat >= observed["tstat"]).mean(),
+        "pval_oos_r2": (boot_oos_r2 >= observed["oos_r2"]).mean(),
+        "boot_tstat": boot_tstat,
+        "boot_oos_r2": boot_oos_r2,
+    }
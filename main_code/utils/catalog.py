@@ -0,0 +1,160 @@
+"""
+SQL catalog of the data artifacts in an embedded DuckDB database.
+
+Each dataset of DATADIR (CRSP, Compustat, IBES and Fama-French downloads, the
+SUEs, the panel and the event data) is a view over the Parquet file of its latest
+version, found as in `get_latest_file` when the catalog is opened: the schema is
+the one of that file and the other versions are never opened. The views are
+recreated every time the catalog is opened, so a version written later by
+`timestamp_file` is read after the next opening (e.g. the next run of this
+module for the saved catalog). Queries on the views push the filters and
+projections into the Parquet scan.
+
+Usage:
+    python -m main_code.utils.catalog                       # list the datasets
+    python -m main_code.utils.catalog "select count(*) from crsp_daily"
+    duckdb $DATADIR/catalog.duckdb                          # after a first run
+"""
+
+import argparse
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from .files import get_latest_file
+
+CATALOG_DIRS = [
+    "download_cache",
+    "preprocess_cache",
+    "clean",
+    "restricted",
+    "open",
+]
+# suffix added by timestamp_file
+VERSION = re.compile(r"_\d{8}_\d{6}$")
+
+
+def catalog_datasets(data_dir: Path) -> dict:
+    """
+    Finds the datasets of the catalog: the Parquet files of the data directories,
+    grouped by name without the timestamp, and the latest version of each. A name
+    found in several directories is kept in the first one of CATALOG_DIRS.
+
+    Args:
+        data_dir (Path): the DATADIR directory.
+
+    Returns:
+        dict: name -> file of the latest version (the file itself if it has no timestamp).
+    """
+    datasets = {}
+    for sub in CATALOG_DIRS:
+        directory = Path(data_dir) / sub
+        if not directory.is_dir():
+            continue
+        found = {}
+        for file in directory.glob("*.parquet"):
+            name = VERSION.sub("", file.stem)
+            found[name] = found.get(name, False) or name != file.stem
+        for name, versioned in sorted(found.items()):
+            if name in datasets:
+                logging.warning(f"{name} in {sub} shadowed by {datasets[name].parent}")
+                continue
+            file = directory.resolve() / f"{name}.parquet"
+            datasets[name] = get_latest_file(file) if versioned else file
+    return datasets
+
+
+def _literal(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+def _view(name: str, file: Path) -> str:
+    return (
+        f'CREATE OR REPLACE VIEW "{name}" AS SELECT * FROM '
+        f"read_parquet({_literal(file.as_posix())})"
+    )
+
+
+def open_catalog(data_dir: Path, database: Optional[Path] = None):
+    """
+    Opens the DuckDB catalog and (re)creates a view per dataset on its latest
+    version, so the views of a saved catalog are refreshed on every opening. The
+    views of datasets listed in the `catalog` table of the previous opening and
+    removed since are dropped; other views of the database are left alone.
+
+    Args:
+        data_dir (Path): the DATADIR directory.
+        database (Path, optional): DuckDB database file, to query the views from other clients. Defaults to None (in memory).
+
+    Returns:
+        duckdb.DuckDBPyConnection: connection with one view per dataset.
+    """
+    import duckdb
+
+    con = duckdb.connect(str(database) if database is not None else ":memory:")
+    datasets = catalog_datasets(data_dir)
+    # views of the datasets of the previous opening that were removed; the other
+    # views, e.g. created by the user, are kept
+    previous = con.execute(
+        "SELECT count(*) FROM duckdb_tables() "
+        "WHERE schema_name = 'main' AND table_name = 'catalog'"
+    ).fetchone()[0]
+    if previous:
+        for (name,) in con.execute("SELECT name FROM catalog").fetchall():
+            if name not in datasets:
+                con.execute(f'DROP VIEW IF EXISTS "{name}"')
+    for name, file in datasets.items():
+        con.execute(_view(name, file))
+    con.execute("CREATE OR REPLACE TABLE catalog (name VARCHAR, file VARCHAR)")
+    con.executemany(
+        "INSERT INTO catalog VALUES (?, ?)",
+        [(name, str(file)) for name, file in datasets.items()],
+    )
+    return con
+
+
+def query_catalog(query: str, data_dir: Path) -> pd.DataFrame:
+    """
+    Runs a SQL query on the catalog, e.g.
+    query_catalog("select permno, count(*) from panel_data group by 1", data_dir).
+
+    Args:
+        query (str): SQL query on the dataset views.
+        data_dir (Path): the DATADIR directory.
+
+    Returns:
+        pd.DataFrame: the result.
+    """
+    con = open_catalog(data_dir)
+    try:
+        return con.execute(query).df()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "query", nargs="?", help="SQL query, lists the datasets if omitted"
+    )
+    parser.add_argument("--data-dir", type=Path, default=os.getenv("DATADIR"))
+    parser.add_argument(
+        "--database",
+        type=Path,
+        help="DuckDB database file (default: DATADIR/catalog.duckdb)",
+    )
+    args = parser.parse_args()
+    if args.data_dir is None:
+        raise ValueError("DATADIR environment variable not set")
+
+    database = args.database or args.data_dir / "catalog.duckdb"
+    con = open_catalog(args.data_dir, database)
+    with pd.option_context("display.width", 200, "display.max_columns", 50):
+        print(con.execute(args.query or "SELECT * FROM catalog ORDER BY name").df())
+    con.close()
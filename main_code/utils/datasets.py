@@ -0,0 +1,123 @@
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .files import get_latest_file
+
+# dataset -> {"version": (file, mtime, size), "schema": pa.Schema, "columns": {name: ChunkedArray}}
+_CACHE: OrderedDict = OrderedDict()
+_MAX_BYTES = 8 << 30
+
+
+def configure_dataset_cache(max_bytes: int) -> None:
+    """
+    Sets the memory budget of the dataset cache and evicts the least recently used
+    datasets above it.
+
+    Args:
+        max_bytes (int): budget in bytes of the cached Arrow columns, 0 disables the cache.
+    """
+    global _MAX_BYTES
+    _MAX_BYTES = max_bytes
+    _evict()
+
+
+def clear_dataset_cache() -> None:
+    """
+    Drops all the cached datasets, e.g. once the data are built.
+    """
+    _CACHE.clear()
+
+
+def _nbytes(entry: dict) -> int:
+    return sum(column.nbytes for column in entry["columns"].values())
+
+
+def _evict() -> None:
+    total = sum(_nbytes(entry) for entry in _CACHE.values())
+    while _CACHE and total > _MAX_BYTES:
+        dataset, entry = _CACHE.popitem(last=False)
+        total -= _nbytes(entry)
+        logging.debug(f"Evicted {dataset.name} from the dataset cache")
+
+
+def _projection(schema: pa.Schema, columns: list | None) -> list:
+    # the index columns stored by pandas are read with any projection, as in pd.read_parquet
+    if columns is None:
+        return schema.names
+    index = (schema.pandas_metadata or {}).get("index_columns", [])
+    index = [c for c in index if isinstance(c, str)]
+    return list(dict.fromkeys(list(columns) + [c for c in index if c in schema.names]))
+
+
+def dataset_table(
+    file: Path, columns: list | None = None, cache: bool = True
+) -> pa.Table:
+    """
+    Returns the latest timestamped version of a dataset as an Arrow table.
+
+    The columns are read once per run and kept in memory: each consumer gets a
+    zero-copy view on the columns it asks for, and only the columns not cached yet
+    are read from the file. The latest version is resolved on each call, so a new
+    version of the dataset (e.g. ibes_sue written earlier in the run) or a modified
+    file replaces the cached one. The least recently used datasets are evicted
+    beyond the budget set by `configure_dataset_cache`.
+
+    Args:
+        file (Path): the file path without the timestamp, e.g. download_dir / "compustat_quarterly.parquet".
+        columns (list, optional): columns to read. Defaults to None (all columns).
+        cache (bool, optional): keep the columns in memory, False for files read once such as the CRSP daily file. Defaults to True.
+
+    Returns:
+        pa.Table: the projected table, with the schema metadata of the file.
+    """
+    path = get_latest_file(file)
+    if path is None:
+        raise FileNotFoundError(f"No version of {file} found")
+
+    if not cache or _MAX_BYTES <= 0:
+        return pq.read_table(path, columns=columns, use_pandas_metadata=True)
+
+    stat = path.stat()
+    version = (path, stat.st_mtime_ns, stat.st_size)
+    entry = _CACHE.get(file)
+    if entry is None or entry["version"] != version:
+        entry = {"version": version, "schema": pq.read_schema(path), "columns": {}}
+        _CACHE[file] = entry
+    _CACHE.move_to_end(file)
+
+    names = _projection(entry["schema"], columns)
+    if missing := [c for c in names if c not in entry["columns"]]:
+        logging.info(f"Reading {len(missing)} columns of {path.name}")
+        table = pq.read_table(path, columns=missing)
+        entry["columns"].update(zip(table.column_names, table.columns))
+
+    schema = entry["schema"]
+    view = pa.Table.from_arrays(
+        [entry["columns"][c] for c in names],
+        schema=pa.schema([schema.field(c) for c in names], metadata=schema.metadata),
+    )
+    _evict()
+    return view
+
+
+def read_dataset(
+    file: Path, columns: list | None = None, cache: bool = True
+) -> pd.DataFrame:
+    """
+    Same as `pd.read_parquet(get_latest_file(file), columns=columns)`, through the
+    dataset cache (see `dataset_table`).
+
+    Args:
+        file (Path): the file path without the timestamp.
+        columns (list, optional): columns to read. Defaults to None (all columns).
+        cache (bool, optional): keep the columns in memory. Defaults to True.
+
+    Returns:
+        pd.DataFrame: the dataset, a copy that the consumer can modify.
+    """
+    return dataset_table(file, columns=columns, cache=cache).to_pandas()
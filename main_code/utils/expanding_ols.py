@@ -0,0 +1,243 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def _window_sums(a: np.ndarray, window: Optional[int]) -> np.ndarray:
+    """
+    Cumulative sums along the first axis, restricted to the last `window` rows.
+    """
+    a = a.cumsum(axis=0)
+    if window is not None:
+        a[window:] -= a[:-window].copy()
+    return a
+
+
+def _cumsum0(a: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sums along the first axis with a leading row of zeros, so that the
+    sum of rows [i, j) is a[j] - a[i].
+    """
+    return np.concatenate([np.zeros((1,) + a.shape[1:]), a.cumsum(axis=0)])
+
+
+def expanding_ols(
+    y: np.ndarray,
+    X: np.ndarray,
+    window: Optional[int] = None,
+    min_obs: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Coefficient paths of OLS regressions of y on a constant and X estimated on an
+    expanding (or rolling) window ending at each row.
+
+    The cross-products Z'Z and Z'y (Z = [1, X]) are accumulated with cumulative sums,
+    so all T regressions cost one pass over the data plus T small (k+1)x(k+1)
+    solves, instead of T refits on growing copies of the sample. The data are
+    centered on their sample means before accumulating to keep the sums accurate.
+    Rows with a missing value in X or in a given y column are left out of that
+    column's regressions.
+
+    Args:
+        y (np.ndarray): dependent variable(s), shape (T,) or (T, m).
+        X (np.ndarray): regressors without constant, shape (T,) or (T, k).
+        window (int, optional): number of rows in a rolling window. Defaults to None (expanding).
+        min_obs (int, optional): minimum number of observations for a coefficient to be reported. Defaults to k + 1.
+
+    Returns:
+        np.ndarray: coefficients [intercept, beta_1, ..., beta_k] for each row, shape
+            (T, k + 1) for a 1-d y or (T, m, k + 1) otherwise. Rows with fewer than
+            `min_obs` observations are NaN.
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    squeeze = y.ndim == 1
+    if squeeze:
+        y = y[:, None]
+    if X.ndim == 1:
+        X = X[:, None]
+    k = X.shape[1]
+    min_obs = k + 1 if min_obs is None else min_obs
+
+    x_ok = ~np.isnan(X).any(axis=1)
+    weight = (x_ok[:, None] & ~np.isnan(y)).astype(float)
+
+    x_center = X[x_ok].mean(axis=0) if x_ok.any() else np.zeros(k)
+    y_center = np.array(
+        [
+            y[weight[:, j] > 0, j].mean() if weight[:, j].any() else 0.0
+            for j in range(y.shape[1])
+        ]
+    )
+    Z = np.column_stack([np.ones(len(X)), np.nan_to_num(X - x_center)])
+    yc = np.nan_to_num(y - y_center)
+
+    # per-row cross-products, accumulated over rows
+    ZZ = _window_sums(np.einsum("tj,tp,tq->tjpq", weight, Z, Z), window)
+    Zy = _window_sums(np.einsum("tj,tp,tj->tjp", weight, Z, yc), window)
+    n_obs = _window_sums(weight, window)
+
+    coef = (np.linalg.pinv(ZZ) @ Zy[..., None])[..., 0]
+    coef[n_obs < min_obs] = np.nan
+
+    # undo the centering: a = a_c + y_center - b'x_center
+    coef[..., 0] += y_center - coef[..., 1:] @ x_center
+
+    return coef[:, 0] if squeeze else coef
+
+
+def expanding_univariate_ols(
+    y: np.ndarray,
+    X: np.ndarray,
+    window: Optional[int] = None,
+    min_obs: int = 2,
+) -> np.ndarray:
+    """
+    Coefficient paths of separate univariate regressions of y on a constant and
+    each column of X, estimated on an expanding (or rolling) window.
+
+    Each regression only uses the rows where y and its own regressor are observed.
+    The slopes follow from cumulative sums of x, y, x^2 and xy, so many predictors
+    (or many simulated samples) are handled in one vectorized pass.
+
+    Args:
+        y (np.ndarray): dependent variable, shape (T,), or one per column of X, shape (T, k).
+        X (np.ndarray): predictors, shape (T, k).
+        window (int, optional): number of rows in a rolling window. Defaults to None (expanding).
+        min_obs (int): minimum number of observations for a coefficient to be reported.
+
+    Returns:
+        np.ndarray: [intercept, slope] of each regression for each row, shape (T, k, 2).
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[:, None]
+
+    if y.ndim == 1:
+        y = y[:, None]
+
+    weight = (~np.isnan(X) & ~np.isnan(y)).astype(float)
+    n_valid = weight.sum(axis=0)
+    x_center = np.nan_to_num(X * weight).sum(axis=0) / np.maximum(n_valid, 1)
+    y_center = np.nan_to_num(y * weight).sum(axis=0) / np.maximum(n_valid, 1)
+    x = np.nan_to_num(X - x_center) * weight
+    yc = np.nan_to_num(y - y_center) * weight
+
+    n_obs = _window_sums(weight, window)
+    sx = _window_sums(x, window)
+    sy = _window_sums(yc, window)
+    sxx = _window_sums(x * x, window)
+    sxy = _window_sums(x * yc, window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = sxx - sx * sx / n_obs
+        slope = np.where(var > 0, (sxy - sx * sy / n_obs) / var, np.nan)
+        intercept = (sy - slope * sx) / n_obs
+
+    coef = np.stack([intercept + y_center - slope * x_center, slope], axis=-1)
+    coef[n_obs < min_obs] = np.nan
+
+    return coef
+
+
+def grouped_rolling_ols(
+    y: np.ndarray,
+    X: np.ndarray,
+    groups: np.ndarray,
+    times: np.ndarray,
+    window: int,
+    min_obs: Optional[int] = None,
+    chunk_rows: int = 250_000,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Rolling OLS regressions of y on a constant and X within each group (e.g. a
+    permno), on the rows whose time is in the last `window` periods, e.g. trading
+    days. A window therefore spans the same periods whatever the gaps in a group.
+
+    The rows are sorted by group and time. The cross-products Z'Z, Z'y and y'y are
+    accumulated with cumulative sums and each window is the difference of two of
+    them, found by a binary search on (group, time), so every row costs O(1) sums
+    plus a small (k+1)x(k+1) solve. The groups are processed by chunks of about
+    `chunk_rows` rows to bound the memory of the cross-products, and the data are
+    centered on their chunk means. Rows with a missing value in y or X are left
+    out of the windows.
+
+    Args:
+        y (np.ndarray): dependent variable, shape (T,).
+        X (np.ndarray): regressors without constant, shape (T,) or (T, k).
+        groups (np.ndarray): group of each row, shape (T,).
+        times (np.ndarray): integer time of each row, e.g. the position of the date in the trading calendar, shape (T,).
+        window (int): number of periods in a window, including the current one.
+        min_obs (int, optional): minimum number of observations for a coefficient to be reported. Defaults to k + 2.
+        chunk_rows (int, optional): number of rows processed at once. Defaults to 250_000.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: coefficients [intercept, beta_1, ..., beta_k], shape (T, k + 1), the
+            number of observations, shape (T,), and the residual standard deviation (with k + 1 degrees of freedom
+            removed), shape (T,). Rows with fewer than `min_obs` observations are NaN.
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[:, None]
+    groups = np.asarray(groups)
+    times = np.asarray(times, dtype=np.int64)
+    T, k = X.shape
+    min_obs = k + 2 if min_obs is None else min_obs
+
+    coef = np.full((T, k + 1), np.nan)
+    n_obs = np.zeros(T, dtype=np.int64)
+    resid_std = np.full(T, np.nan)
+    if T == 0:
+        return coef, n_obs, resid_std
+
+    # group code times a span larger than the times plus the window, plus the time
+    new_group = np.r_[True, groups[1:] != groups[:-1]]
+    span = times.max() - times.min() + window + 1
+    keys = (np.cumsum(new_group) - 1) * span + (times - times.min())
+
+    # chunks of whole groups
+    group_starts = np.flatnonzero(new_group)
+    first = np.searchsorted(group_starts, np.arange(0, T, chunk_rows), side="right")
+    bounds = np.unique(np.r_[group_starts[first - 1], T])
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        ok = ~np.isnan(y[a:b]) & ~np.isnan(X[a:b]).any(axis=1)
+        weight = ok.astype(float)
+        x_center = X[a:b][ok].mean(axis=0) if ok.any() else np.zeros(k)
+        y_center = y[a:b][ok].mean() if ok.any() else 0.0
+        # the constant is the weight, so that Z'Z[0, 0] counts the observations
+        Z = np.column_stack(
+            [weight, np.nan_to_num(X[a:b] - x_center) * weight[:, None]]
+        )
+        yc = np.nan_to_num(y[a:b] - y_center) * weight
+
+        ZZ = _cumsum0(np.einsum("tp,tq->tpq", Z, Z))
+        Zy = _cumsum0(Z * yc[:, None])
+        yy = _cumsum0(yc * yc)
+
+        # first row of each window
+        start = np.searchsorted(keys[a:b], keys[a:b] - window, side="right")
+        end = np.arange(1, b - a + 1)
+        wZZ = ZZ[end] - ZZ[start]
+        wZy = Zy[end] - Zy[start]
+        n = np.rint(wZZ[:, 0, 0]).astype(np.int64)
+
+        valid = (n >= min_obs) & (n > k + 1)
+        c = np.full((b - a, k + 1), np.nan)
+        try:
+            c[valid] = np.linalg.solve(wZZ[valid], wZy[valid][..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            # a singular window (e.g. a constant regressor), much slower
+            c[valid] = (np.linalg.pinv(wZZ[valid]) @ wZy[valid][..., None])[..., 0]
+        ssr = yy[end] - yy[start] - np.einsum("tp,tp->t", c, wZy)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s = np.sqrt(np.maximum(ssr, 0) / (n - k - 1))
+
+        # undo the centering: a = a_c + y_center - b'x_center
+        c[:, 0] += y_center - c[:, 1:] @ x_center
+        coef[a:b] = c
+        n_obs[a:b] = n
+        resid_std[a:b] = s
+
+    return coef, n_obs, resid_std
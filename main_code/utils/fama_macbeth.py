@@ -0,0 +1,163 @@
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .hdfe import parse_model
+from .panel_ols_reg import PREFIX_MAP
+
+
+def newey_west_se(coefs: np.ndarray, lags: Optional[int] = None) -> np.ndarray:
+    """
+    Newey-West standard errors of the means of the columns of a time series, with
+    the (T - 1) small-sample divisor of the usual Fama-MacBeth standard errors.
+
+    Args:
+        coefs (np.ndarray): time series, shape (T, k).
+        lags (int, optional): number of lags with Bartlett weights. Defaults to floor(4 (T / 100)^(2/9)).
+
+    Returns:
+        np.ndarray: standard errors, shape (k,).
+    """
+    T = len(coefs)
+    if lags is None:
+        lags = int(np.floor(4 * (T / 100) ** (2 / 9)))
+    e = coefs - coefs.mean(axis=0)
+    S = e.T @ e / T
+    for j in range(1, min(lags, T - 1) + 1):
+        gamma = e[j:].T @ e[:-j] / T
+        S += (1 - j / (lags + 1)) * (gamma + gamma.T)
+    return np.sqrt(np.diag(S) / (T - 1))
+
+
+def cross_sectional_ols(
+    y: np.ndarray, X: np.ndarray, dates: np.ndarray
+) -> tuple:
+    """
+    One OLS regression of y on a constant and X per date, for all dates at once.
+
+    The data are demeaned by date and the per-date cross-products X'X and X'y are
+    accumulated with one bincount per entry, so the T normal equations are built
+    in a few passes over the panel and solved as a single batch.
+
+    Args:
+        y (np.ndarray): dependent variable, shape (n,), without missing values.
+        X (np.ndarray): regressors, shape (n, k), without missing values.
+        dates (np.ndarray): integer date codes in 0..T-1, shape (n,).
+
+    Returns:
+        tuple: coefficients [intercept, slopes] (T, k + 1), R-squared (T,) and number
+            of observations (T,) per date; dates with too few observations or
+            collinear regressors have NaN coefficients.
+    """
+    n_dates = dates.max() + 1
+    k = X.shape[1]
+    counts = np.bincount(dates, minlength=n_dates)
+    safe = np.maximum(counts, 1)
+
+    y_bar = np.bincount(dates, weights=y, minlength=n_dates) / safe
+    X_bar = np.column_stack(
+        [np.bincount(dates, weights=X[:, a], minlength=n_dates) for a in range(k)]
+    ) / safe[:, None]
+    yd = y - y_bar[dates]
+    Xd = X - X_bar[dates]
+
+    XX = np.empty((n_dates, k, k))
+    for a in range(k):
+        for b in range(a, k):
+            XX[:, a, b] = XX[:, b, a] = np.bincount(
+                dates, weights=Xd[:, a] * Xd[:, b], minlength=n_dates
+            )
+    Xy = np.column_stack(
+        [np.bincount(dates, weights=Xd[:, a] * yd, minlength=n_dates) for a in range(k)]
+    )
+    yy = np.bincount(dates, weights=yd**2, minlength=n_dates)
+
+    # dates with enough observations and regressors that vary in the cross-section
+    valid = counts >= k + 1
+    scale = np.sqrt(np.einsum("tii->ti", XX))
+    valid &= (scale > 0).all(axis=1)
+    scaled = XX[valid] / (scale[valid, :, None] * scale[valid, None, :])
+    valid[valid] = np.linalg.cond(scaled) < 1e12
+
+    slopes = np.full((n_dates, k), np.nan)
+    slopes[valid] = np.linalg.solve(XX[valid], Xy[valid][..., None])[..., 0]
+    intercept = y_bar - (X_bar * slopes).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsquared = (Xy * slopes).sum(axis=1) / yy
+
+    return np.column_stack([intercept, slopes]), rsquared, counts
+
+
+def fama_macbeth(
+    df: pd.DataFrame,
+    model: str,
+    time: str = "date",
+    lags: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Fama-MacBeth regression: one cross-sectional OLS per date (with a constant),
+    averaged over dates, with Newey-West standard errors on the time series of
+    coefficients.
+
+    The output has the format of `panel_ols` and `hdfe_ols` and can be passed to
+    `regression_table`. The R-squared is the average cross-sectional R-squared.
+
+    Args:
+        df (pd.DataFrame): panel data.
+        model (str): formula without effects, e.g. "ret_rf ~ ea + ln_mcap".
+        time (str, optional): date column. Defaults to "date".
+        lags (int, optional): Newey-West lags. Defaults to floor(4 (T / 100)^(2/9)).
+
+    Returns:
+        pd.DataFrame: coefficients, t-stats, standard errors, p-values, average
+            R-squared, number of observations and of dates, and fe ("N").
+    """
+    logging.info(f"Estimating Fama-MacBeth model {model}...")
+    dep, regressors, effects = parse_model(model)
+    if effects:
+        raise ValueError("Fama-MacBeth regressions do not absorb effects")
+
+    y = df[dep].to_numpy(dtype=float)
+    X = df[regressors].to_numpy(dtype=float)
+    sample = ~np.isnan(y) & ~np.isnan(X).any(axis=1)
+    dates = pd.factorize(df[time].to_numpy()[sample], sort=True)[0]
+
+    coefs, rsquared, counts = cross_sectional_ols(y[sample], X[sample], dates)
+    valid = ~np.isnan(coefs).any(axis=1)
+    coefs = coefs[valid]
+    n_dates = len(coefs)
+
+    params = coefs.mean(axis=0)
+    bse = newey_west_se(coefs, lags)
+    tstats = params / bse
+    pvalues = 2 * stats.t.sf(np.abs(tstats), n_dates - 1)
+
+    names = ["Intercept"] + [PREFIX_MAP[v] for v in regressors]
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    f"{name}_coef": params[i],
+                    f"{name}_tstat": tstats[i],
+                    f"{name}_bse": bse[i],
+                    f"{name}_pval": pvalues[i],
+                },
+                index=[0],
+            ).T
+            for i, name in enumerate(names)
+        ]
+        + [
+            pd.DataFrame(
+                {
+                    "rsquared": rsquared[valid].mean(),
+                    "nobs": counts[valid].sum(),
+                    "ndates": n_dates,
+                    "fe": "N",
+                },
+                index=[0],
+            ).T
+        ]
+    )
@@ -1,3 +1,4 @@
+import hashlib
 from datetime import UTC, datetime
 from pathlib import Path
 
@@ -36,3 +37,24 @@ def get_latest_file(
 def timestamp_file(file: Path) -> Path:
     ts = datetime.now(tz=UTC).strftime("%Y%m%d_%H%M%S")
     return file.with_name(f"{file.stem}_{ts}{file.suffix}")
+
+
+def hash_files(*files: Path) -> str:
+    """
+    Returns a SHA-256 digest of the contents of the files, used to detect when the
+    inputs of a cached artifact change. Re-downloading identical data under a new
+    timestamp gives the same digest.
+
+    Args:
+        files (Path): The files to hash, in a fixed order.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.stat().st_size).encode())
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
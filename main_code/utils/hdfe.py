@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .panel_ols_reg import PREFIX_MAP
+
+EFFECTS = {"EntityEffects": 0, "TimeEffects": 1}
+
+
+def build_design(
+    df: pd.DataFrame,
+    variables=None,
+    entity: Optional[str] = None,
+    time: Optional[str] = None,
+) -> dict:
+    """
+    Builds the regression design once: the variables as float arrays and integer
+    codes of the entity and time IDs.
+
+    Specifications run on the design share it, and the demeaned variables are
+    cached in it by sample and absorbed effects (see `hdfe_ols`). Variables can be
+    added to `design["data"]` after the design is built.
+
+    Args:
+        df (pd.DataFrame): panel data.
+        variables (list, optional): columns to keep. Defaults to all columns.
+        entity (str, optional): entity column. Defaults to the first index level.
+        time (str, optional): time column. Defaults to the second index level.
+
+    Returns:
+        dict: the design
+    """
+    variables = list(df.columns) if variables is None else list(variables)
+    entity_ids = df.index.get_level_values(0) if entity is None else df[entity]
+    time_ids = df.index.get_level_values(1) if time is None else df[time]
+    return {
+        "data": {v: df[v].to_numpy(dtype=float) for v in variables},
+        "groups": [pd.factorize(entity_ids)[0], pd.factorize(time_ids)[0]],
+        "demeaned": {},
+    }
+
+
+def demean(
+    X: np.ndarray, groups: list, tol: float = 1e-8, max_iter: int = 1000
+) -> np.ndarray:
+    """
+    Removes the group means of several sets of fixed effects from the columns of X
+    by alternating projections: the means of each grouping are subtracted in turn
+    until the columns stop changing. A single grouping converges in one pass.
+
+    Args:
+        X (np.ndarray): data, shape (n, k).
+        groups (list): integer group codes for each set of effects, each of shape (n,).
+        tol (float, optional): convergence tolerance relative to the scale of each column. Defaults to 1e-8.
+        max_iter (int, optional): maximum number of sweeps. Defaults to 1000.
+
+    Returns:
+        np.ndarray: the demeaned data.
+    """
+    X = np.array(X, dtype=float)
+    if not groups:
+        return X
+
+    counts = [np.bincount(g) for g in groups]
+    scale = np.maximum(np.abs(X).max(axis=0), 1e-300)
+    for _ in range(max_iter):
+        change = np.zeros(X.shape[1])
+        for g, n in zip(groups, counts):
+            for j in range(X.shape[1]):
+                means = np.bincount(g, weights=X[:, j], minlength=len(n)) / n
+                X[:, j] -= means[g]
+                change[j] = max(change[j], np.abs(means).max())
+        if len(groups) == 1 or (change / scale).max() < tol:
+            break
+    else:
+        logging.warning(
+            f"Alternating projections did not converge in {max_iter} sweeps"
+        )
+
+    return X
+
+
+def cluster_scores(scores: np.ndarray, clusters: np.ndarray) -> np.ndarray:
+    """
+    Meat of the cluster-robust covariance: sums the scores within each cluster
+    (one bincount per column) and returns the sum of their outer products.
+    """
+    codes = pd.factorize(clusters)[0]
+    summed = np.column_stack(
+        [np.bincount(codes, weights=scores[:, j]) for j in range(scores.shape[1])]
+    )
+    return summed.T @ summed
+
+
+def parse_model(model: str) -> tuple:
+    """
+    Splits a `panel_ols` formula such as "y ~ x1 + x2 + EntityEffects" into the
+    dependent variable, the regressors and the absorbed effects.
+    """
+    dep, rhs = [s.strip() for s in model.split("~")]
+    terms = [t.strip() for t in re.split(r"\+", rhs) if t.strip()]
+    effects = tuple(t for t in terms if t in EFFECTS)
+    regressors = [t for t in terms if t not in EFFECTS]
+    return dep, regressors, effects
+
+
+def hdfe_ols(design: dict, model: str) -> pd.DataFrame:
+    """
+    Estimates a `panel_ols` model on a design from `build_design`, absorbing the
+    entity and/or time effects by alternating projections and clustering the
+    standard errors by entity and time.
+
+    The output matches `panel_ols` (linearmodels PanelOLS with two-way clustered
+    standard errors, debiased). Demeaned variables are cached in the design by
+    sample and effects, so specifications on the same sample reuse them.
+
+    Args:
+        design (dict): output of `build_design`.
+        model (str): formula, e.g. "ret_rf ~ ea + mkt_rf + EntityEffects".
+
+    Returns:
+        pd.DataFrame: coefficients, t-stats, standard errors, p-values, R-squared,
+            number of observations and whether effects are included.
+    """
+    logging.info(f"Estimating model {model}...")
+    dep, regressors, effects = parse_model(model)
+
+    data = design["data"]
+    sample = np.ones(len(data[dep]), dtype=bool)
+    for v in [dep] + regressors:
+        sample &= ~np.isnan(data[v])
+    sample_key = hashlib.sha1(np.packbits(sample).tobytes()).hexdigest()
+
+    groups = [design["groups"][EFFECTS[e]][sample] for e in effects]
+    groups = [pd.factorize(g)[0] for g in groups]
+
+    cache = design["demeaned"]
+    missing = [
+        v for v in [dep] + regressors if (sample_key, effects, v) not in cache
+    ]
+    if missing:
+        demeaned = demean(
+            np.column_stack([data[v][sample] for v in missing]), groups
+        )
+        for j, v in enumerate(missing):
+            cache[(sample_key, effects, v)] = demeaned[:, j]
+
+    y = cache[(sample_key, effects, dep)]
+    X = np.column_stack([cache[(sample_key, effects, v)] for v in regressors])
+    nobs, nvar = X.shape
+
+    params = np.linalg.lstsq(X, y, rcond=None)[0]
+    eps = y - X @ params
+
+    # two-way clustered covariance (Cameron, Gelbach and Miller, 2011)
+    entity = design["groups"][0][sample]
+    time = design["groups"][1][sample]
+    xe = X * eps[:, None]
+    meat = (
+        cluster_scores(xe, entity)
+        + cluster_scores(xe, time)
+        - cluster_scores(xe, entity.astype(np.int64) * (time.max() + 1) + time)
+    )
+    # degrees of freedom used by the effects (no constant, so only the second set
+    # drops a level)
+    extra_df = sum(g.max() + 1 for g in groups) - max(len(groups) - 1, 0)
+    xpxi = np.linalg.inv(X.T @ X)
+    cov = xpxi @ meat @ xpxi * nobs / (nobs - nvar - extra_df)
+    cov = (cov + cov.T) / 2
+
+    bse = np.sqrt(np.diag(cov))
+    tstats = params / bse
+    pvalues = 2 * stats.t.sf(np.abs(tstats), nobs - nvar - extra_df)
+    rsquared = 1 - (eps @ eps) / (y @ y)
+
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    f"{PREFIX_MAP[param]}_coef": params[i],
+                    f"{PREFIX_MAP[param]}_tstat": tstats[i],
+                    f"{PREFIX_MAP[param]}_bse": bse[i],
+                    f"{PREFIX_MAP[param]}_pval": pvalues[i],
+                },
+                index=[0],
+            ).T
+            for i, param in enumerate(regressors)
+        ]
+        + [
+            pd.DataFrame(
+                {
+                    "rsquared": rsquared,
+                    "nobs": nobs,
+                    "fe": "Y" if effects else "N",
+                },
+                index=[0],
+            ).T
+        ]
+    )
@@ -0,0 +1,107 @@
+from typing import Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+def _key_index(df: pd.DataFrame, on: list) -> pd.Index:
+    if len(on) == 1:
+        return pd.Index(df[on[0]])
+    return pd.MultiIndex.from_frame(df[on])
+
+
+def interval_join(
+    left: pd.DataFrame,
+    right: pd.DataFrame,
+    on: Union[str, Iterable[str]],
+    point: str,
+    start: str,
+    end: str,
+    suffixes: Tuple[str, str] = ("_x", "_y"),
+) -> pd.DataFrame:
+    """
+    Join each row of `left` to the rows of `right` sharing the same key whose
+    validity interval [start, end] contains the `point` date of the left row.
+
+    This returns the same rows, in the same order, as
+    `left.merge(right, on=on)` followed by `point.between(start, end)`, but it
+    never materializes the unfiltered merge. Intervals are sorted once by
+    (key, start) and every point locates its candidate intervals with two
+    binary searches, so the work is proportional to the number of matches.
+
+    Args:
+        left (pd.DataFrame): rows to link, e.g. the CRSP daily file.
+        right (pd.DataFrame): interval table, e.g. the CCM link table.
+        on (str | Iterable[str]): key column(s) present in both frames.
+        point (str): date column in `left`.
+        start (str): first valid date column in `right` (inclusive).
+        end (str): last valid date column in `right` (inclusive).
+        suffixes (Tuple[str, str]): suffixes applied to overlapping non-key columns.
+
+    Returns:
+        pd.DataFrame: matched rows with a fresh RangeIndex.
+    """
+    on = [on] if isinstance(on, str) else list(on)
+
+    # intervals with a missing bound never satisfy the between() filter
+    right = right[right[start].notna() & right[end].notna()]
+
+    # integer-code the keys; left keys missing from right get code -1
+    uniq_keys = _key_index(right, on).unique()
+    right_code = uniq_keys.get_indexer(_key_index(right, on)).astype(np.int64)
+    left_code = uniq_keys.get_indexer(_key_index(left, on)).astype(np.int64)
+
+    # rank all dates against the sorted interval bounds
+    starts = right[start].to_numpy()
+    ends = right[end].to_numpy()
+    bounds = np.unique(np.concatenate([starts, ends]))
+    n_bounds = len(bounds) + 1
+    start_rank = np.searchsorted(bounds, starts, side="left")
+    end_rank = np.searchsorted(bounds, ends, side="left")
+
+    points = left[point].to_numpy()
+    valid = (left_code >= 0) & left[point].notna().to_numpy()
+    # start <= point  <=>  start_rank < point_right
+    # end >= point    <=>  end_rank >= point_left
+    point_left = np.searchsorted(bounds, points, side="left")
+    point_right = np.searchsorted(bounds, points, side="right")
+
+    # sort intervals by (key, start); offsetting each key block by
+    # code * n_bounds turns per-key searches into global ones
+    order = np.lexsort((start_rank, right_code))
+    block = right_code[order] * n_bounds
+    sorted_start = block + start_rank[order]
+    sorted_end = block + end_rank[order]
+    # running max of the end within each key block (blocks never overlap)
+    max_end = np.maximum.accumulate(sorted_end)
+
+    point_block = left_code * n_bounds
+    # last candidate: the last interval of the key starting on or before the point
+    hi = np.searchsorted(sorted_start, point_block + point_right, side="left")
+    # first candidate: the first interval whose running max end reaches the point
+    lo = np.searchsorted(max_end, point_block + point_left, side="left")
+    counts = np.where(valid, np.maximum(hi - lo, 0), 0)
+
+    # expand (point, candidate interval) pairs and keep those containing the point
+    left_idx = np.repeat(np.arange(len(left)), counts)
+    first = np.repeat(lo, counts)
+    offset = np.arange(len(left_idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cand = first + offset
+    keep = sorted_end[cand] >= point_block[left_idx] + point_left[left_idx]
+    left_idx = left_idx[keep]
+    right_idx = order[cand[keep]]
+
+    # match the row order of merge: left order, then right order within a left row
+    pairs = np.lexsort((right_idx, left_idx))
+    left_idx = left_idx[pairs]
+    right_idx = right_idx[pairs]
+
+    out_left = left.iloc[left_idx].reset_index(drop=True)
+    out_right = right.drop(columns=on).iloc[right_idx].reset_index(drop=True)
+
+    overlap = out_left.columns.intersection(out_right.columns)
+    if len(overlap):
+        out_left = out_left.rename(columns={c: f"{c}{suffixes[0]}" for c in overlap})
+        out_right = out_right.rename(columns={c: f"{c}{suffixes[1]}" for c in overlap})
+
+    return pd.concat([out_left, out_right], axis=1)
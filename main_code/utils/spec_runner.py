@@ -0,0 +1,218 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .hdfe import hdfe_ols
+from .panel_ols_reg import ols_reg
+
+# bump to invalidate cached results when the estimators change
+CACHE_VERSION = 1
+
+
+def spec_grid(
+    deps,
+    regressors,
+    effects=((),),
+    samples=(None,),
+    estimator: str = "panel",
+) -> list:
+    """
+    Specifications for every combination of dependent variable, set of regressors,
+    absorbed effects and sample filter.
+
+    Args:
+        deps (list): dependent variables.
+        regressors (list): sets of regressors, e.g. [["ea"], ["ea", "mkt_rf"]].
+        effects (list, optional): sets of absorbed effects, e.g. [(), ("EntityEffects",)]. Defaults to no effects.
+        samples (list, optional): boolean sample columns, None for the full sample. Defaults to (None,).
+        estimator (str, optional): "panel" (`hdfe_ols`) or "ols" (`ols_reg`). Defaults to "panel".
+
+    Returns:
+        list: specifications, to be run with `run_specs`
+    """
+    return [
+        {
+            "dep": dep,
+            "regressors": list(regs),
+            "effects": tuple(fe),
+            "sample": sample,
+            "estimator": estimator,
+        }
+        for dep, regs, fe, sample in itertools.product(
+            deps, regressors, effects, samples
+        )
+    ]
+
+
+def _formula(spec: dict) -> str:
+    if spec["estimator"] == "ols":
+        return f"{spec['dep']}~1+{'+'.join(spec['regressors'])}"
+    return " + ".join(
+        [f"{spec['dep']} ~ {spec['regressors'][0]}"]
+        + spec["regressors"][1:]
+        + list(spec["effects"])
+    )
+
+
+def _columns(spec: dict) -> list:
+    """
+    Columns used by a specification, including the sample filter and group IDs.
+    """
+    columns = [spec["dep"]] + spec["regressors"]
+    columns += [spec["sample"]] if spec["sample"] is not None else []
+    columns += ["_entity", "_time"] if spec["estimator"] == "panel" else []
+    return columns
+
+
+def _hash_array(a: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(a).view(np.uint8)).hexdigest()
+
+
+def _run_group(args: tuple) -> list:
+    """
+    Runs specifications that share an estimator, sample filter and effects on
+    memory-mapped columns, so that panel specifications reuse the demeaned data.
+    """
+    specs, paths = args
+    arrays = {v: np.load(p, mmap_mode="r") for v, p in paths.items()}
+
+    sample = specs[0]["sample"]
+    mask = None if sample is None else arrays[sample]
+    variables = list(
+        dict.fromkeys(v for s in specs for v in [s["dep"]] + s["regressors"])
+    )
+
+    if specs[0]["estimator"] == "ols":
+        df = pd.DataFrame(
+            {v: arrays[v] if mask is None else arrays[v][mask] for v in variables}
+        )
+        return [ols_reg(df, _formula(s)) for s in specs]
+
+    design = {
+        "data": {
+            v: arrays[v] if mask is None else np.where(mask, arrays[v], np.nan)
+            for v in variables
+        },
+        "groups": [arrays["_entity"], arrays["_time"]],
+        "demeaned": {},
+    }
+    return [hdfe_ols(design, _formula(s)) for s in specs]
+
+
+def run_specs(
+    data,
+    specs: list,
+    entity: Optional[str] = None,
+    time: Optional[str] = None,
+    cache_dir: Optional[Path] = None,
+    workers: int = -1,
+) -> list:
+    """
+    Runs a batch of regression specifications on shared data.
+
+    The columns used by the specifications are converted once and written to .npy
+    files in a temporary directory, which the workers of a process pool open as
+    read-only memory maps instead of receiving copies of the data.
+    Specifications sharing an estimator, sample filter and effects run in the same
+    worker so that `hdfe_ols` demeans each variable once. With a `cache_dir`, the
+    results are stored under a key built from the specification and the hashes of
+    the columns it uses: re-running a table after changing one column only refits
+    the specifications that use it. Only the results are kept in `cache_dir`, the
+    column files are removed when the batch is done.
+
+    Args:
+        data (pd.DataFrame or dict): columns by name.
+        specs (list): specifications from `spec_grid`, dicts with the keys dep,
+            regressors and optionally effects, sample (boolean column) and estimator.
+        entity (str, optional): entity column, required by "panel" specifications.
+        time (str, optional): time column, required by "panel" specifications.
+        cache_dir (Path, optional): directory of the cached results. Defaults to None (no result caching).
+        workers (int, optional): number of processes, -1 uses all cores. Defaults to -1.
+
+    Returns:
+        list: one output of `hdfe_ols` or `ols_reg` per specification
+    """
+    specs = [
+        {"effects": (), "sample": None, "estimator": "panel", **s} for s in specs
+    ]
+    for s in specs:
+        s["effects"] = tuple(s["effects"])
+
+    # convert and hash every column once
+    arrays = {}
+    for s in specs:
+        for v in [s["dep"]] + s["regressors"]:
+            if v not in arrays:
+                arrays[v] = np.asarray(data[v], dtype=float)
+        if s["sample"] is not None and s["sample"] not in arrays:
+            arrays[s["sample"]] = np.asarray(data[s["sample"]], dtype=bool)
+    if any(s["estimator"] == "panel" for s in specs):
+        arrays["_entity"] = pd.factorize(data[entity])[0]
+        arrays["_time"] = pd.factorize(data[time])[0]
+    hashes = {v: _hash_array(a) for v, a in arrays.items()}
+
+    keys = []
+    for s in specs:
+        keys.append(
+            hashlib.sha1(
+                json.dumps(
+                    [CACHE_VERSION, s, {v: hashes[v] for v in _columns(s)}],
+                    sort_keys=True,
+                ).encode()
+            ).hexdigest()
+        )
+
+    results_dir = None
+    if cache_dir is not None:
+        results_dir = Path(cache_dir) / "results"
+        results_dir.mkdir(parents=True, exist_ok=True)
+
+    results = [None] * len(specs)
+    pending = {}
+    for i, (s, key) in enumerate(zip(specs, keys)):
+        if results_dir is not None and (results_dir / f"{key}.pkl").exists():
+            results[i] = pd.read_pickle(results_dir / f"{key}.pkl")
+        else:
+            group = (s["estimator"], s["sample"], s["effects"])
+            pending.setdefault(group, []).append(i)
+    logging.info(
+        f"Running {sum(map(len, pending.values()))} of {len(specs)} specifications..."
+    )
+
+    if not pending:
+        return results
+
+    with tempfile.TemporaryDirectory() as columns_dir:
+        # write the columns used by the pending specifications
+        groups = []
+        for idx in pending.values():
+            paths = {}
+            for v in dict.fromkeys(v for i in idx for v in _columns(specs[i])):
+                path = Path(columns_dir) / f"{hashes[v]}.npy"
+                if not path.exists():
+                    np.save(path, arrays[v])
+                paths[v] = str(path)
+            groups.append(([specs[i] for i in idx], paths))
+        workers = os.cpu_count() if workers == -1 else workers
+        if workers == 1 or len(groups) <= 1:
+            outputs = list(map(_run_group, groups))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+                outputs = list(pool.map(_run_group, groups))
+
+    for idx, output in zip(pending.values(), outputs):
+        for i, res in zip(idx, output):
+            results[i] = res
+            if results_dir is not None:
+                res.to_pickle(results_dir / f"{keys[i]}.pkl")
+
+    return results
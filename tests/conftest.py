@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+VERSION = "_20240101_000000.parquet"
+
+
+@pytest.fixture
+def caches(tmp_path):
+    # small versions of the download and preprocess caches read by build_panel
+    rng = np.random.default_rng(0)
+    n_permnos = 20
+    permnos = range(1, n_permnos + 1)
+    gvkeys = [f"{p:06d}" for p in permnos]
+    dates = pd.bdate_range("1983-06-01", "1985-12-31")
+
+    crsp = pd.DataFrame(
+        [(p, t) for p in permnos for t in dates], columns=["permno", "date"]
+    )
+    n = len(crsp)
+    crsp["ret"] = rng.normal(0, 0.02, n)
+    crsp.loc[rng.random(n) < 0.02, "ret"] = np.nan
+    crsp["prc"] = rng.uniform(5, 50, n)
+    crsp["openprc"] = crsp["prc"] * (1 + rng.normal(0, 0.01, n))
+    crsp["shrout"] = rng.uniform(1e3, 1e5, n)
+    crsp["ncusip"] = "x"
+    crsp.to_parquet(tmp_path / f"crsp_daily{VERSION}", index=False)
+
+    # some links end during the sample
+    pd.DataFrame(
+        {
+            "gvkey": gvkeys,
+            "lpermno": list(permnos),
+            "linkdt": pd.Timestamp("1970-01-01"),
+            "linkenddt": [
+                pd.NaT if p % 3 else pd.Timestamp("1984-06-30") for p in permnos
+            ],
+        }
+    ).to_parquet(tmp_path / f"crsp_compu_link_table{VERSION}", index=False)
+
+    quarters = pd.date_range("1981-03-31", "1985-12-31", freq="QE")
+    compu = pd.DataFrame(
+        [(g, q) for g in gvkeys for q in quarters], columns=["gvkey", "datadate"]
+    )
+    for item in ["prccq", "cshprq", "dlcq", "dlttq", "pstkq", "txditcq", "atq"]:
+        compu[item] = rng.uniform(1, 100, len(compu))
+    compu.loc[rng.random(len(compu)) < 0.1, "dlcq"] = np.nan
+    compu["rdq"] = compu["datadate"] + pd.Timedelta(days=45)
+    compu.loc[rng.random(len(compu)) < 0.2, "rdq"] = pd.NaT
+    compu.to_parquet(tmp_path / f"compustat_quarterly{VERSION}", index=False)
+
+    pd.DataFrame(
+        {"date": dates, "mkt_rf": rng.normal(0, 0.01, len(dates)), "rf": 0.0001}
+    ).to_parquet(tmp_path / f"ff5_daily{VERSION}", index=False)
+
+    me = crsp["prc"] * crsp["shrout"] * 1000
+    size = pd.DataFrame({"date": pd.date_range("1982-01-31", "1985-12-31", freq="ME")})
+    for i, q in zip([4, 8, 12, 16], [0.2, 0.4, 0.6, 0.8]):
+        size[f"size_bp{i}"] = np.quantile(me, q)
+    size.to_parquet(tmp_path / f"ff_size_breakpoints{VERSION}", index=False)
+
+    bm = pd.DataFrame({"date": pd.date_range("1980-06-30", "1985-06-30", freq="12ME")})
+    for i, q in zip([4, 8, 12, 16], [0.2, 0.5, 1, 2]):
+        bm[f"bm_bp{i}"] = q
+    bm.to_parquet(tmp_path / f"ff_bm_breakpoints{VERSION}", index=False)
+
+    portfolios = pd.DataFrame({"date": dates})
+    for i in range(1, 6):
+        for j in range(1, 6):
+            portfolios[f"ff_size{i}_bm{j}"] = rng.normal(0, 0.01, len(dates))
+    portfolios.to_parquet(
+        tmp_path / f"ff_25_size_bm_portfolios_daily{VERSION}", index=False
+    )
+
+    n_ea = 300
+    sue = pd.DataFrame(
+        {
+            "permno": rng.integers(1, n_permnos + 1, n_ea),
+            # announcements on weekends and after the close
+            "datetime": pd.Timestamp("1983-01-01")
+            + pd.to_timedelta(rng.integers(0, 1000, n_ea), "D")
+            + pd.to_timedelta(rng.integers(0, 24, n_ea), "h"),
+            "sue": rng.normal(size=n_ea),
+            "numest": rng.integers(1, 10, n_ea),
+        }
+    )
+    sue.to_parquet(tmp_path / f"ibes_sue{VERSION}", index=False)
+    return tmp_path
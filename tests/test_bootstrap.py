@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.tables.oos_exmkt_vrp import (
+    bootstrap_exmkt_oos,
+    compute_exmkt_oos_r2,
+    get_individual_predictor_oos_forecast,
+)
+
+
+@pytest.fixture
+def exmkt_data():
+    # monthly returns from 1970, the predictor only from 1990 as the VRP
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("1970-01-31", "2023-12-31", freq="ME")
+    n = len(dates)
+    vrp = pd.Series(rng.normal(size=n)).where(dates >= "1990-01-31")
+    df = pd.DataFrame(
+        {"date": dates, "vrp": vrp, "exmkt": rng.normal(0.005, 0.04, n)}
+    )
+    for h in [1, 3, 6, 12]:
+        df[f"exmkt_h{h}"] = (
+            df["exmkt"].rolling(h).sum().shift(-h) + 0.002 * h * df["vrp"].fillna(0)
+        )
+        df[f"hist_exmkt_h{h}"] = df[f"exmkt_h{h}"].expanding().mean().shift()
+    return df
+
+
+def test_bootstrap_oos_r2_matches_published_benchmark(exmkt_data, tmp_path):
+    # the observed OOS R-squared of the bootstrap is the one of the OOS table
+    vrp_oos = {
+        h: get_individual_predictor_oos_forecast(
+            df=exmkt_data,
+            dep_var=f"exmkt_h{h}",
+            indep_var="vrp",
+            horizon=str(h),
+        )
+        for h in [1, 3, 6, 12]
+    }
+    expected = compute_exmkt_oos_r2(vrp_oos, exmkt_data)["oos_r2"]
+
+    boot = bootstrap_exmkt_oos(exmkt_data, "vrp", tmp_path, "boot", n_boot=20)
+
+    np.testing.assert_allclose(
+        boot.loc["OOS $R^2$"].to_numpy(dtype=float), expected.to_numpy(), rtol=1e-8
+    )
+    assert (tmp_path / "boot.tex").exists()
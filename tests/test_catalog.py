@@ -0,0 +1,32 @@
+import pandas as pd
+
+from main_code.utils.catalog import open_catalog
+
+
+def test_views_read_the_latest_version_only(tmp_path):
+    clean = tmp_path / "clean"
+    clean.mkdir()
+    # an unreadable old version and a column dropped in the latest one
+    (clean / "panel_data_20230101_000000.parquet").write_text("corrupted")
+    pd.DataFrame({"a": [1, 2], "b": ["x", "y"]}).to_parquet(
+        clean / "panel_data_20240101_000000.parquet"
+    )
+    pd.DataFrame({"a": [1.5]}).to_parquet(clean / "panel_data_20250101_000000.parquet")
+    pd.DataFrame({"k": [1]}).to_parquet(clean / "event_earnings_data.parquet")
+
+    database = tmp_path / "catalog.duckdb"
+    con = open_catalog(tmp_path, database)
+    panel = con.execute("SELECT * FROM panel_data").df()
+    pd.testing.assert_frame_equal(panel, pd.DataFrame({"a": [1.5]}))
+    con.execute("CREATE VIEW my_panel AS SELECT a FROM panel_data")
+    con.close()
+
+    # a new version and a removed dataset are seen when the catalog is reopened
+    pd.DataFrame({"a": [9.0]}).to_parquet(clean / "panel_data_20260101_000000.parquet")
+    (clean / "event_earnings_data.parquet").unlink()
+    con = open_catalog(tmp_path, database)
+    assert con.execute("SELECT a FROM panel_data").fetchall() == [(9.0,)]
+    views = con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal")
+    # the user view is kept
+    assert sorted(views.fetchall()) == [("my_panel",), ("panel_data",)]
+    con.close()
@@ -0,0 +1,155 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.data import characteristics
+from main_code.data.characteristics import (
+    characteristics_table,
+    compute_characteristics,
+)
+
+ITEMS = [
+    "prccq", "cshoq", "cshprq", "pstkq", "seqq", "ceqq", "atq", "ltq", "txditcq",
+    "dlcq", "dlttq", "revtq", "cogsq", "xsgaq", "xintq", "ibq", "actq", "cheq",
+    "lctq", "txpq", "dpq", "epspxq", "ajexq",
+]  # fmt: skip
+
+
+def compustat(rows: list) -> pd.DataFrame:
+    # quarterly Compustat rows, every item 1.0 unless given
+    compu = pd.DataFrame([{**dict.fromkeys(ITEMS, 1.0), **row} for row in rows])
+    compu["datadate"] = pd.to_datetime(compu["datadate"])
+    return compu
+
+
+def test_book_equity_fallback_chain():
+    nan = np.nan
+    compu = compustat(
+        [
+            # stockholders' equity
+            {"gvkey": "1", "datadate": "2020-03-31", "seqq": 10.0, "pstkq": 2.0},
+            # common equity plus preferred stock, no deferred taxes
+            {
+                "gvkey": "2",
+                "datadate": "2020-03-31",
+                "seqq": nan,
+                "ceqq": 8.0,
+                "pstkq": 2.0,
+                "txditcq": nan,
+            },
+            # assets minus liabilities, no preferred stock
+            {
+                "gvkey": "3",
+                "datadate": "2020-03-31",
+                "seqq": nan,
+                "ceqq": nan,
+                "atq": 30.0,
+                "ltq": 20.0,
+                "pstkq": nan,
+            },
+            # no book equity
+            {
+                "gvkey": "4",
+                "datadate": "2020-03-31",
+                "seqq": nan,
+                "ceqq": nan,
+                "ltq": nan,
+            },
+        ]
+    )
+
+    be = compute_characteristics(compu, "quarterly", ["be"])["be"]
+
+    np.testing.assert_allclose(be, [10 + 1 - 2, 8 + 2 - 2, 30 - 20 + 1, nan])
+
+
+def test_lags_use_the_same_gvkey_and_fiscal_period():
+    compu = compustat(
+        [
+            {"gvkey": "1", "datadate": "2020-03-31", "atq": 100.0, "seqq": 10.0},
+            {"gvkey": "1", "datadate": "2020-06-30", "atq": 110.0, "seqq": 20.0},
+            # a duplicate of the period: the lags use the last row
+            {"gvkey": "1", "datadate": "2020-06-30", "atq": 110.0, "seqq": 40.0},
+            {"gvkey": "1", "datadate": "2020-09-30", "atq": 120.0, "ibq": 8.0},
+            # the fourth quarter of 2020 is missing
+            {"gvkey": "1", "datadate": "2021-03-31", "atq": 150.0, "ibq": 5.0},
+            # another firm with the fiscal periods of the lags
+            {"gvkey": "2", "datadate": "2020-12-31", "atq": 1.0, "seqq": 1.0},
+            {"gvkey": "2", "datadate": "2021-06-30", "atq": 1.0, "ibq": 5.0},
+        ]
+    )
+    # the rows keep the order and index of compu, here in reverse order
+    compu.index = [10, 11, 12, 13, 14, 15, 16]
+    compu = compu.iloc[::-1]
+
+    out = compute_characteristics(compu, "quarterly", ["roe", "investment"])
+
+    assert out.index.tolist() == compu.index.tolist()
+    nan = np.nan
+    # be = seqq + txditcq - pstkq = seqq
+    np.testing.assert_allclose(
+        out.loc[[10, 11, 12, 13, 14, 15, 16], "roe"],
+        [nan, 1 / 10, 1 / 10, 8 / 20, nan, nan, nan],
+    )
+    np.testing.assert_allclose(
+        out.loc[[10, 11, 12, 13, 14, 15, 16], "investment"],
+        [nan, nan, nan, nan, 150 / 100 - 1, nan, nan],
+    )
+
+
+def test_characteristics_with_missing_items_are_skipped(caplog):
+    compu = compustat([{"gvkey": "1", "datadate": "2020-03-31"}]).drop(
+        columns=["epspxq"]
+    )
+
+    with caplog.at_level(logging.WARNING):
+        out = compute_characteristics(compu, "quarterly")
+    assert "eps_growth" not in out
+    assert "bm" in out
+    assert "Skipping eps_growth" in caplog.text
+
+    # requested characteristics are not skipped
+    with pytest.raises(KeyError, match="epspxq"):
+        compute_characteristics(compu, "quarterly", ["eps_growth"])
+
+
+def test_characteristics_table_cache(tmp_path, monkeypatch):
+    download_dir = tmp_path / "download"
+    cache_dir = tmp_path / "cache"
+    download_dir.mkdir()
+    cache_dir.mkdir()
+    compustat(
+        [
+            {"gvkey": "1", "datadate": "2020-03-31", "atq": 100.0},
+            {"gvkey": "1", "datadate": "2021-03-31", "atq": 150.0},
+        ]
+    ).to_parquet(download_dir / "compustat_quarterly_20240101_000000.parquet")
+
+    calls = []
+    compute = characteristics.compute_characteristics
+
+    def counted(*args, **kwargs):
+        calls.append(1)
+        return compute(*args, **kwargs)
+
+    monkeypatch.setattr(characteristics, "compute_characteristics", counted)
+
+    first = characteristics_table(download_dir, cache_dir)
+    cached = characteristics_table(download_dir, cache_dir)
+    pd.testing.assert_frame_equal(cached, first)
+    assert len(calls) == 1
+    np.testing.assert_allclose(first["investment"], [np.nan, 0.5])
+
+    # new definitions or a subset of characteristics are recomputed
+    monkeypatch.setattr(
+        characteristics, "DEFINITIONS_VERSION", characteristics.DEFINITIONS_VERSION + 1
+    )
+    characteristics_table(download_dir, cache_dir)
+    assert len(calls) == 2
+    characteristics_table(download_dir, cache_dir)
+    assert len(calls) == 2
+    out = characteristics_table(download_dir, cache_dir, names=["size"])
+    assert len(calls) == 3
+    assert out.columns.tolist() == ["gvkey", "datadate", "size"]
@@ -0,0 +1,107 @@
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from main_code.utils import datasets
+from main_code.utils.datasets import (
+    clear_dataset_cache,
+    configure_dataset_cache,
+    dataset_table,
+    read_dataset,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(datasets, "_MAX_BYTES", datasets._MAX_BYTES)
+    clear_dataset_cache()
+    yield
+    clear_dataset_cache()
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # files read by dataset_table
+    reads = []
+    read_table = pq.read_table
+
+    def counted(path, *args, **kwargs):
+        reads.append(path.name)
+        return read_table(path, *args, **kwargs)
+
+    monkeypatch.setattr(pq, "read_table", counted)
+    return reads
+
+
+def test_new_version_replaces_the_cached_one(tmp_path, reads):
+    file = tmp_path / "ibes_sue.parquet"
+    old, new = "ibes_sue_20240101_000000.parquet", "ibes_sue_20250101_000000.parquet"
+    pd.DataFrame({"a": [1, 2]}).to_parquet(tmp_path / old)
+    assert read_dataset(file)["a"].tolist() == [1, 2]
+    assert read_dataset(file)["a"].tolist() == [1, 2]
+    assert len(reads) == 1
+
+    pd.DataFrame({"a": [3]}).to_parquet(tmp_path / new)
+    assert read_dataset(file)["a"].tolist() == [3]
+    assert reads == [old, new]
+
+
+def test_modified_file_replaces_the_cached_one(tmp_path, reads):
+    file = tmp_path / "crsp.parquet"
+    path = tmp_path / "crsp_20240101_000000.parquet"
+    pd.DataFrame({"a": [1, 2]}).to_parquet(path)
+    assert read_dataset(file)["a"].tolist() == [1, 2]
+
+    # a new size
+    pd.DataFrame({"a": [1, 2, 3]}).to_parquet(path)
+    assert read_dataset(file)["a"].tolist() == [1, 2, 3]
+    assert len(reads) == 2
+
+    # the same size, a new modification time
+    stat = path.stat()
+    pd.DataFrame({"a": [4, 5, 6]}).to_parquet(path)
+    assert path.stat().st_size == stat.st_size
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert read_dataset(file)["a"].tolist() == [4, 5, 6]
+    assert len(reads) == 3
+
+
+def test_projections_keep_the_index_columns(tmp_path, reads):
+    file = tmp_path / "ccm.parquet"
+    df = pd.DataFrame(
+        {"a": [1.0, 2.0], "b": ["x", "y"]},
+        index=pd.Index([10001, 10002], name="permno"),
+    )
+    df.to_parquet(tmp_path / "ccm_20240101_000000.parquet")
+
+    pd.testing.assert_frame_equal(read_dataset(file, columns=["a"]), df[["a"]])
+    pd.testing.assert_frame_equal(read_dataset(file), df)
+    # only b is read for the second projection
+    assert len(reads) == 2
+    assert read_dataset(file, columns=["b"]).index.name == "permno"
+    assert len(reads) == 2
+
+
+def test_least_recently_used_datasets_are_evicted(tmp_path):
+    files = [tmp_path / f"{name}.parquet" for name in ["a", "b", "c"]]
+    for file in files:
+        pd.DataFrame({"x": range(1000)}).to_parquet(
+            file.with_name(f"{file.stem}_20240101_000000.parquet")
+        )
+    size = dataset_table(files[0]).nbytes
+    clear_dataset_cache()
+
+    configure_dataset_cache(2 * size)
+    for file in [files[0], files[1], files[0], files[2]]:
+        dataset_table(file)
+    assert list(datasets._CACHE) == [files[0], files[2]]
+
+    configure_dataset_cache(size)
+    assert list(datasets._CACHE) == [files[2]]
+
+    configure_dataset_cache(0)
+    assert not datasets._CACHE
+    dataset_table(files[1])
+    assert not datasets._CACHE
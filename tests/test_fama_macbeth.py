@@ -0,0 +1,48 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from linearmodels import FamaMacBeth
+
+from main_code.utils import fama_macbeth
+
+
+@pytest.fixture(scope="module")
+def panel():
+    # unbalanced panel with missing values
+    rng = np.random.default_rng(0)
+    n_entities, n_dates = 80, 150
+    df = pd.DataFrame(
+        [(i, t) for i in range(n_entities) for t in range(n_dates)],
+        columns=["permno", "date"],
+    )
+    df = df[rng.random(len(df)) < 0.8]
+    n = len(df)
+    df["ea"] = (rng.random(n) < 0.2).astype(float)
+    df["mkt_rf"] = rng.normal(size=n)
+    df["ret"] = 0.1 + 0.5 * df["ea"] - 0.2 * df["mkt_rf"] + rng.normal(size=n)
+    df.loc[df.sample(30, random_state=0).index, "mkt_rf"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("lags", [0, 4, 10])
+def test_fama_macbeth_matches_linearmodels(panel, lags):
+    result = fama_macbeth(panel, "ret ~ ea + mkt_rf", lags=lags)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = FamaMacBeth.from_formula(
+            "ret ~ 1 + ea + mkt_rf", panel.set_index(["permno", "date"])
+        ).fit(cov_type="kernel", kernel="bartlett", bandwidth=lags)
+
+    for stat, values in [
+        ("coef", expected.params),
+        ("bse", expected.std_errors),
+        ("tstat", expected.tstats),
+    ]:
+        rows = [i for i in result.index if i.endswith(f"_{stat}")]
+        np.testing.assert_allclose(
+            result.loc[rows, 0].astype(float), values.to_numpy(), rtol=1e-10
+        )
+    assert result.loc["nobs", 0] == expected.nobs
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from main_code.data import asof_fundamentals, point_in_time_store
+
+
+def store_of(reports: list) -> pd.DataFrame:
+    compu = pd.DataFrame(reports, columns=["gvkey", "datadate", "available", "atq"])
+    for col in ["datadate", "available"]:
+        compu[col] = pd.to_datetime(compu[col])
+    return point_in_time_store(compu, ["atq"], compu["available"])
+
+
+def test_late_filing_does_not_replace_recent_period():
+    store = store_of(
+        [
+            ("001", "2000-03-31", "2000-05-10", 1.0),
+            ("001", "2000-06-30", "2000-08-10", 2.0),
+            # restatement of an older quarter filed after the recent one
+            ("001", "2000-03-31", "2000-09-01", 1.5),
+            ("001", "2000-09-30", "2000-11-10", 3.0),
+        ]
+    )
+
+    assert store["atq"].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_same_day_reports_keep_the_latest_period():
+    store = store_of(
+        [
+            ("001", "2000-06-30", "2000-08-10", 2.0),
+            ("001", "2000-03-31", "2000-08-10", 1.0),
+            ("002", "2000-03-31", "2000-08-10", 5.0),
+        ]
+    )
+
+    assert store[["gvkey", "atq"]].values.tolist() == [["001", 2.0], ["002", 5.0]]
+
+
+def test_asof_lookup():
+    store = store_of(
+        [
+            ("001", "2000-03-31", "2000-05-10", 1.0),
+            ("001", "2000-06-30", "2000-08-10", 2.0),
+            ("002", "2000-03-31", "2000-05-01", 5.0),
+        ]
+    )
+    panel = pd.DataFrame(
+        {
+            "gvkey": ["001", "001", "001", "001", "002", "003", None],
+            "date": pd.to_datetime(
+                [
+                    "2000-05-09",
+                    "2000-05-10",
+                    "2000-12-29",
+                    None,
+                    "2000-06-01",
+                    "2000-06-01",
+                    "2000-06-01",
+                ]
+            ),
+        }
+    )
+
+    out = asof_fundamentals(panel, store)
+
+    # a NaT date gets no report, not the latest one
+    np.testing.assert_array_equal(
+        out["atq"], [np.nan, 1.0, 2.0, np.nan, 5.0, np.nan, np.nan]
+    )
+    assert out["datadate"].iloc[2] == pd.Timestamp("2000-06-30")
+    assert out["datadate"].iloc[3] is pd.NaT
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.utils import build_design, hdfe_ols
+from main_code.utils.panel_ols_reg import panel_ols
+
+
+@pytest.fixture(scope="module")
+def panel():
+    # unbalanced panel with entity and time effects and missing values
+    rng = np.random.default_rng(0)
+    n_entities, n_times = 60, 40
+    df = pd.DataFrame(
+        [(i, t) for i in range(n_entities) for t in range(n_times)],
+        columns=["permno", "date"],
+    )
+    df = df[rng.random(len(df)) < 0.8]
+    n = len(df)
+    entity_fe = rng.normal(size=n_entities)[df["permno"]]
+    time_fe = rng.normal(size=n_times)[df["date"]]
+    df["ea"] = (rng.random(n) < 0.2).astype(float) + 0.3 * entity_fe
+    df["mkt_rf"] = rng.normal(size=n) + 0.5 * time_fe
+    df["ret"] = (
+        0.5 * df["ea"] - 0.2 * df["mkt_rf"] + entity_fe + time_fe + rng.normal(size=n)
+    )
+    df.loc[df.sample(20, random_state=0).index, "mkt_rf"] = np.nan
+    return df.set_index(["permno", "date"])
+
+
+@pytest.mark.parametrize(
+    "effects", ["EntityEffects", "TimeEffects", "EntityEffects + TimeEffects"]
+)
+def test_hdfe_matches_panel_ols(panel, effects):
+    model = f"ret ~ ea + mkt_rf + {effects}"
+
+    expected = panel_ols(panel, model)
+    result = hdfe_ols(build_design(panel), model)
+
+    # coefficients, t-stats, two-way clustered standard errors and p-values
+    suffixes = ("coef", "tstat", "bse", "pval")
+    stats = [i for i in expected.index if i.endswith(suffixes)]
+    np.testing.assert_allclose(
+        result.loc[stats, 0].astype(float),
+        expected.loc[stats, 0].astype(float),
+        rtol=1e-7,
+    )
+    assert result.loc["nobs", 0] == expected.loc["nobs", 0]
+
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from main_code.data.earnings.ibes_duckdb import analyst_estimates_duckdb
+from main_code.data.earnings.ibes_ea_surp import analyst_estimates
+
+
+def test_duckdb_estimates_match_pandas(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 5000
+    tickers = [f"T{i:02d}" for i in range(30)]
+    # few distinct revision dates and times, so that the revision order has ties
+    est = pd.DataFrame(
+        {
+            "ticker": rng.choice(tickers + [None], n),
+            "estimator": rng.integers(1, 5, n).astype(float),
+            "analys": rng.integers(1, 5, n).astype(float),
+            "pdf": rng.choice(["P", "D", None], n),
+            "fpi": rng.choice(["6", "7"], n),
+            "value": np.where(rng.random(n) < 0.1, np.nan, rng.normal(1, 0.5, n)),
+            "fpedats": pd.Timestamp("2000-03-31")
+            + pd.to_timedelta(rng.integers(0, 4, n) * 91, "D"),
+            "revdats": pd.Timestamp("2000-01-01")
+            + pd.to_timedelta(rng.integers(0, 20, n), "D"),
+            "revtims": rng.choice(["10:00:00", None], n),
+            "anndats": pd.Timestamp("2000-01-01")
+            + pd.to_timedelta(rng.integers(0, 20, n), "D"),
+            "anntims": rng.choice(["09:00:00", "16:00:00"], n),
+        }
+    )
+    est.loc[rng.random(n) < 0.02, "anndats"] = pd.NaT
+    est.loc[rng.random(n) < 0.02, "estimator"] = np.nan
+    est.to_parquet(tmp_path / "ibes_estimates_20240101_000000.parquet", index=False)
+
+    m = 60
+    link = pd.DataFrame(
+        {
+            "ticker": rng.choice(tickers, m),
+            "permno": rng.integers(10000, 10040, m),
+            "gvkey": [f"{i:06d}" for i in rng.integers(0, 30, m)],
+            "linkdt": pd.Timestamp("1999-12-01")
+            + pd.to_timedelta(rng.integers(0, 15, m), "D"),
+            "linkenddt": pd.Timestamp("2000-01-10")
+            + pd.to_timedelta(rng.integers(0, 30, m), "D"),
+        }
+    )
+    link.loc[::7, "linkdt"] = pd.NaT
+    link.loc[3::11, "linkenddt"] = pd.NaT
+    link = link.sort_values("ticker", kind="stable", ignore_index=True)
+
+    expected = analyst_estimates(tmp_path, link)
+    # a spill directory whose path needs quoting
+    result = analyst_estimates_duckdb(
+        tmp_path, link, temp_dir=tmp_path / "it's spill", memory_limit="1GB"
+    )
+
+    assert len(expected) > 100
+    pd.testing.assert_frame_equal(result, expected)
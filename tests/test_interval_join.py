@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.utils import interval_join
+
+
+def merge_between(left, right, on, point, start, end):
+    # the merge-then-filter that interval_join replaces
+    merged = left.merge(right, on=on)
+    return merged[merged[point].between(merged[start], merged[end])].reset_index(
+        drop=True
+    )
+
+
+def random_tables(seed, n_left=2000, n_right=300, n_keys=40):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2000-01-01", periods=400)
+    left = pd.DataFrame(
+        {
+            # keys beyond n_keys are missing from right
+            "permno": rng.integers(0, n_keys + 10, n_left),
+            "date": rng.choice(dates, n_left),
+            "ret": rng.normal(size=n_left),
+        }
+    )
+    left.loc[rng.random(n_left) < 0.05, "date"] = pd.NaT
+    start = rng.choice(dates, n_right)
+    right = pd.DataFrame(
+        {
+            "permno": rng.integers(0, n_keys, n_right),
+            "linkdt": start,
+            "linkenddt": start + pd.to_timedelta(rng.integers(0, 120, n_right), "D"),
+            "gvkey": rng.integers(1000, 2000, n_right).astype(str),
+        }
+    )
+    right.loc[rng.random(n_right) < 0.1, "linkenddt"] = pd.NaT
+    right.loc[rng.random(n_right) < 0.05, "linkdt"] = pd.NaT
+    return left, right
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_merge_between(seed):
+    left, right = random_tables(seed)
+    args = dict(on="permno", point="date", start="linkdt", end="linkenddt")
+    pd.testing.assert_frame_equal(
+        interval_join(left, right, **args), merge_between(left, right, **args)
+    )
+
+
+def test_multiple_keys_and_overlapping_columns():
+    left, right = random_tables(7)
+    left["exchcd"] = left["permno"] % 3
+    right["exchcd"] = right["permno"] % 3
+    right["ret"] = 0.0
+    args = dict(on=["permno", "exchcd"], point="date", start="linkdt", end="linkenddt")
+    pd.testing.assert_frame_equal(
+        interval_join(left, right, **args), merge_between(left, right, **args)
+    )
+
+
+def test_nat_bounds_never_match():
+    left = pd.DataFrame({"permno": [1, 1], "date": pd.to_datetime(["2000-01-05", None])})
+    right = pd.DataFrame(
+        {
+            "permno": [1, 1, 1],
+            "linkdt": pd.to_datetime(["2000-01-01", None, "2000-01-01"]),
+            "linkenddt": pd.to_datetime([None, "2000-12-31", "2000-01-31"]),
+            "gvkey": ["a", "b", "c"],
+        }
+    )
+    out = interval_join(left, right, "permno", "date", "linkdt", "linkenddt")
+    assert out["gvkey"].tolist() == ["c"]
+
+
+def test_empty_right_table():
+    left, right = random_tables(3)
+    right = right.iloc[:0]
+    args = dict(on="permno", point="date", start="linkdt", end="linkenddt")
+    out = interval_join(left, right, **args)
+    assert out.empty
+    assert list(out.columns) == list(merge_between(left, right, **args).columns)
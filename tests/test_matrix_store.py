@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.data.matrix_store import (
+    MATRIX_FIELDS,
+    build_matrix_store,
+    load_matrix_store,
+    matrix_to_long,
+)
+
+
+@pytest.fixture
+def panel():
+    # unbalanced panel of float32 values with missing fields, in random order
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=50)
+    panel = pd.DataFrame(
+        [(d, p) for d in dates for p in [10001, 10002, 10107, 93436]],
+        columns=["date", "permno"],
+    )
+    panel = panel[rng.random(len(panel)) < 0.7].reset_index(drop=True)
+    for field in MATRIX_FIELDS:
+        panel[field] = rng.normal(size=len(panel)).astype(np.float32)
+    panel.loc[rng.random(len(panel)) < 0.1, "ret"] = np.nan
+    return panel.sample(frac=1, random_state=0)
+
+
+def test_round_trip(panel, tmp_path):
+    store = load_matrix_store(build_matrix_store(panel, tmp_path / "store"))
+
+    expected = panel.sort_values(["date", "permno"]).reset_index(drop=True)
+    expected[MATRIX_FIELDS] = expected[MATRIX_FIELDS].astype(np.float32)
+    pd.testing.assert_frame_equal(matrix_to_long(store), expected)
+
+
+def test_duplicated_permno_days_raise(panel, tmp_path):
+    duplicated = pd.concat([panel, panel.iloc[[3]]])
+
+    with pytest.raises(ValueError, match="1 duplicated"):
+        build_matrix_store(duplicated, tmp_path / "store")
+    assert not (tmp_path / "store").exists()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.tables.oos_exmkt_vrp import evaluate_oos
+from main_code.tables.oos_forecast import dmspe_weights
+
+
+def test_models_evaluated_on_their_own_months():
+    rng = np.random.default_rng(0)
+    n = 120
+    forecasts = pd.DataFrame(
+        {
+            "exmkt_h3": rng.normal(size=n),
+            "hist_exmkt_h3": rng.normal(0, 0.1, n),
+            "vrp": rng.normal(0, 0.5, n),
+            "partial": rng.normal(0, 0.5, n),
+            # no forecast at all, e.g. a constant predictor
+            "rf": np.nan,
+        },
+        index=pd.date_range("2000-01-31", periods=n, freq="ME"),
+    )
+    forecasts.iloc[:30, 3] = np.nan
+
+    stats, diff_sse = evaluate_oos(forecasts, 3)
+
+    alone, alone_diff = evaluate_oos(
+        forecasts[["exmkt_h3", "hist_exmkt_h3", "vrp"]], 3
+    )
+    pd.testing.assert_series_equal(stats.loc["vrp"], alone.loc["vrp"])
+    pd.testing.assert_series_equal(diff_sse["vrp"], alone_diff["vrp"])
+
+    late, _ = evaluate_oos(
+        forecasts.iloc[30:][["exmkt_h3", "hist_exmkt_h3", "partial"]], 3
+    )
+    pd.testing.assert_series_equal(stats.loc["partial"], late.loc["partial"])
+    assert stats.loc["rf", "nobs"] == 0
+    assert (diff_sse["rf"] == 0).all()
+
+
+@pytest.mark.parametrize("horizon", [1, 3, 12])
+def test_dmspe_weights_use_realized_errors_only(horizon):
+    rng = np.random.default_rng(horizon)
+    errors = rng.normal(size=(60, 3))
+    theta = 0.9
+
+    weights = dmspe_weights(errors, theta, horizon)
+
+    for t in range(60):
+        # errors of the forecasts made up to t - h
+        past = errors[: max(t - horizon + 1, 0)] ** 2
+        discount = theta ** np.arange(len(past))[::-1, None]
+        phi = (discount * past).sum(axis=0)
+        expected = (1 / phi) / (1 / phi).sum() if len(past) else np.full(3, 1 / 3)
+        np.testing.assert_allclose(weights[t], expected, rtol=1e-12)
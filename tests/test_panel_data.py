@@ -0,0 +1,57 @@
+import pandas as pd
+
+from main_code.data import add_fundamentals, add_risk_characteristics, build_panel
+from main_code.data.panel_data import build_panel_chunked
+
+
+def sort_panel(panel: pd.DataFrame) -> pd.DataFrame:
+    return panel.sort_values(["permno", "date"], kind="stable").reset_index(drop=True)
+
+
+def test_chunked_columns_match_whole_panel(caches, tmp_path):
+    # windows longer than a chunk read the rows of several previous chunks
+    def add_columns(panel):
+        panel = add_risk_characteristics(panel, ["capm"], [60], min_obs=0.5)
+        return add_fundamentals(panel, caches, quarterly_items=["atq"])
+
+    expected = add_columns(build_panel(caches, caches, caches, caches, caches))
+    panel_file = build_panel_chunked(
+        caches,
+        caches,
+        caches,
+        caches,
+        caches,
+        tmp_path / "panel_data.parquet",
+        chunk_months=2,
+        add_columns=add_columns,
+        lookback_days=60,
+    )
+
+    result = pd.read_parquet(panel_file)
+    assert result["b_mkt_rf_capm_60d"].notna().any()
+    assert result["atq"].notna().any()
+    pd.testing.assert_frame_equal(
+        sort_panel(result)[expected.columns],
+        sort_panel(expected),
+        check_dtype=False,
+        rtol=1e-9,
+    )
+
+
+def test_chunked_panel_matches_build_panel(caches, tmp_path):
+    expected = build_panel(caches, caches, caches, caches, caches)
+    panel_file = build_panel_chunked(
+        caches, caches, caches, caches, caches, tmp_path / "panel.parquet", 5
+    )
+
+    result = pd.read_parquet(panel_file)
+    # the rows are ordered by chunk of 5 months from CRSP_START_DATE, then by
+    # permno and date
+    months = (result["date"].dt.year - 1980) * 12 + result["date"].dt.month - 1
+    order = pd.DataFrame(
+        {"chunk": months // 5, "permno": result["permno"], "date": result["date"]}
+    )
+    assert order.equals(order.sort_values(["chunk", "permno", "date"]))
+    pd.testing.assert_frame_equal(
+        sort_panel(result), sort_panel(expected), check_dtype=False
+    )
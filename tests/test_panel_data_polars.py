@@ -0,0 +1,9 @@
+from main_code.data.panel_data_polars import check_panel_parity
+
+
+def test_polars_panel_matches_pandas(caches):
+    panel = check_panel_parity(caches, caches, caches, caches, caches)
+
+    assert len(panel) > 0
+    assert panel["ea"].sum() > 0
+    assert panel["bm_ratio"].notna().any()
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from main_code.figures.plot_data import cached_plot_data, once
+
+
+def count(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({"n": [len(df)]})
+
+
+def positive(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["x"] > 0]
+
+
+def negative(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["x"] < 0]
+
+
+def test_cache_key_includes_the_transformation(tmp_path):
+    data = pd.DataFrame({"x": [-1.0, 1.0, 2.0]})
+    loads = []
+
+    def source():
+        loads.append(1)
+        return data
+
+    fig_path = tmp_path / "fig.pdf"
+    first = cached_plot_data(fig_path, "v1", count, source, once(positive))
+    cached = cached_plot_data(fig_path, "v1", count, source, once(positive))
+    assert first["n"].tolist() == cached["n"].tolist() == [2]
+    assert len(loads) == 1
+
+    # a different transformation of the same data and aggregation is recomputed
+    out = cached_plot_data(fig_path, "v1", count, source, negative)
+    assert out["n"].tolist() == [1]
+    assert len(loads) == 2
+
+
+def test_once_transforms_the_same_data_once():
+    data = pd.DataFrame({"x": [-1.0, 1.0]})
+    calls = []
+
+    def transform(df):
+        calls.append(1)
+        return df
+
+    transform_once = once(transform)
+    transform_once(data)
+    transform_once(data)
+    assert len(calls) == 1
+    transform_once(data.copy())
+    assert len(calls) == 2
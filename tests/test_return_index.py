@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.data.return_index import (
+    build_return_index,
+    factor_window_returns,
+    load_return_index,
+    window_returns,
+)
+
+DATES = pd.bdate_range("2000-01-03", periods=300)
+FACTORS = ["mkt", "ff_size1_bm1"]
+
+
+def compound(ret: pd.Series) -> float:
+    # brute-force compounding of the non-missing returns
+    return (1 + ret.dropna()).prod() - 1
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(0)
+    rows = []
+    for permno in [10001, 10002, 10050]:
+        dates = DATES[rng.integers(0, 30) : rng.integers(250, 300)]
+        rows.append(
+            pd.DataFrame(
+                {
+                    "permno": permno,
+                    "date": dates,
+                    "ret": rng.normal(0, 0.02, len(dates)),
+                    "ff_port": rng.normal(0, 0.01, len(dates)),
+                }
+            )
+        )
+    panel = pd.concat(rows, ignore_index=True)
+    panel.loc[rng.random(len(panel)) < 0.05, "ff_port"] = np.nan
+    # total losses, one of them followed by more returns of the same permno
+    panel.loc[[40, 300], "ret"] = -1.0
+    for col in FACTORS:
+        panel[col] = panel["date"].map(dict(zip(DATES, rng.normal(0, 0.01, 300))))
+    return panel.sample(frac=1, random_state=1)
+
+
+def test_window_returns_match_compounding(panel, tmp_path):
+    build_return_index(panel, tmp_path, factor_columns=FACTORS)
+    index = load_return_index(tmp_path)
+
+    rng = np.random.default_rng(1)
+    n = 500
+    queries = pd.DataFrame(
+        {
+            # 99999 is not in the panel
+            "permno": rng.choice([10001, 10002, 10050, 99999], n),
+            "start": DATES[0] + pd.to_timedelta(rng.integers(-10, 440, n), "D"),
+        }
+    )
+    queries["end"] = queries["start"] + pd.to_timedelta(rng.integers(-3, 120, n), "D")
+    stocks = window_returns(
+        index["stocks"], queries["permno"], queries["start"], queries["end"]
+    )
+    factors = factor_window_returns(index["factors"], queries["start"], queries["end"])
+
+    days = panel.drop_duplicates("date")
+    for k, q in queries.iterrows():
+        in_window = panel["date"].between(q["start"], q["end"])
+        rows = panel[(panel["permno"] == q["permno"]) & in_window]
+        assert stocks.loc[k, "ret"] == pytest.approx(compound(rows["ret"]), abs=1e-12)
+        assert stocks.loc[k, "ff_port"] == pytest.approx(
+            compound(rows["ff_port"]), abs=1e-12
+        )
+        assert stocks.loc[k, "n_ret"] == len(rows)
+        assert stocks.loc[k, "n_ff_port"] == rows["ff_port"].notna().sum()
+
+        rows = days[days["date"].between(q["start"], q["end"])]
+        for col in FACTORS:
+            assert factors.loc[k, col] == pytest.approx(compound(rows[col]), abs=1e-12)
+
+
+def test_total_loss_only_affects_its_windows(tmp_path):
+    panel = pd.DataFrame(
+        {
+            "permno": 1,
+            "date": DATES[:5],
+            "ret": [0.1, -1.0, 0.2, 0.3, 0.1],
+            "ff_port": 0.0,
+        }
+    )
+    build_return_index(panel, tmp_path, factor_columns=[])
+    index = load_return_index(tmp_path)["stocks"]
+
+    out = window_returns(
+        index, [1, 1, 1], DATES[[0, 1, 2]], DATES[[4, 2, 4]], columns=["ret"]
+    )
+
+    np.testing.assert_allclose(out["ret"], [-1.0, -1.0, 1.2 * 1.3 * 1.1 - 1])
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_code.data.earnings.revisions import (
+    GROUP_KEYS,
+    ORDER_KEYS,
+    build_revision_panel,
+    last_estimates,
+    revision_features,
+)
+
+
+@pytest.fixture
+def est():
+    # few distinct values, so series and revision times have ties
+    rng = np.random.default_rng(0)
+    n = 2000
+    est = pd.DataFrame(
+        {
+            "ticker": rng.choice(["AAA", "BBB", "CCC"], n),
+            "fpedats": pd.to_datetime(rng.choice(["2020-03-31", "2020-06-30"], n)),
+            "estimator": rng.integers(1, 4, n),
+            "analys": rng.integers(1, 6, n).astype(float),
+            "anndats": pd.Timestamp("2020-01-01")
+            + pd.to_timedelta(rng.integers(0, 20, n), "D"),
+            "anntims": rng.choice(["08:00:00", "16:00:00"], n),
+            "revdats": pd.Timestamp("2020-02-01")
+            + pd.to_timedelta(rng.integers(0, 3, n), "D"),
+            "revtims": "00:00:00",
+            "value": rng.choice([0.1, 0.2, 0.3], n),
+            "rdq": pd.Timestamp("2020-01-10"),
+            "row": np.arange(n),
+        }
+    )
+    # missing keys, revision times and values
+    est.loc[rng.random(n) < 0.02, "analys"] = np.nan
+    est.loc[rng.random(n) < 0.05, "anntims"] = None
+    est.loc[rng.random(n) < 0.1, "value"] = np.nan
+    return est
+
+
+def test_last_estimates_match_groupby_last(est):
+    panel = build_revision_panel(est)
+
+    expected = (
+        est.sort_values(GROUP_KEYS + ORDER_KEYS, kind="stable")
+        .groupby(GROUP_KEYS)
+        .last()
+        .reset_index()
+    )
+    pd.testing.assert_frame_equal(last_estimates(panel), expected)
+
+    # only the estimates announced on or before the cutoff
+    expected = (
+        est[est["anndats"] <= est["rdq"]]
+        .sort_values(GROUP_KEYS + ORDER_KEYS, kind="stable")
+        .groupby(GROUP_KEYS)
+        .last()
+        .reset_index()
+    )
+    pd.testing.assert_frame_equal(last_estimates(panel, before="rdq"), expected)
+
+
+def test_revision_features_match_loop(est):
+    panel = build_revision_panel(est)
+    features = revision_features(panel).set_index(["ticker", "fpedats"])
+
+    for (ticker, fpedats), period in panel.groupby(["ticker", "fpedats"]):
+        changes = []
+        for _, series in period.groupby("series"):
+            changes.extend(series["value"].diff().iloc[1:])
+        changes = np.array(changes)
+        revisions = changes[(changes != 0) & ~np.isnan(changes)]
+        n_up, n_down = (revisions > 0).sum(), (revisions < 0).sum()
+        n_analysts = period["series"].nunique()
+
+        row = features.loc[(ticker, fpedats)]
+        assert row["n_est"] == len(period)
+        assert row["n_analysts"] == n_analysts
+        assert row["n_up"] == n_up
+        assert row["n_down"] == n_down
+        assert row["mean_rev"] == pytest.approx(revisions.mean(), abs=1e-12)
+        assert row["rev_momentum"] == pytest.approx((n_up - n_down) / n_analysts)
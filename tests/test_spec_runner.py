@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from main_code.utils import run_specs, spec_grid
+
+
+def test_run_specs_caches_results_only(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 500
+    data = pd.DataFrame(
+        {
+            "y": rng.normal(size=n),
+            "x": rng.normal(size=n),
+            "z": rng.normal(size=n),
+            "recent": np.arange(n) >= n // 2,
+        }
+    )
+    specs = spec_grid(
+        ["y"], [["x"], ["x", "z"]], samples=[None, "recent"], estimator="ols"
+    )
+
+    first = run_specs(data, specs, cache_dir=tmp_path, workers=1)
+    # a new version of a column adds results, but no column file stays on disk
+    data["z"] = rng.normal(size=n)
+    run_specs(data, specs, cache_dir=tmp_path, workers=1)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["results"]
+    assert len(list((tmp_path / "results").iterdir())) == 6
+
+    # the specifications without z are read from the cache
+    data["z"] = 0.0
+    cached = run_specs(data, specs[:1], cache_dir=tmp_path, workers=1)
+    pd.testing.assert_frame_equal(cached[0], first[0])